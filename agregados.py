@@ -0,0 +1,121 @@
+"""Agregados da carteira de simulações, mantidos de forma incremental.
+
+``AgregadosCarteira`` é inscrito no armazenamento e recebe apenas as linhas
+incluídas, alteradas ou excluídas. Cada evento gera o cronograma só dessas
+linhas e soma (ou subtrai) o resultado nos agregados, cujo tamanho depende do
+número de obras x meses, não do número de simulações. Assim o painel não
+precisa de um groupby sobre a tabela inteira a cada rerun.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cronograma import gerar_fluxo
+
+LARGURA_FAIXA_PRECO = 50000
+
+
+def _contribuicoes(df):
+    """Agregados parciais de um conjunto de simulações (formato da planilha)."""
+    obras = df['Obra'].astype(str).to_numpy()
+    datas = pd.to_datetime(df['Data/Hora'], errors='coerce')
+    fluxo = gerar_fluxo(
+        df['Preco Total'].to_numpy(), df['% Entrada'].to_numpy(), df['% Mensal'].to_numpy(),
+        df['% Semestral'].to_numpy(), df['% Entrega'].to_numpy(),
+        df['Nº Mensal'].to_numpy(), df['Nº Semestral'].to_numpy(),
+        datas.fillna(pd.Timestamp(0)).to_numpy(dtype='datetime64[D]'),
+    )
+    fluxo['Obra'] = obras[fluxo['Simulação'].to_numpy()]
+
+    # Sem data não há como posicionar o recebível no tempo; entra só no mix e nos preços.
+    com_data = datas.notna().to_numpy()[fluxo['Simulação'].to_numpy()]
+    datados = fluxo[com_data]
+    recebiveis = datados.groupby(
+        ['Obra', datados['Vencimento'].dt.to_period('M').rename('Mês')], observed=True
+    )['Valor Nominal'].sum()
+
+    mix = fluxo.groupby(['Obra', 'Parcela'], observed=True)['Valor Nominal'].sum()
+
+    faixas = (df['Preco Total'].to_numpy() // LARGURA_FAIXA_PRECO * LARGURA_FAIXA_PRECO).astype(np.int64)
+    precos = pd.Series(1, index=pd.MultiIndex.from_arrays([obras, faixas], names=['Obra', 'Faixa'])) \
+        .groupby(level=['Obra', 'Faixa']).sum()
+
+    totais = pd.DataFrame({'Obra': obras, 'Preco Total': df['Preco Total'].to_numpy()}) \
+        .groupby('Obra')['Preco Total'].agg(['count', 'sum'])
+    return {'recebiveis': recebiveis, 'mix': mix, 'precos': precos, 'totais': totais}
+
+
+class AgregadosCarteira:
+    """Recebíveis por obra e mês, mix de parcelas e distribuição de preços.
+
+    Implementa a interface de ouvinte do armazenamento: ``redefinir(df)``,
+    ``incluir(df)`` e ``remover(df)``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agregados = None
+
+    def redefinir(self, df):
+        with self._lock:
+            self._agregados = _contribuicoes(df) if not df.empty else None
+
+    def incluir(self, df):
+        self._somar(df, 1)
+
+    def remover(self, df):
+        self._somar(df, -1)
+
+    def _somar(self, df, sinal):
+        if df.empty:
+            return
+        parciais = _contribuicoes(df)
+        with self._lock:
+            if self._agregados is None:
+                self._agregados = {nome: valor * 0 for nome, valor in parciais.items()}
+            for nome, parcial in parciais.items():
+                total = self._agregados[nome].add(parcial * sinal, fill_value=0)
+                # Remove grupos zerados para o agregado não crescer indefinidamente.
+                if isinstance(total, pd.DataFrame):
+                    total = total[total['count'] != 0]
+                else:
+                    total = total[~np.isclose(total, 0)]
+                self._agregados[nome] = total
+
+    def _copia(self, nome):
+        with self._lock:
+            if self._agregados is None:
+                return None
+            return self._agregados[nome].copy()
+
+    def recebiveis(self):
+        """Valor nominal esperado por obra e mês de vencimento (colunas Obra, Mês, Valor)."""
+        serie = self._copia('recebiveis')
+        if serie is None:
+            return pd.DataFrame(columns=['Obra', 'Mês', 'Valor'])
+        df = serie.rename('Valor').reset_index()
+        df['Mês'] = df['Mês'].dt.to_timestamp()
+        return df.sort_values(['Mês', 'Obra'])
+
+    def mix(self):
+        """Total por obra e tipo de parcela (colunas Obra, Parcela, Valor)."""
+        serie = self._copia('mix')
+        if serie is None:
+            return pd.DataFrame(columns=['Obra', 'Parcela', 'Valor'])
+        return serie.rename('Valor').reset_index()
+
+    def distribuicao_precos(self):
+        """Quantidade de simulações por obra e faixa de preço (colunas Obra, Faixa, Quantidade)."""
+        serie = self._copia('precos')
+        if serie is None:
+            return pd.DataFrame(columns=['Obra', 'Faixa', 'Quantidade'])
+        return serie.round().astype(int).rename('Quantidade').reset_index()
+
+    def totais(self):
+        """Quantidade de simulações e soma dos preços por obra."""
+        df = self._copia('totais')
+        if df is None:
+            return pd.DataFrame(columns=['Obra', 'Simulações', 'Valor Total'])
+        df['count'] = df['count'].round().astype(int)
+        return df.rename(columns={'count': 'Simulações', 'sum': 'Valor Total'}).reset_index()
@@ -0,0 +1,299 @@
+"""Camada de armazenamento das simulações.
+
+``Armazenamento`` define as operações usadas pelo app (listar, incluir,
+atualizar, excluir e consultar). Há duas implementações:
+
+* ``ArmazenamentoPlanilha``: a planilha do Google, via ``SincronizadorPlanilha``
+  (leitura) e ``FilaEscrita`` (gravação assíncrona);
+* ``ArmazenamentoSQLite``: um banco local indexado, que opcionalmente espelha
+  as gravações na planilha em segundo plano.
+
+As linhas recebidas e o DataFrame devolvido seguem sempre o formato da
+planilha (``COLUNAS_PLANILHA``), de modo que o app não depende do backend.
+"""
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+from fila_escrita import FilaEscrita, SALVO
+from esquema import COLUNA_ID, COLUNAS_PLANILHA, FORMATO_DATA_HORA, converter_dados, tipar
+from planilha import SincronizadorPlanilha, gerar_id
+
+COLUNAS_SQL = {
+    'Obra': 'obra', 'Unidade': 'unidade', 'Preco Total': 'preco_total',
+    '% Entrada': 'perc_entrada', 'Valor Entrada': 'valor_entrada',
+    '% Mensal': 'perc_mensal', 'Nº Mensal': 'num_mensal', 'Valor Mensal': 'valor_mensal',
+    '% Semestral': 'perc_semestral', 'Nº Semestral': 'num_semestral', 'Valor Semestral': 'valor_semestral',
+    '% Entrega': 'perc_entrega', 'Valor Entrega': 'valor_entrega',
+    'Data/Hora': 'data_hora', COLUNA_ID: 'id',
+}
+
+
+def filtrar_simulacoes(df, obras=None, unidade=None, data_inicio=None, data_fim=None,
+                       preco_min=None, preco_max=None):
+    """Aplica os filtros de consulta a um DataFrame no formato da planilha.
+
+    ``unidade`` é uma busca por trecho (sem diferenciar maiúsculas); as datas
+    são inclusivas e comparadas com ``Data/Hora``.
+    """
+    if df.empty:
+        return df
+    mascara = pd.Series(True, index=df.index)
+    if obras:
+        mascara &= df['Obra'].isin(list(obras))
+    if unidade:
+        mascara &= df['Unidade'].astype(str).str.contains(str(unidade), case=False, regex=False)
+    if data_inicio is not None or data_fim is not None:
+        datas = pd.to_datetime(df['Data/Hora'], errors='coerce')
+        if data_inicio is not None:
+            mascara &= datas >= pd.Timestamp(data_inicio)
+        if data_fim is not None:
+            mascara &= datas < pd.Timestamp(data_fim) + pd.Timedelta(days=1)
+    if preco_min is not None:
+        mascara &= df['Preco Total'] >= preco_min
+    if preco_max is not None:
+        mascara &= df['Preco Total'] <= preco_max
+    return df[mascara]
+
+
+class Armazenamento(ABC):
+    """Interface comum dos backends de armazenamento."""
+
+    @abstractmethod
+    def listar(self):
+        """Devolve todas as simulações como DataFrame no formato da planilha."""
+
+    @abstractmethod
+    def incluir(self, linhas):
+        """Inclui simulações (colunas de dados, sem o ID) e devolve os IDs gerados."""
+
+    @abstractmethod
+    def atualizar(self, sim_id, linha):
+        """Substitui as colunas de dados da simulação ``sim_id``."""
+
+    @abstractmethod
+    def excluir(self, sim_id):
+        """Exclui a simulação ``sim_id``."""
+
+    def consultar(self, **filtros):
+        """Simulações que atendem aos filtros de ``filtrar_simulacoes``."""
+        return filtrar_simulacoes(self.listar(), **filtros)
+
+    def status(self, item_id):
+        """Estado da gravação de um item (ver ``fila_escrita``); gravações síncronas já estão salvas."""
+        return {"estado": SALVO, "erro": None}
+
+    def ids_invalidos(self):
+        """IDs de simulações armazenadas com dados ilegíveis."""
+        return set()
+
+    @abstractmethod
+    def inscrever(self, ouvinte):
+        """Inscreve um ouvinte de mudanças (``redefinir``/``incluir``/``remover``, ver ``agregados``)."""
+
+
+class ArmazenamentoPlanilha(Armazenamento):
+    """Planilha do Google: leitura incremental em cache e gravação pela fila."""
+
+    def __init__(self, sincronizador, fila):
+        self.sincronizador = sincronizador
+        self.fila = fila
+
+    def listar(self):
+        return self.sincronizador.dados()
+
+    def incluir(self, linhas):
+        return self.fila.enfileirar_inclusoes(linhas)
+
+    def atualizar(self, sim_id, linha):
+        return self.fila.enfileirar_atualizacao(sim_id, linha)
+
+    def excluir(self, sim_id):
+        self.sincronizador.excluir(sim_id)
+
+    def status(self, item_id):
+        return self.fila.status(item_id)
+
+    def ids_invalidos(self):
+        return self.sincronizador.ids_invalidos()
+
+    def inscrever(self, ouvinte):
+        self.sincronizador.inscrever(ouvinte)
+
+
+class ArmazenamentoSQLite(Armazenamento):
+    """Banco SQLite local, com índices por obra, data e preço.
+
+    Se ``espelho`` (uma ``FilaEscrita``) for informado, toda gravação também é
+    enfileirada para a planilha; as leituras continuam sempre locais. Linhas
+    com dados ilegíveis são recusadas com ``ValueError``.
+    """
+
+    def __init__(self, caminho, espelho=None):
+        self.espelho = espelho
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ouvintes = []
+        self._criar_tabela()
+
+    def _criar_tabela(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS simulacoes (
+                    id TEXT PRIMARY KEY,
+                    obra TEXT NOT NULL,
+                    unidade TEXT NOT NULL,
+                    preco_total REAL, perc_entrada REAL, valor_entrada REAL,
+                    perc_mensal REAL, num_mensal INTEGER, valor_mensal REAL,
+                    perc_semestral REAL, num_semestral INTEGER, valor_semestral REAL,
+                    perc_entrega REAL, valor_entrega REAL,
+                    data_hora TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_simulacoes_obra_data ON simulacoes (obra, data_hora)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_simulacoes_data ON simulacoes (data_hora)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_simulacoes_preco ON simulacoes (preco_total)")
+
+    def _converter(self, linhas, ids):
+        df, invalidas = converter_dados([list(linha) + [sim_id] for linha, sim_id in zip(linhas, ids)],
+                                        COLUNAS_PLANILHA)
+        if invalidas.any():
+            raise ValueError(f"{int(invalidas.sum())} simulação(ões) com dados inválidos.")
+        return df
+
+    def _notificar(self, evento, df):
+        for ouvinte in self._ouvintes:
+            getattr(ouvinte, evento)(df)
+
+    def inscrever(self, ouvinte):
+        self._ouvintes.append(ouvinte)
+        ouvinte.redefinir(self.listar())
+
+    @staticmethod
+    def _para_sql(df):
+        registros = df[COLUNAS_PLANILHA].rename(columns=COLUNAS_SQL)
+        registros['obra'] = registros['obra'].astype(str)
+        datas = pd.to_datetime(registros['data_hora'], format='ISO8601', errors='coerce')
+        registros['data_hora'] = datas.dt.strftime(FORMATO_DATA_HORA).astype(object).where(datas.notna(), None)
+        return registros
+
+    def _ler(self, sql, parametros=()):
+        with self._lock:
+            df = pd.read_sql_query(sql, self._conn, params=parametros)
+        return tipar(df.rename(columns={v: k for k, v in COLUNAS_SQL.items()})[COLUNAS_PLANILHA])
+
+    def vazio(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM simulacoes LIMIT 1").fetchone() is None
+
+    def importar(self, df):
+        """Carrega um DataFrame no formato da planilha (ex.: para semear o banco a partir dela)."""
+        if not df.empty:
+            self._inserir(self._para_sql(df))
+            self._notificar('redefinir', self.listar())
+
+    def _inserir(self, registros):
+        colunas = list(registros.columns)
+        sql = (f"INSERT OR REPLACE INTO simulacoes ({', '.join(colunas)}) "
+               f"VALUES ({', '.join('?' for _ in colunas)})")
+        with self._lock, self._conn:
+            self._conn.executemany(sql, registros.itertuples(index=False, name=None))
+
+    def listar(self):
+        return self._ler("SELECT * FROM simulacoes")
+
+    def consultar(self, obras=None, unidade=None, data_inicio=None, data_fim=None,
+                  preco_min=None, preco_max=None):
+        condicoes, parametros = [], []
+        if obras:
+            condicoes.append(f"obra IN ({', '.join('?' for _ in obras)})")
+            parametros.extend(obras)
+        if unidade:
+            condicoes.append("unidade LIKE ?")
+            parametros.append(f"%{unidade}%")
+        if data_inicio is not None:
+            condicoes.append("data_hora >= ?")
+            parametros.append(pd.Timestamp(data_inicio).strftime("%Y-%m-%d"))
+        if data_fim is not None:
+            condicoes.append("data_hora < ?")
+            parametros.append((pd.Timestamp(data_fim) + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+        if preco_min is not None:
+            condicoes.append("preco_total >= ?")
+            parametros.append(preco_min)
+        if preco_max is not None:
+            condicoes.append("preco_total <= ?")
+            parametros.append(preco_max)
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        return self._ler(f"SELECT * FROM simulacoes{where}", parametros)
+
+    def incluir(self, linhas):
+        ids = [gerar_id() for _ in linhas]
+        novas = self._converter(linhas, ids)
+        self._inserir(self._para_sql(novas))
+        self._notificar('incluir', novas)
+        if self.espelho is not None:
+            self.espelho.enfileirar_inclusoes(linhas, ids)
+        return ids
+
+    def atualizar(self, sim_id, linha):
+        nova = self._converter([linha], [sim_id])
+        antiga = self._ler("SELECT * FROM simulacoes WHERE id = ?", (sim_id,))
+        registro = self._para_sql(nova).iloc[0].drop('id')
+        atribuicoes = ", ".join(f"{coluna} = ?" for coluna in registro.index)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f"UPDATE simulacoes SET {atribuicoes} WHERE id = ?",
+                                        [*registro.tolist(), sim_id])
+        if cursor.rowcount == 0:
+            raise KeyError(f"Simulação não encontrada: {sim_id}")
+        self._notificar('remover', antiga)
+        self._notificar('incluir', nova)
+        if self.espelho is not None:
+            self.espelho.enfileirar_atualizacao(sim_id, linha)
+        return sim_id
+
+    def excluir(self, sim_id):
+        antiga = self._ler("SELECT * FROM simulacoes WHERE id = ?", (sim_id,))
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM simulacoes WHERE id = ?", (sim_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(f"Simulação não encontrada: {sim_id}")
+        self._notificar('remover', antiga)
+        if self.espelho is not None:
+            self.espelho.enfileirar_exclusao(sim_id)
+
+    def status(self, item_id):
+        if self.espelho is not None:
+            return self.espelho.status(item_id)
+        return super().status(item_id)
+
+
+def criar_armazenamento(config, obter_planilha):
+    """Cria o backend descrito em ``config`` (seção ``[armazenamento]`` dos secrets).
+
+    ``backend`` pode ser ``"planilha"`` (padrão) ou ``"sqlite"``. Na planilha,
+    ``snapshot`` define o arquivo Parquet usado para a partida rápida (vazio
+    desliga); para o SQLite, ``caminho`` indica o arquivo e ``espelhar_planilha``
+    liga o espelhamento assíncrono. Um banco SQLite vazio e espelhado é semeado com o conteúdo atual
+    da planilha.
+    """
+    config = dict(config or {})
+    backend = config.get("backend", "planilha")
+    if backend == "planilha":
+        sincronizador = SincronizadorPlanilha(
+            obter_planilha, caminho_snapshot=config.get("snapshot", ".cache/simulacoes.parquet") or None
+        )
+        return ArmazenamentoPlanilha(sincronizador, FilaEscrita(sincronizador))
+    if backend == "sqlite":
+        espelho = None
+        if config.get("espelhar_planilha", False):
+            sincronizador = SincronizadorPlanilha(obter_planilha)
+            espelho = FilaEscrita(sincronizador)
+        armazenamento = ArmazenamentoSQLite(config.get("caminho", "simulacoes.db"), espelho=espelho)
+        if espelho is not None and armazenamento.vazio():
+            armazenamento.importar(sincronizador.dados())
+        return armazenamento
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
@@ -0,0 +1,189 @@
+"""Benchmark offline do carregamento, renderização, busca e gravação de simulações.
+
+Roda contra a ``PlanilhaMemoria`` (sem rede) com simulações sintéticas de
+todas as obras, nos tamanhos pedidos (padrão: 1k, 10k e 100k linhas), e mede:
+
+- ``carga``: leitura completa da planilha pelo ``SincronizadorPlanilha``;
+- ``parse``: só a conversão das linhas cruas (``converter_dados``);
+- ``sincronizacao``: ``dados()`` com uma linha nova (caminho incremental);
+- ``render_pagina``/``render_tudo``: filtro + cards da aba "Simulações Salvas";
+- ``busca_indice``/``busca_find``: localizar 100 simulações pelo índice de IDs
+  e, para comparação, com ``sheet.find``;
+- ``salvar_edicao``/``incluir``/``excluir``: as gravações do app.
+
+Cada cenário roda ``--repeticoes`` vezes; o relatório traz mediana e mínimo
+em ms e o pico de memória (``tracemalloc``, numa execução à parte para não
+distorcer o tempo). Os dados são gerados com semente fixa, então execuções
+diferentes são comparáveis: grave com ``--saida base.json`` e compare depois
+com ``--comparar base.json``.
+
+    python benchmark.py --tamanhos 1000 10000 --repeticoes 5 --saida base.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import filtrar_simulacoes
+from calculos import calcular_fluxo
+from esquema import COLUNAS_PLANILHA, OBRAS, converter_dados, formatar_numeros_ptbr
+from listagem import montar_cards_html, paginar
+from planilha import SincronizadorPlanilha
+from planilha_memoria import PlanilhaMemoria
+
+TAMANHOS_PADRAO = [1000, 10000, 100000]
+BUSCAS = 100
+TAMANHO_PAGINA = 10
+
+
+def gerar_linhas(quantidade, semente=0):
+    """Linhas sintéticas no formato da planilha (cabeçalho incluso), distribuídas entre as obras."""
+    rng = np.random.default_rng(semente)
+    preco = np.round(rng.uniform(250_000, 3_000_000, quantidade), 2)
+    entrada = rng.choice([10.0, 15.0, 20.0, 30.0], quantidade)
+    semestral = rng.choice([0.0, 10.0, 20.0], quantidade)
+    entrega = rng.choice([10.0, 20.0, 30.0], quantidade)
+    mensal = 100.0 - entrada - semestral - entrega
+    num_mensal = rng.choice([24, 36, 48, 60], quantidade)
+    num_semestral = np.where(semestral > 0, num_mensal // 6, 0)
+    valores = calcular_fluxo(preco, entrada, mensal, semestral, entrega, num_mensal, num_semestral)
+    datas = (np.datetime64('2024-01-01T08:00:00') + rng.integers(0, 730 * 86400, quantidade).astype('timedelta64[s]'))
+    colunas = [
+        np.array(OBRAS, dtype=object)[np.arange(quantidade) % len(OBRAS)],
+        (101 + np.arange(quantidade) // len(OBRAS)).astype(str),
+        formatar_numeros_ptbr(preco),
+        formatar_numeros_ptbr(entrada), formatar_numeros_ptbr(valores['val_entrada']),
+        formatar_numeros_ptbr(mensal), num_mensal.astype(str), formatar_numeros_ptbr(valores['val_por_mensal']),
+        formatar_numeros_ptbr(semestral), num_semestral.astype(str), formatar_numeros_ptbr(valores['val_por_semestral']),
+        formatar_numeros_ptbr(entrega), formatar_numeros_ptbr(valores['val_entrega']),
+        np.char.replace(np.datetime_as_string(datas, unit='s'), 'T', ' '),
+        np.char.mod('%012x', np.arange(1, quantidade + 1)),
+    ]
+    corpo = np.column_stack([np.asarray(c, dtype=object) for c in colunas]).astype(str).tolist()
+    return [list(COLUNAS_PLANILHA)] + corpo
+
+
+def medir(funcao, repeticoes, preparar=None):
+    """Roda ``funcao(contexto)`` ``repeticoes`` vezes; ``preparar()`` cria o contexto fora da medição."""
+    tempos = []
+    for _ in range(repeticoes):
+        contexto = preparar() if preparar else None
+        inicio = time.perf_counter()
+        funcao(contexto)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    contexto = preparar() if preparar else None
+    tracemalloc.start()
+    funcao(contexto)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"mediana_ms": statistics.median(tempos), "min_ms": min(tempos), "pico_mb": pico / 2 ** 20}
+
+
+def cenarios(linhas, semente=0):
+    """Cenários medidos para uma planilha com ``linhas``: nome -> (função, preparar)."""
+    rng = np.random.default_rng(semente)
+    cabecalho, corpo = linhas[0], linhas[1:]
+    pos_id = cabecalho.index('ID')
+    ids = [corpo[i][pos_id] for i in rng.integers(0, len(corpo), BUSCAS)]
+    nova = list(corpo[0][:pos_id])
+
+    def novo():
+        ws = PlanilhaMemoria(linhas)
+        return SincronizadorPlanilha(lambda: ws)
+
+    def carregado():
+        ws = PlanilhaMemoria(linhas)
+        sincronizador = SincronizadorPlanilha(lambda: ws)
+        sincronizador.dados()
+        return ws, sincronizador
+
+    df = carregado()[1].dados()
+
+    def com_linha_nova():
+        ws, sincronizador = carregado()
+        ws.append_rows([nova + ['ffffffffffff']])
+        return sincronizador
+
+    return {
+        "carga": (lambda ctx: ctx.dados(), novo),
+        "parse": (lambda ctx: converter_dados(corpo, cabecalho), None),
+        "sincronizacao": (lambda ctx: ctx.dados(), com_linha_nova),
+        "render_pagina": (lambda ctx: montar_cards_html(paginar(
+            filtrar_simulacoes(df, obras=[OBRAS[0]]).sort_values('Data/Hora', ascending=False),
+            1, TAMANHO_PAGINA)[0]), None),
+        "render_tudo": (lambda ctx: montar_cards_html(df), None),
+        "busca_indice": (lambda ctx: [ctx[1].linha_da_simulacao(sim_id) for sim_id in ids], carregado),
+        "busca_find": (lambda ctx: [ctx[0].find(sim_id, in_column=pos_id + 1) for sim_id in ids], carregado),
+        "salvar_edicao": (lambda ctx: ctx[1].atualizar_lote({ids[0]: nova}), carregado),
+        "incluir": (lambda ctx: ctx[1].anexar_lote([('ffffffffffff', nova)]), carregado),
+        "excluir": (lambda ctx: ctx[1].excluir(ids[0]), carregado),
+    }
+
+
+def executar(tamanhos, repeticoes, semente=0):
+    resultados = {}
+    for tamanho in tamanhos:
+        linhas = gerar_linhas(tamanho, semente)
+        for nome, (funcao, preparar) in cenarios(linhas, semente).items():
+            resultados[f"{nome}@{tamanho}"] = medir(funcao, repeticoes, preparar)
+            print(f"{nome:>14} @ {tamanho:>7}: {_formatar(resultados[f'{nome}@{tamanho}'])}", flush=True)
+    return resultados
+
+
+def _formatar(resultado):
+    return (f"mediana {resultado['mediana_ms']:9.2f} ms | mín {resultado['min_ms']:9.2f} ms"
+            f" | pico {resultado['pico_mb']:8.2f} MB")
+
+
+def ambiente(semente, repeticoes):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+        "pandas": pd.__version__, "plataforma": platform.platform(), "processador": platform.processor(),
+        "semente": semente, "repeticoes": repeticoes,
+    }
+
+
+def comparar(atual, base):
+    """Imprime a razão atual/base da mediana de cada cenário presente nos dois resultados."""
+    print("\nComparação com a base (mediana atual / base):")
+    for chave, resultado in atual.items():
+        anterior = base.get(chave)
+        if anterior is None or anterior["mediana_ms"] <= 0:
+            continue
+        razao = resultado["mediana_ms"] / anterior["mediana_ms"]
+        alerta = "  <-- mais lento" if razao > 1.2 else ""
+        print(f"{chave:>24}: {razao:6.2f}x ({anterior['mediana_ms']:.2f} -> {resultado['mediana_ms']:.2f} ms){alerta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    resultados = executar(args.tamanhos, args.repeticoes, args.semente)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"ambiente": ambiente(args.semente, args.repeticoes), "resultados": resultados},
+                      arquivo, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            comparar(resultados, json.load(arquivo)["resultados"])
+
+
+if __name__ == "__main__":
+    main()
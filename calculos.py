@@ -0,0 +1,56 @@
+"""Cálculo das parcelas de uma negociação.
+
+Todas as funções aceitam escalares ou arrays NumPy (com broadcasting), de modo
+que a mesma rotina serve tanto para a simulação única da tela quanto para
+precificar uma tabela de vendas inteira em uma única passada vetorizada.
+"""
+import numpy as np
+
+CAMPOS_FLUXO = (
+    "val_entrada", "val_total_mensal", "val_total_semestral", "val_entrega",
+    "val_por_mensal", "val_por_semestral",
+)
+
+
+def _dividir_parcelas(total, quantidade):
+    """Divide o total pela quantidade de parcelas; quantidade <= 0 resulta em 0."""
+    quantidade = np.asarray(quantidade)
+    divisor = np.where(quantidade > 0, quantidade, 1)
+    return np.where(quantidade > 0, total / divisor, 0.0)
+
+
+def calcular_fluxo(preco_total, perc_entrada, perc_mensal, perc_semestral, perc_entrega,
+                   num_mensal, num_semestral):
+    """Calcula os valores derivados de um ou mais planos de pagamento.
+
+    Retorna um dicionário com os campos de ``CAMPOS_FLUXO``, cada um como
+    ``np.ndarray`` no formato resultante do broadcasting das entradas.
+    """
+    preco = np.asarray(preco_total, dtype=float)
+    val_entrada = preco * np.asarray(perc_entrada, dtype=float) / 100
+    val_total_mensal = preco * np.asarray(perc_mensal, dtype=float) / 100
+    val_total_semestral = preco * np.asarray(perc_semestral, dtype=float) / 100
+    val_entrega = preco * np.asarray(perc_entrega, dtype=float) / 100
+    return {
+        "val_entrada": val_entrada,
+        "val_total_mensal": val_total_mensal,
+        "val_total_semestral": val_total_semestral,
+        "val_entrega": val_entrega,
+        "val_por_mensal": _dividir_parcelas(val_total_mensal, num_mensal),
+        "val_por_semestral": _dividir_parcelas(val_total_semestral, num_semestral),
+    }
+
+
+def calcular_simulacao(preco_total, perc_entrada, perc_mensal, perc_semestral, perc_entrega,
+                       num_mensal, num_semestral):
+    """Versão escalar de ``calcular_fluxo``: retorna os valores como ``float``."""
+    fluxo = calcular_fluxo(preco_total, perc_entrada, perc_mensal, perc_semestral, perc_entrega,
+                           num_mensal, num_semestral)
+    return {campo: float(valor) for campo, valor in fluxo.items()}
+
+
+def percentual_fechado(perc_entrada, perc_mensal, perc_semestral, perc_entrega):
+    """Indica (elemento a elemento) se o fluxo fecha 100%, com tolerância de uma casa decimal."""
+    total = (np.asarray(perc_entrada, dtype=float) + np.asarray(perc_mensal, dtype=float)
+             + np.asarray(perc_semestral, dtype=float) + np.asarray(perc_entrega, dtype=float))
+    return np.round(total, 1) == 100.0
@@ -0,0 +1,147 @@
+"""Conexão compartilhada com a API do Google Sheets.
+
+O ``GerenciadorClientes`` autentica uma única vez por processo e reaproveita o
+cliente, a planilha e a aba abertos; o token de acesso é renovado pela própria
+sessão autorizada do google-auth quando expira, e as conexões HTTP ficam em um
+pool keep-alive. Todas as chamadas à API passam por um ``LimitadorTaxa``
+(token bucket) compartilhado, de modo que rajadas de várias sessões são
+espaçadas em vez de estourar a cota (HTTP 429).
+
+As bibliotecas do Google só são importadas ao autenticar, de modo que o
+limitador (e o serviço com backend SQLite) não dependem delas.
+"""
+import multiprocessing
+import threading
+import time
+
+import metricas
+from fila_escrita import status_http
+
+ESCOPOS = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# Métodos do Worksheet que fazem chamadas à API e, portanto, consomem cota.
+METODOS_API = {
+    "get_all_values", "get_values", "get", "batch_get", "append_row", "append_rows",
+    "update", "batch_update", "find", "delete_rows",
+}
+
+
+class LimitadorTaxa:
+    """Token bucket thread-safe: ``taxa`` fichas por segundo, até ``capacidade`` acumuladas.
+
+    Com ``compartilhado``, o balde fica em memória compartilhada e vale para
+    todos os processos criados por ``fork`` depois dele (ex.: os filhos do
+    serviço HTTP), que passam a dividir a mesma cota.
+    """
+
+    def __init__(self, taxa, capacidade, compartilhado=False):
+        self._taxa = float(taxa)
+        self._capacidade = float(capacidade)
+        # [fichas disponíveis, instante da última atualização]
+        if compartilhado:
+            self._estado = multiprocessing.RawArray('d', [float(capacidade), time.monotonic()])
+            self._lock = multiprocessing.Lock()
+        else:
+            self._estado = [float(capacidade), time.monotonic()]
+            self._lock = threading.Lock()
+
+    @classmethod
+    def por_minuto(cls, requisicoes_por_minuto=60, compartilhado=False):
+        """Limitador que nunca passa de ``requisicoes_por_minuto`` em qualquer janela de 60 s.
+
+        Abaixo de 10 por minuto a rajada é de uma requisição; limites abaixo de 2 valem como 2.
+        """
+        capacidade = max(1, requisicoes_por_minuto // 10)
+        return cls(max(requisicoes_por_minuto - capacidade, 1) / 60, capacidade, compartilhado)
+
+    def adquirir(self, fichas=1):
+        """Bloqueia até haver ``fichas`` disponíveis e as consome."""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                disponiveis = min(self._capacidade, self._estado[0] + (agora - self._estado[1]) * self._taxa)
+                self._estado[1] = agora
+                if disponiveis >= fichas:
+                    self._estado[0] = disponiveis - fichas
+                    return
+                self._estado[0] = disponiveis
+                espera = (fichas - disponiveis) / self._taxa
+            time.sleep(espera)
+
+
+class PlanilhaLimitada:
+    """Envolve um ``gspread.Worksheet`` passando cada chamada à API pelo limitador."""
+
+    def __init__(self, worksheet, limitador, ao_falhar_autenticacao=None):
+        self._worksheet = worksheet
+        self._limitador = limitador
+        self._ao_falhar_autenticacao = ao_falhar_autenticacao
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._worksheet, nome)
+        if nome not in METODOS_API:
+            return atributo
+
+        def chamar(*args, **kwargs):
+            with metricas.medir("api.espera_cota"):
+                self._limitador.adquirir()
+            inicio = time.perf_counter()
+            erro = None
+            try:
+                return atributo(*args, **kwargs)
+            except Exception as e:
+                erro = status_http(e) or type(e).__name__
+                if status_http(e) == 401 and self._ao_falhar_autenticacao:
+                    self._ao_falhar_autenticacao()
+                raise
+            finally:
+                metricas.contar_api(nome, (time.perf_counter() - inicio) * 1000, erro)
+        return chamar
+
+
+class GerenciadorClientes:
+    """Cliente gspread de longa duração, compartilhado por todas as sessões do processo."""
+
+    def __init__(self, credenciais_info, limitador=None, tamanho_pool=10):
+        self._credenciais_info = dict(credenciais_info)
+        self._limitador = limitador or LimitadorTaxa.por_minuto()
+        self._tamanho_pool = tamanho_pool
+        self._lock = threading.Lock()
+        self._cliente = None
+        self._planilhas = {}
+
+    @metricas.medir("conexao.autenticar")
+    def _criar_cliente(self):
+        import gspread
+        from google.oauth2.service_account import Credentials
+        from requests.adapters import HTTPAdapter
+
+        creds = Credentials.from_service_account_info(self._credenciais_info, scopes=ESCOPOS)
+        cliente = gspread.authorize(creds)
+        # gspread >= 6 guarda a sessão em http_client; versões anteriores, direto no cliente.
+        sessao = getattr(getattr(cliente, "http_client", None), "session", None) or getattr(cliente, "session", None)
+        if sessao is not None:
+            adaptador = HTTPAdapter(pool_connections=self._tamanho_pool, pool_maxsize=self._tamanho_pool)
+            sessao.mount("https://", adaptador)
+        return cliente
+
+    def planilha(self, chave, nome_aba):
+        """Devolve a aba ``nome_aba`` da planilha ``chave``, abrindo-a só na primeira vez."""
+        with self._lock:
+            if (chave, nome_aba) not in self._planilhas:
+                if self._cliente is None:
+                    self._cliente = self._criar_cliente()
+                self._limitador.adquirir(2)  # open_by_key + worksheet
+                with metricas.medir("conexao.abrir_planilha"):
+                    worksheet = self._cliente.open_by_key(chave).worksheet(nome_aba)
+                self._planilhas[(chave, nome_aba)] = PlanilhaLimitada(worksheet, self._limitador, self.descartar)
+            return self._planilhas[(chave, nome_aba)]
+
+    def descartar(self):
+        """Esquece cliente e abas abertas; a próxima chamada autentica de novo."""
+        with self._lock:
+            self._cliente = None
+            self._planilhas = {}
@@ -0,0 +1,171 @@
+"""Cronograma mês a mês das parcelas, com correção monetária, VPL e TIR.
+
+A partir dos mesmos dados da simulação (preço, percentuais e quantidade de
+parcelas), gera o fluxo datado: entrada no mês 0, mensais nos meses 1..N,
+semestrais a cada 6 meses e a entrega no mês das chaves. Os valores são
+corrigidos por um índice anual (INCC/IPCA) e trazidos a valor presente por
+uma taxa de desconto anual.
+
+Tudo é vetorizado sobre o portfólio inteiro: o fluxo é montado em formato
+longo (uma linha por parcela) com ``np.repeat``, e VPL/TIR por simulação são
+obtidos com ``np.bincount``, sem matriz densa simulação x mês.
+"""
+import numpy as np
+import pandas as pd
+
+from calculos import calcular_fluxo
+
+COLUNAS_CRONOGRAMA = [
+    'ID', 'Obra', 'Unidade', 'Parcela', 'Nº', 'Mês', 'Vencimento',
+    'Valor Nominal', 'Valor Corrigido', 'Valor Presente',
+]
+
+
+def _sequencias(quantidades):
+    """Para quantidades [2, 3] devolve (donos [0, 0, 1, 1, 1], números [1, 2, 1, 2, 3])."""
+    quantidades = np.maximum(np.asarray(quantidades, dtype=np.int64), 0)
+    donos = np.repeat(np.arange(len(quantidades)), quantidades)
+    inicios = np.repeat(np.cumsum(quantidades) - quantidades, quantidades)
+    return donos, np.arange(len(donos)) - inicios + 1
+
+
+def somar_meses(datas, meses):
+    """Soma ``meses`` a ``datas`` (vetorizado), ajustando o dia ao fim do mês quando preciso."""
+    datas = np.asarray(datas, dtype='datetime64[D]')
+    mes_base = datas.astype('datetime64[M]')
+    dia = (datas - mes_base.astype('datetime64[D]')).astype(np.int64)
+    mes_alvo = mes_base + np.asarray(meses, dtype=np.int64)
+    dias_no_mes = ((mes_alvo + 1).astype('datetime64[D]') - mes_alvo.astype('datetime64[D]')).astype(np.int64)
+    return mes_alvo.astype('datetime64[D]') + np.minimum(dia, dias_no_mes - 1)
+
+
+def gerar_fluxo(preco_total, perc_entrada, perc_mensal, perc_semestral, perc_entrega,
+                num_mensal, num_semestral, data_base, meses_entrega=None,
+                indice_anual=0.0, taxa_desconto_anual=0.0):
+    """Gera o fluxo longo de um ou mais planos (arrays de mesmo tamanho).
+
+    ``indice_anual`` e ``taxa_desconto_anual`` são frações (0.05 = 5% a.a.).
+    ``meses_entrega`` padrão: o mês da última mensal/semestral. Devolve um
+    DataFrame com a coluna ``Simulação`` (posição do plano) e as colunas de
+    valores de ``COLUNAS_CRONOGRAMA``.
+    """
+    preco = np.atleast_1d(np.asarray(preco_total, dtype=float))
+    n = len(preco)
+    num_mensal = np.broadcast_to(np.asarray(num_mensal, dtype=np.int64), n)
+    num_semestral = np.broadcast_to(np.asarray(num_semestral, dtype=np.int64), n)
+    valores = {chave: np.broadcast_to(valor, n) for chave, valor in calcular_fluxo(
+        preco, perc_entrada, perc_mensal, perc_semestral, perc_entrega, num_mensal, num_semestral
+    ).items()}
+    if meses_entrega is None:
+        meses_entrega = np.maximum(num_mensal, 6 * num_semestral)
+    meses_entrega = np.broadcast_to(np.asarray(meses_entrega, dtype=np.int64), n)
+
+    todos = np.arange(n)
+    donos_m, numeros_m = _sequencias(num_mensal)
+    donos_s, numeros_s = _sequencias(num_semestral)
+    partes = [
+        ("Entrada", todos, np.ones(n, dtype=np.int64), np.zeros(n, dtype=np.int64), valores["val_entrada"]),
+        ("Mensal", donos_m, numeros_m, numeros_m, valores["val_por_mensal"][donos_m]),
+        ("Semestral", donos_s, numeros_s, 6 * numeros_s, valores["val_por_semestral"][donos_s]),
+        ("Entrega", todos, np.ones(n, dtype=np.int64), meses_entrega, valores["val_entrega"]),
+    ]
+    simulacao = np.concatenate([p[1] for p in partes])
+    mes = np.concatenate([p[3] for p in partes])
+    nominal = np.concatenate([p[4] for p in partes])
+    corrigido = nominal * (1 + indice_anual) ** (mes / 12)
+    presente = corrigido * (1 + taxa_desconto_anual) ** (-mes / 12)
+    datas_base = np.broadcast_to(np.asarray(data_base, dtype='datetime64[D]'), n)
+
+    fluxo = pd.DataFrame({
+        'Simulação': simulacao,
+        'Parcela': pd.Categorical.from_codes(np.repeat(np.arange(len(partes)), [len(p[1]) for p in partes]),
+                                             categories=[p[0] for p in partes]),
+        'Nº': np.concatenate([p[2] for p in partes]).astype(np.int16),
+        'Mês': mes.astype(np.int16),
+        'Vencimento': somar_meses(datas_base[simulacao], mes),
+        'Valor Nominal': nominal,
+        'Valor Corrigido': corrigido,
+        'Valor Presente': presente,
+    })
+    fluxo = fluxo[fluxo['Valor Nominal'] != 0]
+    return fluxo.sort_values(['Simulação', 'Mês'], kind='stable').reset_index(drop=True)
+
+
+def calcular_tir(simulacao, mes, valor, preco_total, iteracoes=50, tolerancia=1e-10):
+    """TIR mensal de cada simulação: taxa que iguala o valor presente das parcelas ao preço.
+
+    Newton vetorizado sobre todas as simulações ao mesmo tempo; a cada
+    iteração só as parcelas das simulações ainda em aberto são recalculadas.
+    Simulações que não convergem (ex.: todo o fluxo no mês 0) ficam com NaN.
+    """
+    preco = np.asarray(preco_total, dtype=float)
+    n = len(preco)
+    taxa = np.full(n, 0.01)
+    convergiu = np.zeros(n, dtype=bool)
+    abertas = np.ones(n, dtype=bool)
+    with np.errstate(all='ignore'):
+        for _ in range(iteracoes):
+            linhas = abertas[simulacao]
+            sim, m, v = simulacao[linhas], mes[linhas], valor[linhas]
+            desconto = (1 + taxa[sim]) ** -m
+            f = np.bincount(sim, weights=v * desconto, minlength=n) - preco
+            derivada = np.bincount(sim, weights=-m * v * desconto / (1 + taxa[sim]), minlength=n)
+            passo = f / derivada
+            taxa = np.where(abertas, taxa - passo, taxa)
+            convergiu |= abertas & (np.abs(passo) < tolerancia)
+            abertas &= ~convergiu & np.isfinite(taxa) & (taxa > -1)
+            if not abertas.any():
+                break
+    return np.where(convergiu & (taxa > -1), taxa, np.nan)
+
+
+def resumir_fluxo(fluxo, preco_total):
+    """VPL e TIR (mensal e anual) por simulação, a partir do fluxo de ``gerar_fluxo``."""
+    preco = np.atleast_1d(np.asarray(preco_total, dtype=float))
+    n = len(preco)
+    simulacao = fluxo['Simulação'].to_numpy()
+    mes = fluxo['Mês'].to_numpy(dtype=float)
+    corrigido = fluxo['Valor Corrigido'].to_numpy()
+    tir = calcular_tir(simulacao, mes, corrigido, preco)
+    return pd.DataFrame({
+        'Total Corrigido': np.bincount(simulacao, weights=corrigido, minlength=n),
+        'VPL': np.bincount(simulacao, weights=fluxo['Valor Presente'].to_numpy(), minlength=n),
+        'TIR Mensal': tir,
+        'TIR Anual': (1 + tir) ** 12 - 1,
+    })
+
+
+def cronograma_simulacoes(df, indice_anual=0.0, taxa_desconto_anual=0.0, meses_entrega=None, data_base=None):
+    """Fluxo e resumo das simulações salvas (DataFrame no formato da planilha).
+
+    A data base de cada simulação é a sua ``Data/Hora`` (ou ``data_base``, se
+    informada). Devolve ``(fluxo, resumo)`` com as colunas ``ID``/``Obra``/``Unidade``.
+    """
+    if data_base is None:
+        datas = pd.to_datetime(df['Data/Hora'], errors='coerce').fillna(pd.Timestamp.today().normalize())
+        data_base = datas.to_numpy(dtype='datetime64[D]')
+    fluxo = gerar_fluxo(
+        df['Preco Total'].to_numpy(), df['% Entrada'].to_numpy(), df['% Mensal'].to_numpy(),
+        df['% Semestral'].to_numpy(), df['% Entrega'].to_numpy(),
+        df['Nº Mensal'].to_numpy(), df['Nº Semestral'].to_numpy(), data_base,
+        meses_entrega=meses_entrega, indice_anual=indice_anual, taxa_desconto_anual=taxa_desconto_anual,
+    )
+    identificacao = df[['ID', 'Obra', 'Unidade']].reset_index(drop=True)
+    resumo = pd.concat([identificacao, resumir_fluxo(fluxo, df['Preco Total'].to_numpy())], axis=1)
+    posicoes = fluxo.pop('Simulação').to_numpy()
+    for col in ['ID', 'Obra', 'Unidade']:
+        fluxo[col] = identificacao[col].take(posicoes).reset_index(drop=True)
+    return fluxo[COLUNAS_CRONOGRAMA], resumo
+
+
+def exportar_csv(df, destino, bloco=5000, **parametros):
+    """Grava o cronograma das simulações de ``df`` em CSV, ``bloco`` simulações por vez.
+
+    ``destino`` é um caminho ou arquivo texto aberto; ``parametros`` são
+    repassados a ``cronograma_simulacoes``. A memória usada depende do tamanho
+    do bloco, não do portfólio.
+    """
+    for inicio in range(0, max(len(df), 1), bloco):
+        fluxo, _ = cronograma_simulacoes(df.iloc[inicio:inicio + bloco], **parametros)
+        fluxo.to_csv(destino, mode='w' if inicio == 0 else 'a', header=inicio == 0, index=False,
+                     sep=';', decimal=',', float_format='%.2f', date_format='%d/%m/%Y')
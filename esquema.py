@@ -0,0 +1,160 @@
+"""Esquema tipado das colunas da planilha de simulações.
+
+A planilha devolve tudo como texto no formato PT-BR. ``converter_dados``
+converte todas as colunas numéricas em uma única passada vetorizada e aplica
+tipos compactos: ``Obra`` categórica, quantidades de parcelas em ``int16`` e
+``Data/Hora`` como ``datetime64``. Percentuais ficam em ``float64``, como os
+valores em reais: em ``float32`` 33,33% de R$ 1.000.000 viraria R$ 333.300,02.
+"""
+import numpy as np
+import pandas as pd
+
+COLUNA_ID = 'ID'
+
+OBRAS = ["Burj Lavie", "Lavie Areia Dourada", "The Well By OM25 e Lavie", "Lavie Camboinha", "Arc Space"]
+
+FORMATO_DATA_HORA = "%Y-%m-%d %H:%M:%S"
+
+# Coluna -> tipo lógico, na ordem das colunas A:O da planilha.
+ESQUEMA = {
+    'Obra': 'categoria',
+    'Unidade': 'texto',
+    'Preco Total': 'moeda',
+    '% Entrada': 'percentual',
+    'Valor Entrada': 'moeda',
+    '% Mensal': 'percentual',
+    'Nº Mensal': 'inteiro',
+    'Valor Mensal': 'moeda',
+    '% Semestral': 'percentual',
+    'Nº Semestral': 'inteiro',
+    'Valor Semestral': 'moeda',
+    '% Entrega': 'percentual',
+    'Valor Entrega': 'moeda',
+    'Data/Hora': 'datahora',
+    COLUNA_ID: 'texto',
+}
+
+COLUNAS_PLANILHA = list(ESQUEMA)
+
+DTYPES_NUMERICOS = {'moeda': 'float64', 'percentual': 'float64', 'inteiro': 'int16'}
+
+COLUNAS_NUMERICAS = [col for col, tipo in ESQUEMA.items() if tipo in DTYPES_NUMERICOS]
+
+
+def converter_numeros_ptbr(valores):
+    """Converte um array de textos PT-BR ("R$ 1.234,56", "20,00%") em floats; inválidos viram NaN."""
+    texto = pd.Series(np.asarray(valores, dtype=object).ravel(), dtype=object).astype(str)
+    texto = texto.str.replace(r'[R$\s%.]', '', regex=True).str.replace(',', '.', regex=False)
+    return pd.to_numeric(texto, errors='coerce').to_numpy(dtype=float).reshape(np.shape(valores))
+
+
+def formatar_numeros_ptbr(valores):
+    """Inverso de ``converter_numeros_ptbr`` (vetorizado): 5555.555 -> "5555,56", como ``to_sheet_string``."""
+    return np.char.replace(np.char.mod('%.2f', np.asarray(valores, dtype=float)), '.', ',')
+
+
+def linhas_planilha(df):
+    """Converte um DataFrame numérico com as colunas de dados (A:N) nas linhas de texto da planilha.
+
+    Mesma formatação de ``montar_linha_planilha``: números em PT-BR com duas
+    casas, quantidades de parcelas como inteiros e ``Data/Hora`` já em texto.
+    """
+    if df.empty:
+        return []
+    colunas = []
+    for col in COLUNAS_PLANILHA:
+        if col == COLUNA_ID:
+            continue
+        tipo = ESQUEMA[col]
+        if tipo in ('moeda', 'percentual'):
+            colunas.append(formatar_numeros_ptbr(df[col]).astype(object))
+        elif tipo == 'inteiro':
+            colunas.append(df[col].to_numpy(dtype=np.int64).astype(object))
+        else:
+            colunas.append(df[col].astype(str).to_numpy(dtype=object))
+    return np.column_stack(colunas).tolist()
+
+
+def tipar(df):
+    """Aplica os tipos compactos do esquema às colunas presentes em ``df`` (já numéricas)."""
+    for col, tipo in ESQUEMA.items():
+        if col not in df.columns:
+            continue
+        if tipo in DTYPES_NUMERICOS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(DTYPES_NUMERICOS[tipo])
+        elif tipo == 'categoria':
+            df[col] = df[col].astype('category')
+        elif tipo == 'datahora':
+            df[col] = pd.to_datetime(df[col], format='ISO8601', errors='coerce')
+    return df
+
+
+def converter_datas(valores):
+    """Converte textos de ``Data/Hora`` em ``datetime64``; inválidos viram NaT.
+
+    O formato gravado pelo app é ISO ("2024-03-15 10:00:00"); datas digitadas
+    à mão na planilha no formato brasileiro ("15/03/2024 10:00") também são lidas.
+    """
+    texto = pd.Series(valores, dtype=object)
+    datas = pd.to_datetime(texto, format='ISO8601', errors='coerce')
+    outras = datas.isna() & (texto != "")
+    if outras.any():
+        datas[outras] = pd.to_datetime(texto[outras], format='mixed', dayfirst=True, errors='coerce')
+    return datas.to_numpy()
+
+
+def converter_dados(linhas, cabecalho):
+    """Monta o DataFrame tipado a partir das linhas cruas da planilha.
+
+    Devolve ``(df, invalidas)``, em que ``invalidas`` é um array booleano que
+    marca as linhas sem obra ou com números/datas que não puderam ser lidos.
+    Essas linhas são mantidas (com 0/NaT no lugar do valor ruim) para não
+    deslocar a correspondência com as linhas da planilha.
+    """
+    largura = len(cabecalho)
+    linhas = [(list(linha) + [""] * largura)[:largura] for linha in linhas]
+    df = pd.DataFrame(linhas, columns=cabecalho)
+    invalidas = np.zeros(len(df), dtype=bool)
+
+    numericas = [col for col in COLUNAS_NUMERICAS if col in df.columns]
+    if numericas:
+        bruto = df[numericas].to_numpy(dtype=object)
+        numeros = converter_numeros_ptbr(bruto)
+        invalidas |= (np.isnan(numeros) & (bruto != "")).any(axis=1)
+        df[numericas] = numeros
+    if 'Data/Hora' in df.columns:
+        bruto = df['Data/Hora'].to_numpy(dtype=object)
+        df['Data/Hora'] = converter_datas(bruto)
+        invalidas |= df['Data/Hora'].isna().to_numpy() & (bruto != "")
+    if 'Obra' in df.columns:
+        invalidas |= (df['Obra'].to_numpy(dtype=object) == "")
+    return tipar(df), invalidas
+
+
+def concatenar(df, delta):
+    """Concatena dois frames tipados preservando as colunas categóricas."""
+    if df.empty:
+        return delta.reset_index(drop=True)
+    resultado = pd.concat([df, delta], ignore_index=True)
+    for col, tipo in ESQUEMA.items():
+        if tipo == 'categoria' and col in resultado.columns:
+            resultado[col] = pd.api.types.union_categoricals([df[col], delta[col]])
+    return resultado
+
+
+def substituir_linha(df, posicao, nova):
+    """Sobrescreve a linha ``posicao`` de ``df`` com a primeira linha de ``nova`` (mesmas colunas)."""
+    for col in df.columns:
+        valor = nova[col].iloc[0]
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and valor not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories([valor])
+        df.iloc[posicao, df.columns.get_loc(col)] = valor
+
+
+def formatar_data_hora(valor):
+    """Converte o valor de ``Data/Hora`` de volta para o texto gravado na planilha."""
+    if valor is None or pd.isna(valor):
+        return ""
+    if isinstance(valor, str):
+        return valor
+    return pd.Timestamp(valor).strftime(FORMATO_DATA_HORA)
@@ -0,0 +1,195 @@
+"""Fila de gravação assíncrona (write-behind) para a planilha.
+
+As sessões apenas enfileiram inclusões, alterações e exclusões e seguem
+adiante. Uma thread de fundo, compartilhada pelo processo, agrupa tudo o que
+estiver pendente em uma chamada ``append_rows`` e uma ``batch_update`` (as
+exclusões são feitas uma a uma, depois) e, se a API do
+Google responder com limite de cota (HTTP 429) ou erro temporário (5xx),
+tenta de novo com espera exponencial.
+"""
+import random
+import threading
+import time
+
+from planilha import gerar_id
+
+PENDENTE = "pendente"
+ENVIANDO = "enviando"
+SALVO = "salvo"
+ERRO = "erro"
+
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+def status_http(erro):
+    """Extrai o status HTTP de um erro do gspread/requests, se houver."""
+    codigo = getattr(erro, "code", None)
+    if isinstance(codigo, int):
+        return codigo
+    resposta = getattr(erro, "response", None)
+    return getattr(resposta, "status_code", None)
+
+
+def erro_retentavel(erro):
+    """Cota (429), erro 5xx ou falha de rede sem resposta HTTP (queda de conexão, timeout).
+
+    As exceções do ``requests`` derivam de ``OSError``, mas não de
+    ``ConnectionError``/``TimeoutError``; por isso a checagem é por ``OSError``.
+    """
+    status = status_http(erro)
+    if status is not None:
+        return status in STATUS_RETENTAVEIS
+    return isinstance(erro, OSError)
+
+
+class FilaEscrita:
+    """Fila de gravação compartilhada entre as sessões.
+
+    ``sincronizador`` é o ``SincronizadorPlanilha`` que efetivamente escreve
+    na planilha. O estado de cada item (``PENDENTE``, ``ENVIANDO``, ``SALVO`` ou
+    ``ERRO``) fica disponível em ``status`` por ``retencao`` segundos após a
+    conclusão.
+    """
+
+    def __init__(self, sincronizador, janela_lote=0.5, tentativas_max=6,
+                 espera_inicial=1.0, espera_max=60.0, retencao=3600):
+        self._sincronizador = sincronizador
+        self._janela_lote = janela_lote
+        self._tentativas_max = tentativas_max
+        self._espera_inicial = espera_inicial
+        self._espera_max = espera_max
+        self._retencao = retencao
+        self._cond = threading.Condition()
+        self._inclusoes = []
+        self._atualizacoes = {}
+        self._exclusoes = []
+        self._status = {}
+        self._thread = threading.Thread(target=self._executar, name="fila-escrita", daemon=True)
+        self._thread.start()
+
+    def enfileirar_inclusao(self, linha, sim_id=None):
+        """Enfileira uma nova simulação e devolve o ID que ela terá na planilha."""
+        return self.enfileirar_inclusoes([linha], [sim_id])[0]
+
+    def enfileirar_inclusoes(self, linhas, ids=None):
+        """Enfileira várias simulações de uma vez (vão juntas no mesmo ``append_rows``); devolve os IDs."""
+        ids = [sim_id or gerar_id() for sim_id in (ids or [None] * len(linhas))]
+        with self._cond:
+            for sim_id, linha in zip(ids, linhas):
+                self._inclusoes.append((sim_id, list(linha)))
+                self._registrar(sim_id, "inclusão")
+            self._cond.notify()
+        return ids
+
+    def enfileirar_atualizacao(self, sim_id, linha):
+        """Enfileira a alteração de uma simulação; alterações pendentes do mesmo ID são substituídas."""
+        with self._cond:
+            for posicao, (pendente_id, _) in enumerate(self._inclusoes):
+                if pendente_id == sim_id:
+                    # Ainda não foi gravada: basta trocar a linha a incluir.
+                    self._inclusoes[posicao] = (sim_id, list(linha))
+                    return sim_id
+            self._atualizacoes[sim_id] = list(linha)
+            self._registrar(sim_id, "alteração")
+            self._cond.notify()
+        return sim_id
+
+    def enfileirar_exclusao(self, sim_id):
+        """Enfileira a exclusão de uma simulação."""
+        with self._cond:
+            pendentes = len(self._inclusoes)
+            self._inclusoes = [(i, linha) for i, linha in self._inclusoes if i != sim_id]
+            self._atualizacoes.pop(sim_id, None)
+            if len(self._inclusoes) < pendentes:
+                # Nunca chegou à planilha: não há o que excluir.
+                self._status.pop(sim_id, None)
+                return sim_id
+            self._exclusoes.append(sim_id)
+            self._registrar(sim_id, "exclusão")
+            self._cond.notify()
+        return sim_id
+
+    def status(self, item_id):
+        """Estado atual de um item como dicionário, ou ``None`` se desconhecido/expirado."""
+        with self._cond:
+            item = self._status.get(item_id)
+            return dict(item) if item else None
+
+    def pendentes(self):
+        with self._cond:
+            return len(self._inclusoes) + len(self._atualizacoes) + len(self._exclusoes)
+
+    def _registrar(self, item_id, operacao):
+        self._status[item_id] = {
+            "operacao": operacao, "estado": PENDENTE, "tentativas": 0,
+            "erro": None, "atualizado_em": time.time(),
+        }
+
+    def _marcar(self, ids, estado, erro=None):
+        with self._cond:
+            agora = time.time()
+            for item_id in ids:
+                item = self._status.get(item_id)
+                if item is None:
+                    continue
+                item["estado"] = estado
+                item["erro"] = erro
+                item["atualizado_em"] = agora
+                if estado == ENVIANDO:
+                    item["tentativas"] += 1
+
+    def _limpar_concluidos(self):
+        limite = time.time() - self._retencao
+        for item_id in [i for i, item in self._status.items()
+                        if item["estado"] in (SALVO, ERRO) and item["atualizado_em"] < limite]:
+            del self._status[item_id]
+
+    def _executar(self):
+        while True:
+            with self._cond:
+                while not self._inclusoes and not self._atualizacoes and not self._exclusoes:
+                    self._cond.wait()
+            # Dá uma pequena janela para juntar gravações simultâneas em um só lote.
+            time.sleep(self._janela_lote)
+            with self._cond:
+                inclusoes, self._inclusoes = self._inclusoes, []
+                atualizacoes, self._atualizacoes = self._atualizacoes, {}
+                exclusoes, self._exclusoes = self._exclusoes, []
+                self._limpar_concluidos()
+
+            if inclusoes:
+                # Numa repetição, o lote anterior pode ter sido gravado apesar do erro: confere antes.
+                self._enviar([sim_id for sim_id, _ in inclusoes],
+                             lambda repeticao: self._sincronizador.anexar_lote(inclusoes, conferir=repeticao))
+            if atualizacoes:
+                self._enviar(list(atualizacoes),
+                             lambda repeticao: self._sincronizador.atualizar_lote(atualizacoes))
+            for sim_id in exclusoes:
+                self._enviar([sim_id], lambda repeticao, sim_id=sim_id: self._excluir(sim_id, repeticao))
+
+    def _excluir(self, sim_id, repeticao):
+        try:
+            self._sincronizador.excluir(sim_id)
+        except KeyError:
+            # Numa repetição, a exclusão anterior pode ter sido feita apesar do erro.
+            if not repeticao:
+                raise
+
+    def _enviar(self, ids, operacao):
+        """Executa ``operacao(repeticao)`` com novas tentativas; ``repeticao`` é falso só na primeira."""
+        espera = self._espera_inicial
+        for tentativa in range(1, self._tentativas_max + 1):
+            self._marcar(ids, ENVIANDO)
+            try:
+                ausentes = operacao(tentativa > 1) or []
+            except Exception as e:
+                if not erro_retentavel(e) or tentativa == self._tentativas_max:
+                    self._marcar(ids, ERRO, str(e))
+                    return
+                self._marcar(ids, PENDENTE, str(e))
+                time.sleep(espera + random.uniform(0, espera / 2))
+                espera = min(espera * 2, self._espera_max)
+                continue
+            self._marcar([i for i in ids if i not in ausentes], SALVO)
+            self._marcar(ausentes, ERRO, "Simulação não encontrada na planilha.")
+            return
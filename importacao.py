@@ -0,0 +1,176 @@
+"""Importação em lote de uma tabela de vendas (CSV/XLSX) de uma obra.
+
+A tabela traz uma linha por unidade com o preço e, opcionalmente, colunas que
+sobrescrevem o plano de pagamento escolhido (percentuais e quantidades de
+parcelas). ``gerar_simulacoes`` aplica o plano a todas as unidades de uma vez
+com ``calcular_fluxo``, valida cada linha e monta as linhas no formato da
+planilha, prontas para ``Armazenamento.incluir`` gravar em um único lote.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from calculos import calcular_fluxo, percentual_fechado
+from esquema import converter_numeros_ptbr, linhas_planilha
+
+# Campo do plano -> coluna correspondente na planilha de simulações.
+CAMPOS_PLANO = {
+    'perc_entrada': '% Entrada',
+    'perc_mensal': '% Mensal',
+    'perc_semestral': '% Semestral',
+    'perc_entrega': '% Entrega',
+    'num_mensal': 'Nº Mensal',
+    'num_semestral': 'Nº Semestral',
+}
+
+# Nomes aceitos no cabeçalho da tabela (comparados sem acento, caixa ou espaços).
+SINONIMOS = {
+    'Unidade': ['unidade', 'unid', 'sala', 'apto', 'apartamento'],
+    'Preco Total': ['precototal', 'preco', 'valor', 'valortotal', 'precodevenda'],
+    '% Entrada': ['%entrada', 'entrada', 'percentrada'],
+    '% Mensal': ['%mensal', 'mensal', 'mensais', 'percmensal'],
+    '% Semestral': ['%semestral', 'semestral', 'semestrais', 'percsemestral'],
+    '% Entrega': ['%entrega', 'entrega', 'chaves', 'percentrega'],
+    'Nº Mensal': ['nºmensal', 'nmensal', 'nomensal', 'qtdmensal', 'qtdmensais', 'nºmensais'],
+    'Nº Semestral': ['nºsemestral', 'nsemestral', 'nosemestral', 'qtdsemestral', 'qtdsemestrais', 'nºsemestrais'],
+}
+
+
+def _chave(nome):
+    texto = str(nome).strip().lower()
+    for origem, destino in zip("áàâãéêíóôõúç", "aaaaeeiooouc"):
+        texto = texto.replace(origem, destino)
+    return "".join(texto.split()).replace('n°', 'nº').replace('no.', 'nº')
+
+
+def ler_tabela_vendas(arquivo, nome=None):
+    """Lê a tabela de vendas de um caminho ou arquivo aberto (``.csv`` ou ``.xlsx``).
+
+    CSVs podem usar ``;`` ou ``,`` como separador. Devolve um DataFrame de
+    textos com as colunas renomeadas para os nomes da planilha de simulações;
+    colunas não reconhecidas são descartadas.
+    """
+    nome = nome or getattr(arquivo, 'name', None) or str(arquivo)
+    extensao = os.path.splitext(nome)[1].lower()
+    if extensao == '.xlsx':
+        tabela = pd.read_excel(arquivo, dtype=str)
+    elif extensao == '.csv':
+        conteudo = arquivo.read() if hasattr(arquivo, 'read') else open(arquivo, 'rb').read()
+        if isinstance(conteudo, bytes):
+            conteudo = conteudo.decode('utf-8-sig')
+        tabela = pd.read_csv(io.StringIO(conteudo), sep=None, engine='python', dtype=str)
+    else:
+        raise ValueError(f"Formato não suportado: {nome}. Use CSV ou XLSX.")
+
+    renomear = {}
+    for coluna in tabela.columns:
+        chave = _chave(coluna)
+        for destino, nomes in SINONIMOS.items():
+            if chave in nomes or chave == _chave(destino):
+                renomear.setdefault(coluna, destino)
+    tabela = tabela.rename(columns=renomear)
+    tabela = tabela.loc[:, ~tabela.columns.duplicated()]
+    faltando = [col for col in ('Unidade', 'Preco Total') if col not in tabela.columns]
+    if faltando:
+        raise ValueError(f"Coluna(s) obrigatória(s) ausente(s): {', '.join(faltando)}.")
+    return tabela[[col for col in SINONIMOS if col in tabela.columns]].fillna("")
+
+
+def _numeros(serie):
+    """Números de uma coluna da tabela: aceita "1.234,56", "500.000" e "1234.56" (como o Excel exporta).
+
+    Sem vírgula, o ponto seguido de exatamente três dígitos (ou mais de um
+    ponto) é separador de milhar: "500.000" é quinhentos mil. Valores nesse
+    formato com grupos irregulares ("1234.567", "1.25.000") são ambíguos e
+    recusados. Devolve ``(numeros, vazios)``; células vazias viram NaN e são
+    marcadas em ``vazios``, as ilegíveis viram NaN sem a marca.
+    """
+    if pd.api.types.infer_dtype(serie, skipna=True) in ('integer', 'floating', 'mixed-integer-float', 'empty'):
+        # Caminho rápido: valores já numéricos (ex.: pedidos JSON), com None/NaN nas ausências.
+        numeros = serie.to_numpy(dtype=float, na_value=np.nan)
+        return numeros, np.isnan(numeros)
+    texto = serie.fillna("").astype(str).str.strip()
+    limpo = texto.str.replace(r'[R$\s%]', '', regex=True)
+    sem_virgula = ~limpo.str.contains(',', regex=False)
+    milhar = sem_virgula & ((limpo.str.count(r'\.') > 1) | limpo.str.contains(r'\.\d{3}$'))
+    decimal = (sem_virgula & ~milhar).to_numpy()
+    simples = pd.to_numeric(limpo.where(decimal, None), errors='coerce').to_numpy(dtype=float)
+    numeros = np.where(decimal, simples, converter_numeros_ptbr(texto.to_numpy(dtype=object)))
+    numeros[(milhar & ~limpo.str.fullmatch(r'-?\d{1,3}(\.\d{3})+')).to_numpy()] = np.nan
+    return numeros, (texto == "").to_numpy()
+
+
+def gerar_simulacoes(tabela, obra, plano, data_hora, unicas=True, obras_validas=None):
+    """Aplica ``plano`` (dict com as chaves de ``CAMPOS_PLANO``) a todas as unidades de ``tabela``.
+
+    Valores preenchidos nas colunas de sobrescrita da tabela prevalecem sobre o
+    plano. ``obra`` é o nome da obra ou um array com a obra de cada linha; com
+    ``unicas``, a mesma unidade repetida na mesma obra é rejeitada; com
+    ``obras_validas``, obras fora da lista também são rejeitadas. Devolve
+    ``(linhas, relatorio)``: ``linhas`` são as simulações válidas no formato da
+    planilha (colunas A:N) e ``relatorio`` é a tabela calculada, com a coluna
+    ``Erro`` vazia nas linhas válidas.
+    """
+    n = len(tabela)
+    obras = np.broadcast_to(np.asarray(obra, dtype=object), n).astype(str)
+    obras = np.char.strip(obras).astype(object)
+    unidades = tabela['Unidade'].fillna("").astype(str).str.strip().to_numpy(dtype=object)
+    preco, _ = _numeros(tabela['Preco Total'])
+    campos = {}
+    erros = np.full(n, "", dtype=object)
+    for campo, coluna in CAMPOS_PLANO.items():
+        valores = np.full(n, float(plano[campo]))
+        if coluna in tabela.columns:
+            lidos, vazios = _numeros(tabela[coluna])
+            erros = np.where(np.isnan(lidos) & ~vazios & (erros == ""), f"{coluna} inválido", erros)
+            valores = np.where(np.isnan(lidos), valores, lidos)
+        campos[campo] = valores
+    num_mensal = campos['num_mensal']
+    num_semestral = campos['num_semestral']
+
+    fechado = percentual_fechado(campos['perc_entrada'], campos['perc_mensal'],
+                                 campos['perc_semestral'], campos['perc_entrega'])
+    parcelas_validas = ((num_mensal >= 0) & (num_semestral >= 0)
+                        & (num_mensal == np.round(num_mensal)) & (num_semestral == np.round(num_semestral)))
+    repetidas = pd.DataFrame({'Obra': obras, 'Unidade': unidades}).duplicated().to_numpy()
+    validacoes = [
+        (obras != "", "Obra vazia"),
+        (np.isin(obras, list(obras_validas)) if obras_validas is not None else True, "Obra desconhecida"),
+        (unidades != "", "Unidade vazia"),
+        (~(repetidas & unicas), "Unidade repetida na tabela"),
+        (~np.isnan(preco) & (preco > 0), "Preço inválido"),
+        (fechado, "Percentual não fecha 100%"),
+        (parcelas_validas, "Quantidade de parcelas inválida"),
+    ]
+    for valido, mensagem in validacoes:
+        erros = np.where(~valido & (erros == ""), mensagem, erros)
+    ok = erros == ""
+
+    num_mensal = np.where(parcelas_validas, num_mensal, 0).astype(np.int64)
+    num_semestral = np.where(parcelas_validas, num_semestral, 0).astype(np.int64)
+    valores = calcular_fluxo(np.nan_to_num(preco), campos['perc_entrada'], campos['perc_mensal'],
+                             campos['perc_semestral'], campos['perc_entrega'], num_mensal, num_semestral)
+    valores = {chave: np.broadcast_to(valor, n) for chave, valor in valores.items()}
+
+    relatorio = pd.DataFrame({
+        'Obra': obras,
+        'Unidade': unidades,
+        'Preco Total': preco,
+        '% Entrada': campos['perc_entrada'],
+        'Valor Entrada': valores['val_entrada'],
+        '% Mensal': campos['perc_mensal'],
+        'Nº Mensal': num_mensal,
+        'Valor Mensal': valores['val_por_mensal'],
+        '% Semestral': campos['perc_semestral'],
+        'Nº Semestral': num_semestral,
+        'Valor Semestral': valores['val_por_semestral'],
+        '% Entrega': campos['perc_entrega'],
+        'Valor Entrega': valores['val_entrega'],
+        'Erro': erros,
+    })
+
+    validas = relatorio[ok].drop(columns=['Erro'])
+    validas['Data/Hora'] = data_hora
+    return linhas_planilha(validas), relatorio
@@ -0,0 +1,57 @@
+"""Paginação e montagem dos cards da aba "Simulações Salvas".
+
+Os cards de uma página são montados com operações vetorizadas de string do
+pandas (sem ``iterrows``), então o custo de renderização depende do tamanho
+da página, não do total de simulações salvas.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def formatar_moeda(valores):
+    """Versão vetorizada de ``format_currency``: Series numérica -> Series "R$ 1.234,56"."""
+    valores = pd.to_numeric(pd.Series(valores), errors='coerce').fillna(0)
+    centavos = np.round(valores.abs().to_numpy(dtype=float) * 100).astype(np.int64)
+    inteiros = pd.Series(centavos // 100, index=valores.index).astype(str)
+    inteiros = inteiros.str.replace(r'\B(?=(\d{3})+(?!\d))', '.', regex=True)
+    decimais = pd.Series(centavos % 100, index=valores.index).astype(str).str.zfill(2)
+    sinal = pd.Series(np.where(valores.to_numpy() < 0, "-", ""), index=valores.index)
+    return "R$ " + sinal + inteiros + "," + decimais
+
+
+def paginar(df, pagina, tamanho):
+    """Recorta a página ``pagina`` (1-based) e devolve ``(df_pagina, total_paginas)``."""
+    total_paginas = max(1, math.ceil(len(df) / tamanho))
+    pagina = min(max(1, pagina), total_paginas)
+    inicio = (pagina - 1) * tamanho
+    return df.iloc[inicio:inicio + tamanho], total_paginas
+
+
+def montar_cards_html(df):
+    """Monta o HTML do card de cada simulação; devolve uma Series alinhada ao índice de ``df``."""
+    if df.empty:
+        return pd.Series(dtype=str)
+    num_mensal = df['Nº Mensal'].fillna(0).astype(int)
+    num_semestral = df['Nº Semestral'].fillna(0).astype(int)
+    valor_mensal = df['Valor Mensal'].fillna(0)
+    valor_semestral = df['Valor Semestral'].fillna(0)
+    total_mensal = formatar_moeda(valor_mensal * num_mensal)
+    total_semestral = formatar_moeda(valor_semestral * num_semestral)
+    return (
+        """
+            <div class="lavie-card" style="margin-bottom:0;">
+                <div style="display:flex; justify-content:space-between; margin-bottom:15px; border-bottom:1px solid rgba(255,255,255,0.1); padding-bottom:10px;">
+                    <span style="font-size:1.1rem; font-weight:bold;">""" + df['Obra'].astype(str) + """</span>
+                    <span style="background:rgba(227,112,38,0.2); color:#E37026; padding:4px 10px; border-radius:12px; font-size:0.8rem;">Unidade """ + df['Unidade'].astype(str) + """</span>
+                </div>
+                <div class="stats-grid">
+                    <div class="stat-item"><span class="stat-label">Preço</span><span class="stat-value highlight">""" + formatar_moeda(df['Preco Total']) + """</span></div>
+                    <div class="stat-item"><span class="stat-label">Entrada</span><span class="stat-value">""" + formatar_moeda(df['Valor Entrada']) + """</span></div>
+                    <div class="stat-item"><span class="stat-label">Mensais (""" + num_mensal.astype(str) + """x)</span><span class="stat-value">""" + formatar_moeda(valor_mensal) + """</span><span class="stat-sub">Total: """ + total_mensal + """</span></div>
+                    <div class="stat-item"><span class="stat-label">Semestrais (""" + num_semestral.astype(str) + """x)</span><span class="stat-value">""" + formatar_moeda(valor_semestral) + """</span><span class="stat-sub">Total: """ + total_semestral + """</span></div>
+                </div>
+            </div>
+            """
+    )
@@ -1,10 +1,28 @@
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
+import io
+import tempfile
+import numpy as np
 import pandas as pd
 import altair as alt
-import time
+
+from agregados import LARGURA_FAIXA_PRECO, AgregadosCarteira
+from calculos import calcular_simulacao
+from cronograma import exportar_csv, gerar_fluxo, resumir_fluxo
+from armazenamento import criar_armazenamento, filtrar_simulacoes
+from conexao import GerenciadorClientes, LimitadorTaxa
+from listagem import montar_cards_html, paginar
+from negociacao import buscar_distribuicoes
+from esquema import OBRAS, formatar_data_hora
+from importacao import CAMPOS_PLANO, gerar_simulacoes, ler_tabela_vendas
+from fila_escrita import PENDENTE, ENVIANDO, SALVO, ERRO
+import metricas
+from tema import APP_STYLE_CSS
+from propostas import FORMATOS, gerar_propostas
+
+# Limites da geração de propostas pela tela (o zip inteiro fica na memória da sessão para o download).
+LIMITE_PROPOSTAS_TELA = {"html": 5000, "pdf": 1000}
+TAMANHO_MAX_ZIP_TELA = 100 * 2**20
 
 st.set_page_config(
     page_title="Simulador de Negociação",
@@ -13,104 +31,8 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-APP_STYLE_CSS = """
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-@import url('https://fonts.googleapis.com/css2?family=Material+Symbols+Rounded:opsz,wght,FILL,GRAD@24,400,1,0');
-
-/* Fundo Geral */
-[data-testid="stAppViewContainer"] {
-    background: radial-gradient(circle at 10% 20%, #101012 0%, #000000 90%);
-    font-family: 'Inter', sans-serif;
-    color: #ffffff;
-}
-
-/* --- O SEGREDO DO GRADIENTE NOS INPUTS --- */
-
-/* 1. Aplica o gradiente no Wrapper (A caixa de fora) */
-div[data-testid="stVerticalBlockBorderWrapper"] {
-    background-color: transparent !important; /* Remove cor sólida padrão */
-    
-    /* O GRADIENTE LAVIE */
-    background: linear-gradient(160deg, #1e1e24 0%, #0a0a0c 100%) !important;
-    
-    border: 1px solid rgba(255, 255, 255, 0.08) !important;
-    border-radius: 16px !important;
-    box-shadow: 0 10px 30px rgba(0, 0, 0, 0.5) !important;
-    padding: 24px !important;
-    margin-bottom: 20px !important;
-}
-
-/* 2. FORÇA BRUTA: Torna transparente a caixa de dentro (stVerticalBlock) */
-/* Se isso não for feito, o Streamlit pinta um fundo cinza por cima do gradiente */
-div[data-testid="stVerticalBlockBorderWrapper"] > div {
-    background-color: transparent !important;
-}
-
-/* Inputs */
-div[data-baseweb="input"] > div, 
-div[data-baseweb="select"] > div, 
-div[data-baseweb="base-input"] {
-    background-color: rgba(255, 255, 255, 0.05) !important;
-    border: 1px solid rgba(255, 255, 255, 0.1) !important;
-    color: white !important;
-    border-radius: 8px !important;
-    height: 48px;
-}
-
-/* Text Area (Resumo) */
-div[data-baseweb="textarea"] > div {
-    height: auto !important;
-    background-color: rgba(255, 255, 255, 0.05) !important;
-    border: 1px solid rgba(255, 255, 255, 0.1) !important;
-    color: white !important;
-    border-radius: 8px !important;
-}
-
-/* Texto dos Inputs */
-div[data-testid="stNumberInput"] input, 
-div[data-testid="stTextInput"] input {
-    color: white !important;
-    font-family: 'Inter', sans-serif;
-}
-label[data-testid="stLabel"] {
-    color: rgba(255, 255, 255, 0.6) !important;
-    font-size: 0.85rem !important;
-    margin-bottom: 8px;
-}
-
-/* Headers */
-.section-header { display: flex; align-items: center; margin-bottom: 20px; }
-.section-icon {
-    font-family: 'Material Symbols Rounded'; font-size: 22px; margin-right: 10px;
-    color: #E37026; background: rgba(227, 112, 38, 0.15); padding: 6px;
-    border-radius: 8px; display: inline-flex; align-items: center; justify-content: center;
-}
-.section-title { font-size: 1.05rem; font-weight: 600; color: #fff; }
-
-/* CARD DE RESULTADO (HTML - Já estava certo) */
-.lavie-card {
-    background: linear-gradient(160deg, #1e1e24 0%, #0a0a0c 100%) !important;
-    border: 1px solid rgba(255, 255, 255, 0.08);
-    border-radius: 16px;
-    padding: 30px;
-    box-shadow: 0 15px 40px rgba(0, 0, 0, 0.6);
-    margin-top: 10px;
-}
-
-.stats-grid {
-    display: grid; grid-template-columns: repeat(4, 1fr); gap: 20px; width: 100%;
-}
-@media (max-width: 800px) { .stats-grid { grid-template-columns: 1fr 1fr; } }
-
-.stat-item { display: flex; flex-direction: column; }
-.stat-label { font-size: 0.75rem; color: #888; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 6px; font-weight: 600; }
-.stat-value { font-size: 1.4rem; color: #fff; font-weight: 700; letter-spacing: -0.5px; margin-bottom: 2px; }
-.stat-value.highlight { color: #E37026; }
-.stat-sub { font-size: 0.8rem; color: #555; }
-</style>
-"""
 st.markdown(APP_STYLE_CSS, unsafe_allow_html=True)
+metricas.configurar_log()
 
 def render_header(icon_name, title):
     st.markdown(f"""
@@ -128,49 +50,47 @@ def format_currency(value):
 def to_sheet_string(value):
     """Converte um float (ex: 5555.56) para uma string PT-BR (ex: "5555,56")"""
     return f"{value:.2f}".replace('.', ',')
-    
-@st.cache_resource(ttl=60)
-def get_worksheet():
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
+
+def montar_linha_planilha(obra, unidade, preco_total, perc_entrada, perc_mensal, perc_semestral,
+                          perc_entrega, num_mensal, num_semestral, valores, data_hora):
+    """Monta a linha (colunas A:N) no formato gravado na planilha."""
+    return [
+        obra, unidade, to_sheet_string(preco_total),
+        to_sheet_string(perc_entrada), to_sheet_string(valores["val_entrada"]),
+        to_sheet_string(perc_mensal), num_mensal, to_sheet_string(valores["val_por_mensal"]),
+        to_sheet_string(perc_semestral), num_semestral, to_sheet_string(valores["val_por_semestral"]),
+        to_sheet_string(perc_entrega), to_sheet_string(valores["val_entrega"]), data_hora
     ]
-    try:
-        creds_dict = st.secrets["gcp_service_account"]
-        creds = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-        client = gspread.authorize(creds)
 
+@metricas.monitorar_cache(st.cache_resource)
+def get_gerenciador_clientes():
+    limite = st.secrets.get("limite_api", {}).get("requisicoes_por_minuto", 60)
+    return GerenciadorClientes(st.secrets["gcp_service_account"], limitador=LimitadorTaxa.por_minuto(limite))
+
+def get_worksheet():
+    try:
         spreadsheet_key = st.secrets["spreadsheet_info"]["spreadsheet_key"]
         worksheet_name = st.secrets["spreadsheet_info"]["worksheet_name"]
-        spreadsheet = client.open_by_key(spreadsheet_key)
-        worksheet = spreadsheet.worksheet(worksheet_name)
-        return worksheet
+        with metricas.medir("get_worksheet"):
+            return get_gerenciador_clientes().planilha(spreadsheet_key, worksheet_name)
     except Exception as e:
         st.error(f"Erro na planilha: {e}")
         return None
 
-@st.cache_data(ttl=5) 
+@metricas.monitorar_cache(st.cache_resource)
+def get_armazenamento():
+    return criar_armazenamento(st.secrets.get("armazenamento", {}), get_worksheet)
+
+@metricas.monitorar_cache(st.cache_resource)
+def get_agregados():
+    agregados = AgregadosCarteira()
+    get_armazenamento().inscrever(agregados)
+    return agregados
+
+@metricas.monitorar_cache(st.cache_data(ttl=5))
 def carregar_dados_planilha():
     try:
-        sheet = get_worksheet()
-        if sheet is None: return pd.DataFrame()
-
-        data = sheet.get_all_values()
-        if not data or len(data) < 2: return pd.DataFrame()
-
-        df = pd.DataFrame(data[1:], columns=data[0])
-        cols_para_converter = [
-            'Preco Total', 'Valor Entrada', 'Valor Mensal', 'Valor Semestral', 'Valor Entrega',
-            '% Entrada', '% Mensal', '% Semestral', '% Entrega',
-            'Nº Mensal', 'Nº Semestral'
-        ]
-        for col in cols_para_converter:
-            if col in df.columns:
-                df[col] = pd.to_numeric(
-                    df[col].astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
-                    errors='coerce'
-                ).fillna(0)
-        return df
+        return get_armazenamento().listar()
     except Exception as e:
         st.error(f"Erro ao carregar: {e}")
         return pd.DataFrame()
@@ -206,8 +126,34 @@ def reset_to_default_values():
         if key in st.session_state: del st.session_state[key]
 
 
+def registrar_gravacao(item_id, descricao):
+    """Guarda na sessão os itens enviados à fila de gravação, para exibir o status."""
+    st.session_state.setdefault("gravacoes", []).append((item_id, descricao))
+
+def render_status_gravacoes():
+    gravacoes = st.session_state.get("gravacoes", [])
+    if not gravacoes: return
+    armazenamento = get_armazenamento()
+    icones = {PENDENTE: "schedule", ENVIANDO: "sync", SALVO: "check_circle", ERRO: "error"}
+    cores = {PENDENTE: "#888", ENVIANDO: "#E37026", SALVO: "#09ab3b", ERRO: "#ff4b4b"}
+    linhas = []
+    for item_id, descricao in reversed(gravacoes[-10:]):
+        status = armazenamento.status(item_id)
+        estado = status["estado"] if status else SALVO
+        detalhe = f" ({status['erro']})" if status and status["erro"] and estado != SALVO else ""
+        linhas.append(f"""
+            <div style="display:flex; align-items:center; color:{cores[estado]}; margin-bottom:4px;">
+                <span class="material-symbols-rounded" style="font-size:18px; margin-right:6px;">{icones[estado]}</span>
+                <span>{descricao}: {estado}{detalhe}</span>
+            </div>""")
+    with st.expander("Gravações desta sessão"):
+        st.markdown("".join(linhas), unsafe_allow_html=True)
+        if st.button("Atualizar status", key="atualizar_gravacoes"): st.rerun(scope="fragment")
+
+
 @st.dialog("Editar Simulação")
-def edit_dialog(row_data, sheet, sheet_row_index):
+@metricas.rerun("edit_dialog", st.session_state)
+def edit_dialog(row_data):
     st.markdown(f"Editando **{row_data['Obra']}** | Unidade: **{row_data['Unidade']}**")
 
     if "edit_total_percent" not in st.session_state:
@@ -263,53 +209,32 @@ def edit_dialog(row_data, sheet, sheet_row_index):
     if st.button("Salvar Alterações", type="primary", use_container_width=True):
         if round(total_percent, 1) != 100.0:
             st.error(f"O percentual total deve ser 100% para salvar (Atual: {total_percent:.1f}%).")
+        elif pd.isna(row_data['Data/Hora']) and row_data['ID'] in get_armazenamento().ids_invalidos():
+            # Data ilegível na planilha: salvar gravaria a célula em branco no lugar do texto original.
+            st.error("A Data/Hora desta simulação na planilha não pôde ser lida. Corrija a célula na planilha antes de salvar.")
         else:
-            val_entrada = (preco_total * perc_entrada) / 100
-            val_total_mensal = (preco_total * perc_mensal) / 100
-            val_total_semestral = (preco_total * perc_semestral) / 100
-            val_entrega = (preco_total * perc_entrega) / 100
-            val_por_mensal = (val_total_mensal / num_mensal) if num_mensal > 0 else 0
-            val_por_semestral = (val_total_semestral / num_semestral) if num_semestral > 0 else 0
-
-            linha_atualizada = [
-                row_data['Obra'], row_data['Unidade'], to_sheet_string(preco_total),
-                to_sheet_string(perc_entrada), to_sheet_string(val_entrada),
-                to_sheet_string(perc_mensal), num_mensal,
-                to_sheet_string(val_por_mensal), to_sheet_string(perc_semestral), 
-                num_semestral, to_sheet_string(val_por_semestral),
-                to_sheet_string(perc_entrega), to_sheet_string(val_entrega),
-                row_data['Data/Hora']
-            ]
+            valores = calcular_simulacao(preco_total, perc_entrada, perc_mensal, perc_semestral,
+                                         perc_entrega, num_mensal, num_semestral)
+            linha_atualizada = montar_linha_planilha(
+                row_data['Obra'], row_data['Unidade'], preco_total, perc_entrada, perc_mensal,
+                perc_semestral, perc_entrega, num_mensal, num_semestral, valores,
+                formatar_data_hora(row_data['Data/Hora'])
+            )
             try:
-                range_to_update = f'A{sheet_row_index}:N{sheet_row_index}'
-                sheet.update(range_to_update, [linha_atualizada], value_input_option='USER_ENTERED')
-                st.toast("Alterações salvas com sucesso!")
+                item_id = get_armazenamento().atualizar(row_data['ID'], linha_atualizada)
+                registrar_gravacao(item_id, f"Alteração {row_data['Obra']} - {row_data['Unidade']}")
+                st.toast("Alterações enviadas para gravação!")
                 carregar_dados_planilha.clear()
                 keys_to_delete = [k for k in st.session_state if k.startswith('edit_')]
                 for k in keys_to_delete: del st.session_state[k]
-                time.sleep(1)
                 st.rerun()
             except Exception as e:
                 st.error(f"Erro ao salvar: {e}")
 
-set_default_values()
-
-try:
-    col1, col2, col3 = st.columns([1, 4, 1])
-    with col2:
-        st.image("LavieC.png", width=750)
-except:
-    pass
-
-st.title("Simulador de Negociação")
-st.markdown("---")
-
-lista_obras = ["Burj Lavie", "Lavie Areia Dourada", "The Well By OM25 e Lavie", "Lavie Camboinha", "Arc Space"]
-obra_selecionada = st.selectbox("Escolha a Obra para simular:", lista_obras, key="obra", label_visibility="collapsed")
-
-tab1, tab2 = st.tabs(["Simular Negociação", "Simulações Salvas"])
-
-with tab1:
+@st.fragment
+@metricas.rerun("simulador", st.session_state)
+def simulador_fragment(obra_selecionada):
+    """Formulário da simulação; roda isolado para não re-executar a aba de simulações salvas."""
     if "summary_text" not in st.session_state: st.session_state.summary_text = ""
     if "data_to_save" not in st.session_state: st.session_state.data_to_save = None
 
@@ -319,7 +244,7 @@ with tab1:
     with col_dados:
         with st.container(border=True):
             render_header("apartment", "Dados da Unidade")
-            unidade = st.text_input("Unidade / Sala", key="main_unidade")
+            st.text_input("Unidade / Sala", key="main_unidade")
             preco_total = st.number_input("Preço Total (R$)", min_value=0.0, step=1000.0, key="main_preco_total", format="%.2f")
     with col_prazos:
         with st.container(border=True):
@@ -337,10 +262,10 @@ with tab1:
             st.session_state.total_percent = st.session_state.perc_entrada + st.session_state.perc_mensal + st.session_state.perc_semestral + st.session_state.perc_entrega
         
         c_flow = st.columns(4)
-        perc_entrada = c_flow[0].number_input("Entrada (%)", 0.0, 100.0, step=1.0, format="%.2f", key="perc_entrada", on_change=calc_pct)
-        perc_mensal = c_flow[1].number_input("Mensais (%)", 0.0, 100.0, step=1.0, format="%.2f", key="perc_mensal", on_change=calc_pct)
-        perc_semestral = c_flow[2].number_input("Semestrais (%)", 0.0, 100.0, step=1.0, format="%.2f", key="perc_semestral", on_change=calc_pct)
-        perc_entrega = c_flow[3].number_input("Entrega (%)", 0.0, 100.0, step=1.0, format="%.2f", key="perc_entrega", on_change=calc_pct)
+        c_flow[0].number_input("Entrada (%)", 0.0, 100.0, step=1.0, format="%.2f", key="perc_entrada", on_change=calc_pct)
+        c_flow[1].number_input("Mensais (%)", 0.0, 100.0, step=1.0, format="%.2f", key="perc_mensal", on_change=calc_pct)
+        c_flow[2].number_input("Semestrais (%)", 0.0, 100.0, step=1.0, format="%.2f", key="perc_semestral", on_change=calc_pct)
+        c_flow[3].number_input("Entrega (%)", 0.0, 100.0, step=1.0, format="%.2f", key="perc_entrega", on_change=calc_pct)
 
         total_percent = st.session_state.total_percent
         color_st = "#09ab3b" if total_percent == 100 else "#ff4b4b"
@@ -355,12 +280,63 @@ with tab1:
         </div>
         """, unsafe_allow_html=True)
 
-    val_entrada = (preco_total * perc_entrada) / 100
-    val_total_mensal = (preco_total * perc_mensal) / 100
-    val_total_semestral = (preco_total * perc_semestral) / 100
-    val_entrega = (preco_total * perc_entrega) / 100
-    val_por_mensal = (val_total_mensal / num_mensal) if num_mensal > 0 else 0
-    val_por_semestral = (val_total_semestral / num_semestral) if num_semestral > 0 else 0
+    with st.expander("Calcular pela capacidade de pagamento", icon=":material/calculate:"):
+        s1, s2 = st.columns(2)
+        max_mensal = s1.number_input("Mensal máxima (R$)", min_value=0.0, step=100.0, value=0.0, format="%.2f", key="solver_max_mensal",
+                                     help="0 = sem limite")
+        max_semestral = s2.number_input("Semestral máxima (R$)", min_value=0.0, step=500.0, value=0.0, format="%.2f", key="solver_max_semestral",
+                                        help="0 = sem limite")
+        min_entrada = s1.number_input("Entrada mínima (%)", 0.0, 100.0, value=10.0, step=1.0, format="%.2f", key="solver_min_entrada")
+        max_entrega = s2.number_input("Entrega máxima (%)", 0.0, 100.0, value=100.0, step=1.0, format="%.2f", key="solver_max_entrega")
+        atual = tuple(st.session_state[chave] for chave in ("perc_entrada", "perc_mensal", "perc_semestral", "perc_entrega"))
+        distribuicoes = None
+        if max_mensal or max_semestral:
+            distribuicoes = buscar_distribuicoes(preco_total, num_mensal, num_semestral, max_mensal or None,
+                                                 max_semestral or None, min_entrada, max_entrega, referencia=atual)
+        if distribuicoes is None:
+            st.info("Informe a mensal ou a semestral máxima para calcular as distribuições.")
+        elif distribuicoes.empty:
+            st.warning("Nenhuma distribuição fecha 100% com essas restrições.")
+        else:
+            st.dataframe(distribuicoes.drop(columns=['Folga Mensal', 'Folga Semestral', 'Distância', 'Diferença']),
+                         use_container_width=True, column_config={
+                             col: st.column_config.NumberColumn(format="R$ %.2f")
+                             for col in ['Valor Entrada', 'Valor Mensal', 'Valor Semestral', 'Valor Entrega']})
+            escolha = st.selectbox("Opção", distribuicoes.index, key="solver_opcao",
+                                   format_func=lambda i: f"{i}: " + " / ".join(f"{distribuicoes.at[i, c]:.1f}%" for c in ['% Entrada', '% Mensal', '% Semestral', '% Entrega']))
+
+            def aplicar_distribuicao(linha):
+                for chave, coluna in [("perc_entrada", '% Entrada'), ("perc_mensal", '% Mensal'),
+                                      ("perc_semestral", '% Semestral'), ("perc_entrega", '% Entrega')]:
+                    st.session_state[chave] = float(linha[coluna])
+                calc_pct()
+
+            st.button("Aplicar ao simulador", on_click=aplicar_distribuicao, args=(distribuicoes.loc[escolha],),
+                      use_container_width=True, key="solver_aplicar")
+
+    resultado_fragment(obra_selecionada)
+
+@st.fragment
+@metricas.rerun("resultado", st.session_state)
+def resultado_fragment(obra_selecionada):
+    """Card de resultado, resumo e gravação; os botões daqui re-executam só este trecho."""
+    unidade = st.session_state.main_unidade
+    preco_total = st.session_state.main_preco_total
+    num_mensal = st.session_state.main_num_mensal
+    num_semestral = st.session_state.main_num_semestral
+    perc_entrada = st.session_state.perc_entrada
+    perc_mensal = st.session_state.perc_mensal
+    perc_semestral = st.session_state.perc_semestral
+    perc_entrega = st.session_state.perc_entrega
+
+    valores = calcular_simulacao(preco_total, perc_entrada, perc_mensal, perc_semestral,
+                                 perc_entrega, num_mensal, num_semestral)
+    val_entrada = valores["val_entrada"]
+    val_total_mensal = valores["val_total_mensal"]
+    val_total_semestral = valores["val_total_semestral"]
+    val_entrega = valores["val_entrega"]
+    val_por_mensal = valores["val_por_mensal"]
+    val_por_semestral = valores["val_por_semestral"]
 
     f_ent = format_currency(val_entrada)
     f_men = format_currency(val_por_mensal)
@@ -386,6 +362,30 @@ with tab1:
     st.markdown(card_html, unsafe_allow_html=True)
     st.markdown("<br>", unsafe_allow_html=True)
 
+    with st.expander("Cronograma de Pagamentos", icon=":material/event_note:"):
+        k1, k2, k3 = st.columns(3)
+        indice = k1.number_input("Correção INCC/IPCA (% a.a.)", 0.0, 50.0, value=0.0, step=0.5, key="cron_indice")
+        desconto = k2.number_input("Taxa de desconto (% a.a.)", 0.0, 50.0, value=0.0, step=0.5, key="cron_desconto")
+        meses_entrega = k3.number_input("Entrega (mês)", min_value=0, step=1,
+                                        value=int(max(num_mensal, 6 * num_semestral)), key="cron_meses_entrega")
+        fluxo = gerar_fluxo(preco_total, perc_entrada, perc_mensal, perc_semestral, perc_entrega,
+                            num_mensal, num_semestral, np.datetime64(datetime.now().date()),
+                            meses_entrega=meses_entrega, indice_anual=indice / 100, taxa_desconto_anual=desconto / 100)
+        resumo = resumir_fluxo(fluxo, [preco_total]).iloc[0]
+        r1, r2, r3 = st.columns(3)
+        r1.metric("Total corrigido", format_currency(resumo['Total Corrigido']))
+        r2.metric("Valor presente (VPL)", format_currency(resumo['VPL']))
+        r3.metric("TIR", "-" if pd.isna(resumo['TIR Anual']) else f"{resumo['TIR Anual'] * 100:.2f}% a.a.")
+        tabela = fluxo.drop(columns=['Simulação'])
+        st.dataframe(tabela, hide_index=True, use_container_width=True, column_config={
+            "Vencimento": st.column_config.DateColumn(format="DD/MM/YYYY"),
+            "Valor Nominal": st.column_config.NumberColumn(format="R$ %.2f"),
+            "Valor Corrigido": st.column_config.NumberColumn(format="R$ %.2f"),
+            "Valor Presente": st.column_config.NumberColumn(format="R$ %.2f"),
+        })
+        st.download_button("Baixar cronograma (CSV)", tabela.to_csv(index=False, sep=';', decimal=',', float_format='%.2f', date_format='%d/%m/%Y'),
+                           file_name=f"cronograma_{unidade or 'simulacao'}.csv", mime="text/csv")
+
     if st.button("Gerar Resumo para Cópia", type="primary", use_container_width=True):
         if not unidade: st.error("Preencha a Unidade.")
         elif preco_total <= 0: st.error("Preço inválido.")
@@ -406,69 +406,276 @@ Entrega ({perc_entrega:.1f}%): {f_entg}
 Data: {dt}
 """
             st.session_state.summary_text = summary
-            st.session_state.data_to_save = [
-                obra_selecionada, unidade, to_sheet_string(preco_total),
-                to_sheet_string(perc_entrada), to_sheet_string(val_entrada),
-                to_sheet_string(perc_mensal), num_mensal, to_sheet_string(val_por_mensal),
-                to_sheet_string(perc_semestral), num_semestral, to_sheet_string(val_por_semestral),
-                to_sheet_string(perc_entrega), to_sheet_string(val_entrega), datetime.now().strftime("%Y-%m-%d")
-            ]
+            st.session_state.data_to_save = montar_linha_planilha(
+                obra_selecionada, unidade, preco_total, perc_entrada, perc_mensal, perc_semestral,
+                perc_entrega, num_mensal, num_semestral, valores, datetime.now().strftime("%Y-%m-%d")
+            )
 
     if st.session_state.get("summary_text"):
         st.markdown("##### Resumo Pronto")
         st.text_area("Copie aqui:", value=st.session_state.summary_text, height=300)
         if st.button("Salvar na Planilha", use_container_width=True):
-            with st.spinner("Salvando..."):
-                try:
-                    sheet = get_worksheet()
-                    if sheet:
-                        nl = st.session_state.data_to_save
-                        nl[-1] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        sheet.append_row(nl, value_input_option='USER_ENTERED')
-                        st.toast("Salvo!", icon="✅"); carregar_dados_planilha.clear()
-                        reset_to_default_values(); time.sleep(1); st.rerun()
-                except Exception as e: st.error(f"Erro: {e}")
-with tab2:
+            nl = st.session_state.data_to_save
+            nl[-1] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            item_id = get_armazenamento().incluir([nl])[0]
+            registrar_gravacao(item_id, f"Inclusão {nl[0]} - {nl[1]}")
+            st.toast("Enviado para gravação!", icon="✅"); carregar_dados_planilha.clear()
+            reset_to_default_values(); st.rerun()
+
+    render_status_gravacoes()
+
+@st.fragment
+@metricas.rerun("simulacoes_salvas", st.session_state)
+def simulacoes_salvas_fragment():
     st.markdown(f"### <span style='color: {st.get_option('theme.primaryColor')};'>Simulações Salvas</span>", unsafe_allow_html=True)
     df = carregar_dados_planilha()
     if df is not None and not df.empty:
-        df = df.sort_values(by="Data/Hora", ascending=False)
-        sheet = get_worksheet()
-        for idx, row in df.iterrows():
-            try:
-                pt = float(row.get('Preco Total', 0)); ve = float(row.get('Valor Entrada', 0))
-                vm = float(row.get('Valor Mensal', 0)); vs = float(row.get('Valor Semestral', 0))
-                nm = int(row.get('Nº Mensal', 0)); ns = int(row.get('Nº Semestral', 0))
-                tm = vm * nm; ts = vs * ns
-            except: continue
-            
-            card_html = f"""
-            <div class="lavie-card" style="margin-bottom:0;">
-                <div style="display:flex; justify-content:space-between; margin-bottom:15px; border-bottom:1px solid rgba(255,255,255,0.1); padding-bottom:10px;">
-                    <span style="font-size:1.1rem; font-weight:bold;">{row['Obra']}</span>
-                    <span style="background:rgba(227,112,38,0.2); color:#E37026; padding:4px 10px; border-radius:12px; font-size:0.8rem;">Unidade {row['Unidade']}</span>
-                </div>
-                <div class="stats-grid">
-                    <div class="stat-item"><span class="stat-label">Preço</span><span class="stat-value highlight">{format_currency(pt)}</span></div>
-                    <div class="stat-item"><span class="stat-label">Entrada</span><span class="stat-value">{format_currency(ve)}</span></div>
-                    <div class="stat-item"><span class="stat-label">Mensais ({nm}x)</span><span class="stat-value">{format_currency(vm)}</span><span class="stat-sub">Total: {format_currency(tm)}</span></div>
-                    <div class="stat-item"><span class="stat-label">Semestrais ({ns}x)</span><span class="stat-value">{format_currency(vs)}</span><span class="stat-sub">Total: {format_currency(ts)}</span></div>
-                </div>
-            </div>
-            """
+        invalidos = get_armazenamento().ids_invalidos()
+        if invalidos:
+            st.warning(f"{len(invalidos)} simulação(ões) com dados inválidos na planilha (valores ilegíveis foram zerados).")
+
+        def voltar_primeira_pagina():
+            st.session_state.pagina_salvas = 1
+
+        with st.expander("Filtros", icon=":material/filter_list:"):
+            f1, f2 = st.columns(2)
+            obras_filtro = f1.multiselect("Obra", sorted(set(lista_obras) | set(df['Obra'].dropna().astype(str))),
+                                          key="filtro_obras", on_change=voltar_primeira_pagina)
+            unidade_filtro = f2.text_input("Unidade", key="filtro_unidade", on_change=voltar_primeira_pagina)
+            periodo = f1.date_input("Período", value=(), key="filtro_periodo", format="DD/MM/YYYY",
+                                    on_change=voltar_primeira_pagina)
+            p1, p2 = f2.columns(2)
+            preco_min = p1.number_input("Preço mín. (R$)", min_value=0.0, step=10000.0, key="filtro_preco_min",
+                                        on_change=voltar_primeira_pagina)
+            preco_max = p2.number_input("Preço máx. (R$)", min_value=0.0, step=10000.0, key="filtro_preco_max",
+                                        on_change=voltar_primeira_pagina)
+
+        filtrado = filtrar_simulacoes(
+            df, obras=obras_filtro, unidade=unidade_filtro.strip(),
+            data_inicio=periodo[0] if len(periodo) > 0 else None,
+            data_fim=periodo[1] if len(periodo) > 1 else None,
+            preco_min=preco_min or None, preco_max=preco_max or None,
+        ).sort_values(by="Data/Hora", ascending=False)
+
+        n1, n2, n3 = st.columns([2, 1, 1])
+        tamanho = n3.selectbox("Por página", [10, 20, 50], key="tamanho_pagina_salvas", on_change=voltar_primeira_pagina)
+        total_paginas = max(1, -(-len(filtrado) // tamanho))
+        if st.session_state.get("pagina_salvas", 1) > total_paginas: st.session_state.pagina_salvas = total_paginas
+        pagina = n2.number_input("Página", min_value=1, max_value=total_paginas, step=1, key="pagina_salvas")
+        n1.caption(f"{len(filtrado)} de {len(df)} simulações · página {pagina} de {total_paginas}")
+
+        pagina_df, _ = paginar(filtrado, pagina, tamanho)
+        with metricas.medir("render.cards"):
+            cards = montar_cards_html(pagina_df)
+        for row, card_html in zip(pagina_df.to_dict("records"), cards):
             st.markdown(card_html, unsafe_allow_html=True)
             st.markdown("")
             with st.expander("Opções"):
                 c1, c2, c3, c4 = st.columns([1, 2, 2, 1])
-                if c1.button(f"Editar {row['Unidade']}", key=f"ed_{idx}"):
-                    if sheet: 
-                        c = sheet.find(row['Data/Hora'])
-                        if c: edit_dialog(row.to_dict(), sheet, c.row)
-                if c4.button(f"Excluir {row['Unidade']}", key=f"dl_{idx}", type="primary"):
-                    if sheet:
-                        c = sheet.find(row['Data/Hora'])
-                        if c:
-                            sheet.delete_rows(c.row); st.toast("Excluído!")
-                            carregar_dados_planilha.clear(); time.sleep(1); st.rerun()
+                if c1.button(f"Editar {row['Unidade']}", key=f"ed_{row['ID']}"):
+                    edit_dialog(row)
+                if c4.button(f"Excluir {row['Unidade']}", key=f"dl_{row['ID']}", type="primary"):
+                    try:
+                        get_armazenamento().excluir(row['ID']); st.toast("Excluído!")
+                        carregar_dados_planilha.clear(); st.rerun(scope="fragment")
+                    except KeyError: st.error("Simulação não encontrada. Atualize a página.")
             st.markdown("<div style='margin-bottom:20px;'></div>", unsafe_allow_html=True)
+        if filtrado.empty: st.info("Nenhuma simulação encontrada com esses filtros.")
+        else:
+            with st.expander("Exportar cronograma das simulações filtradas", icon=":material/download:"):
+                e1, e2 = st.columns(2)
+                indice_exp = e1.number_input("Correção INCC/IPCA (% a.a.)", 0.0, 50.0, value=0.0, step=0.5, key="exp_indice")
+                desconto_exp = e2.number_input("Taxa de desconto (% a.a.)", 0.0, 50.0, value=0.0, step=0.5, key="exp_desconto")
+                if st.button(f"Gerar CSV ({len(filtrado)} simulações)", key="gerar_cronograma_csv"):
+                    with st.spinner("Gerando cronograma..."):
+                        buffer = io.StringIO()
+                        exportar_csv(filtrado, buffer, indice_anual=indice_exp / 100, taxa_desconto_anual=desconto_exp / 100)
+                    st.download_button("Baixar CSV", buffer.getvalue(), file_name="cronograma_simulacoes.csv",
+                                       mime="text/csv", key="baixar_cronograma_csv")
+            with st.expander("Gerar propostas das simulações filtradas", icon=":material/description:"):
+                formato_prop = st.radio("Formato", FORMATOS, format_func=str.upper, horizontal=True, key="propostas_formato")
+                # O download passa pela memória da sessão: lançamentos grandes vão pela linha de comando.
+                if len(filtrado) > LIMITE_PROPOSTAS_TELA[formato_prop]:
+                    st.warning(f"Mais de {LIMITE_PROPOSTAS_TELA[formato_prop]} simulações: refine os filtros ou gere pelo servidor com "
+                               f"`python propostas.py propostas.zip --formato {formato_prop}`.")
+                elif st.button(f"Gerar propostas ({len(filtrado)} simulações)", key="gerar_propostas"):
+                    barra = st.progress(0.0, text="Gerando propostas...")
+                    conteudo_zip = None
+                    try:
+                        with tempfile.TemporaryFile() as arquivo_zip:
+                            gerar_propostas(filtrado, arquivo_zip, formato_prop,
+                                            progresso=lambda feitos, total: barra.progress(feitos / total, text=f"{feitos}/{total} propostas"))
+                            tamanho_zip = arquivo_zip.tell()
+                            if tamanho_zip <= TAMANHO_MAX_ZIP_TELA:
+                                arquivo_zip.seek(0)
+                                conteudo_zip = arquivo_zip.read()
+                    except RuntimeError as e: st.error(str(e))
+                    else:
+                        if conteudo_zip is None:
+                            st.warning(f"O arquivo ficou com {tamanho_zip / 2**20:.0f} MB, grande demais para baixar pela tela. "
+                                       "Refine os filtros ou gere pela linha de comando (`python propostas.py`).")
+                        else:
+                            st.download_button("Baixar propostas (ZIP)", conteudo_zip, file_name=f"propostas_{formato_prop}.zip",
+                                               mime="application/zip", key="baixar_propostas")
     else: st.info("Nenhuma simulação salva.")
+
+@st.fragment
+@metricas.rerun("carteira", st.session_state)
+def carteira_fragment():
+    st.markdown(f"### <span style='color: {st.get_option('theme.primaryColor')};'>Carteira de Recebíveis</span>", unsafe_allow_html=True)
+    # Sincroniza o cache; os agregados são atualizados só com as linhas que mudaram.
+    carregar_dados_planilha()
+    agregados = get_agregados()
+    totais = agregados.totais()
+    if totais.empty:
+        st.info("Nenhuma simulação salva.")
+        return
+
+    obras = st.multiselect("Obras", totais['Obra'].tolist(), default=totais['Obra'].tolist(), key="carteira_obras")
+    totais = totais[totais['Obra'].isin(obras)]
+    m1, m2 = st.columns(2)
+    m1.metric("Simulações", f"{int(totais['Simulações'].sum()):,}".replace(",", "."))
+    m2.metric("Valor total negociado", format_currency(totais['Valor Total'].sum()))
+
+    cores = alt.Scale(scheme="oranges")
+    with st.container(border=True):
+        render_header("payments", "Recebíveis Esperados por Mês")
+        recebiveis = agregados.recebiveis()
+        recebiveis = recebiveis[recebiveis['Obra'].isin(obras)]
+        st.altair_chart(alt.Chart(recebiveis).mark_bar().encode(
+            x=alt.X("yearmonth(Mês):T", title=None),
+            y=alt.Y("sum(Valor):Q", title="R$"),
+            color=alt.Color("Obra:N", scale=cores),
+            tooltip=[alt.Tooltip("yearmonth(Mês):T", title="Mês"), "Obra:N", alt.Tooltip("sum(Valor):Q", format=",.2f")],
+        ), use_container_width=True)
+
+    with st.container(border=True):
+        render_header("donut_large", "Mix do Fluxo")
+        mix = agregados.mix()
+        mix = mix[mix['Obra'].isin(obras)]
+        st.altair_chart(alt.Chart(mix).mark_bar().encode(
+            x=alt.X("sum(Valor):Q", stack="normalize", title="% do valor", axis=alt.Axis(format="%")),
+            y=alt.Y("Obra:N", title=None),
+            color=alt.Color("Parcela:N", scale=cores, sort=["Entrada", "Mensal", "Semestral", "Entrega"]),
+            tooltip=["Obra:N", "Parcela:N", alt.Tooltip("sum(Valor):Q", format=",.2f")],
+        ), use_container_width=True)
+
+    with st.container(border=True):
+        render_header("bar_chart", "Distribuição de Preços")
+        precos = agregados.distribuicao_precos()
+        precos = precos[precos['Obra'].isin(obras)]
+        st.altair_chart(alt.Chart(precos).mark_bar().encode(
+            x=alt.X("Faixa:Q", bin=alt.Bin(step=LARGURA_FAIXA_PRECO), title="Preço (R$)"),
+            y=alt.Y("sum(Quantidade):Q", title="Simulações"),
+            color=alt.Color("Obra:N", scale=cores),
+            tooltip=["Obra:N", alt.Tooltip("Faixa:Q", format=",.0f"), "sum(Quantidade):Q"],
+        ), use_container_width=True)
+
+@st.fragment
+@metricas.rerun("importacao", st.session_state)
+def importacao_fragment(obra_selecionada):
+    """Importa uma tabela de vendas e grava uma simulação por unidade em um único lote."""
+    with st.expander("Importar Tabela de Vendas (CSV/XLSX)", icon=":material/upload_file:"):
+        st.caption("Colunas: Unidade e Preço. Opcionais (sobrescrevem o plano): % Entrada, % Mensal, "
+                   "% Semestral, % Entrega, Nº Mensal e Nº Semestral.")
+        obra = st.selectbox("Obra", lista_obras, index=lista_obras.index(obra_selecionada), key="imp_obra")
+        # Trocar a chave esvazia o uploader depois de uma importação (o valor dele não pode ser atribuído).
+        if "imp_versao" not in st.session_state: st.session_state.imp_versao = 0
+        arquivo = st.file_uploader("Tabela de vendas", type=["csv", "xlsx"], key=f"imp_arquivo_{st.session_state.imp_versao}")
+
+        st.markdown("##### Plano de pagamento")
+        c_plano = st.columns(3)
+        plano = {
+            'perc_entrada': c_plano[0].number_input("Entrada (%)", 0.0, 100.0, value=float(st.session_state.perc_entrada), step=1.0, format="%.2f", key="imp_perc_entrada"),
+            'perc_mensal': c_plano[1].number_input("Mensais (%)", 0.0, 100.0, value=float(st.session_state.perc_mensal), step=1.0, format="%.2f", key="imp_perc_mensal"),
+            'perc_semestral': c_plano[2].number_input("Semestrais (%)", 0.0, 100.0, value=float(st.session_state.perc_semestral), step=1.0, format="%.2f", key="imp_perc_semestral"),
+            'perc_entrega': c_plano[0].number_input("Entrega (%)", 0.0, 100.0, value=float(st.session_state.perc_entrega), step=1.0, format="%.2f", key="imp_perc_entrega"),
+            'num_mensal': c_plano[1].number_input("Qtd. Mensais", min_value=0, step=1, value=int(st.session_state.main_num_mensal), key="imp_num_mensal"),
+            'num_semestral': c_plano[2].number_input("Qtd. Semestrais", min_value=0, step=1, value=int(st.session_state.main_num_semestral), key="imp_num_semestral"),
+        }
+        if arquivo is None: return
+
+        try:
+            tabela = ler_tabela_vendas(arquivo)
+        except Exception as e:
+            st.error(f"Erro ao ler a tabela: {e}"); return
+        sobrescritas = [col for col in CAMPOS_PLANO.values() if col in tabela.columns]
+        if sobrescritas: st.info(f"Colunas que sobrescrevem o plano: {', '.join(sobrescritas)}.")
+
+        data_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        linhas, relatorio = gerar_simulacoes(tabela, obra, plano, data_hora)
+        com_erro = relatorio[relatorio['Erro'] != ""]
+        m1, m2 = st.columns(2)
+        m1.metric("Unidades válidas", len(linhas))
+        m2.metric("Com erro", len(com_erro))
+        if len(com_erro):
+            st.warning("As linhas abaixo não serão importadas:")
+            st.dataframe(com_erro[['Unidade', 'Preco Total', 'Erro']], hide_index=True, use_container_width=True)
+        st.dataframe(relatorio[relatorio['Erro'] == ""].drop(columns=['Erro']).head(200), hide_index=True, use_container_width=True,
+                     column_config={col: st.column_config.NumberColumn(format="R$ %.2f")
+                                    for col in ['Preco Total', 'Valor Entrada', 'Valor Mensal', 'Valor Semestral', 'Valor Entrega']})
+
+        if st.button(f"Importar {len(linhas)} simulações", type="primary", use_container_width=True,
+                     disabled=not linhas, key="imp_confirmar"):
+            try:
+                ids = get_armazenamento().incluir(linhas)
+                registrar_gravacao(ids[0], f"Importação {obra} - {len(ids)} unidades")
+                st.toast(f"{len(ids)} simulações enviadas para gravação!", icon="✅")
+                carregar_dados_planilha.clear()
+            except Exception as e:
+                st.error(f"Erro ao importar: {e}"); return
+            st.session_state.imp_versao += 1
+            st.rerun(scope="fragment")
+
+def admin_ativo():
+    """Painel de diagnóstico só para quem abre o app com ``?debug=<token>`` (``[admin] token`` nos secrets)."""
+    token = st.secrets.get("admin", {}).get("token")
+    return bool(token) and st.query_params.get("debug") == token
+
+def render_painel_diagnostico():
+    with st.sidebar:
+        st.markdown("### Diagnóstico")
+        ultimo = st.session_state.get("metricas_ultimo_rerun")
+        if ultimo:
+            st.caption(f"Último rerun ({ultimo['nome']}): {ultimo['total_ms']:.1f} ms")
+            etapas = pd.DataFrame(list(ultimo["etapas"].items()), columns=["Etapa", "ms"])
+            st.dataframe(etapas.sort_values("ms", ascending=False), hide_index=True, use_container_width=True)
+        st.markdown("##### Percentis (processo)")
+        st.dataframe(pd.DataFrame(metricas.percentis()), hide_index=True, use_container_width=True,
+                     column_config={col: st.column_config.NumberColumn(format="%.1f ms") for col in ["p50", "p90", "p99", "Máx"]})
+        st.markdown("##### Chamadas à API (sessão)")
+        st.json(st.session_state.get("metricas_api", {}))
+        st.markdown("##### Cache (sessão)")
+        cache = st.session_state.get("metricas_cache", {})
+        st.dataframe(pd.DataFrame([{"Cache": nome, "Acertos": c.get("acerto", 0), "Faltas": c.get("falta", 0)}
+                                   for nome, c in cache.items()]), hide_index=True, use_container_width=True)
+        if st.button("Atualizar", key="atualizar_diagnostico"): st.rerun()
+
+with metricas.rerun("app", st.session_state):
+    set_default_values()
+
+    try:
+        col1, col2, col3 = st.columns([1, 4, 1])
+        with col2:
+            st.image("LavieC.png", width=750)
+    except:
+        pass
+
+    st.title("Simulador de Negociação")
+    st.markdown("---")
+
+    lista_obras = list(OBRAS)
+    obra_selecionada = st.selectbox("Escolha a Obra para simular:", lista_obras, key="obra", label_visibility="collapsed")
+
+    tab1, tab2, tab3 = st.tabs(["Simular Negociação", "Simulações Salvas", "Carteira"])
+
+    with tab1:
+        simulador_fragment(obra_selecionada)
+        importacao_fragment(obra_selecionada)
+    with tab2:
+        simulacoes_salvas_fragment()
+    with tab3:
+        carteira_fragment()
+
+if admin_ativo():
+    render_painel_diagnostico()
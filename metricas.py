@@ -0,0 +1,184 @@
+"""Instrumentação leve de tempo por rerun, chamadas à API e uso dos caches.
+
+``medir(etapa)`` (bloco ``with`` ou decorador) cronometra um trecho e registra a duração em duas camadas:
+
+- janelas móveis do processo (últimas ``TAMANHO_JANELA`` medições por etapa),
+  usadas para os percentis do painel de diagnóstico;
+- o rerun em andamento (``rerun``), que acumula as etapas, as chamadas à API
+  e os acertos/faltas de cache da execução atual do script ou fragmento.
+
+Ao fim de cada rerun é emitida uma linha de log estruturado (JSON) no logger
+``simulador.metricas`` e o detalhamento fica em ``estado`` (o
+``st.session_state`` da sessão) para o painel. Trechos executados fora de um
+rerun (ex.: a thread da fila de gravação) entram só nas janelas do processo.
+Este módulo não depende do Streamlit.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+import numpy as np
+
+TAMANHO_JANELA = 500
+PERCENTIS = (50, 90, 99)
+
+logger = logging.getLogger("simulador.metricas")
+
+_janelas = defaultdict(lambda: deque(maxlen=TAMANHO_JANELA))
+_lock = threading.Lock()
+_rerun_atual = contextvars.ContextVar("rerun_atual", default=None)
+_execucao_cache = contextvars.ContextVar("execucao_cache", default=None)
+
+
+class _Rerun:
+    def __init__(self, nome):
+        self.nome = nome
+        self.etapas = defaultdict(float)
+        self.api = Counter()
+        self.cache = defaultdict(Counter)
+
+
+def configurar_log(nivel=logging.INFO):
+    """Envia os logs de métricas para stderr, uma linha JSON por evento (se ainda sem handler)."""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(nivel)
+
+
+def _log(evento, nivel=logging.INFO, **campos):
+    if logger.isEnabledFor(nivel):
+        logger.log(nivel, json.dumps({"evento": evento, "ts": round(time.time(), 3), **campos},
+                                     ensure_ascii=False, default=str))
+
+
+def registrar(etapa, duracao_ms):
+    """Registra uma duração já medida na janela do processo e no rerun atual."""
+    with _lock:
+        _janelas[etapa].append(duracao_ms)
+    rerun = _rerun_atual.get()
+    if rerun is not None:
+        rerun.etapas[etapa] += duracao_ms
+
+
+@contextlib.contextmanager
+def medir(etapa):
+    """Cronometra o bloco ``with`` como ``etapa``."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(etapa, (time.perf_counter() - inicio) * 1000)
+
+
+def contar_api(metodo, duracao_ms, erro=None):
+    """Registra uma chamada à API do Google Sheets (etapa ``api.<metodo>``)."""
+    registrar(f"api.{metodo}", duracao_ms)
+    rerun = _rerun_atual.get()
+    if rerun is not None:
+        rerun.api[metodo] += 1
+    _log("api", logging.DEBUG, metodo=metodo, duracao_ms=round(duracao_ms, 2), erro=erro)
+
+
+def monitorar_cache(decorador_cache, nome=None):
+    """Aplica ``decorador_cache`` (ex.: ``st.cache_data(ttl=5)``) contando acertos e faltas.
+
+    O corpo da função só roda numa falta de cache; o embrulho externo percebe
+    isso por uma flag de contexto. ``clear`` continua disponível.
+    """
+    def aplicar(funcao):
+        nome_cache = nome or funcao.__name__
+
+        @functools.wraps(funcao)
+        def corpo(*args, **kwargs):
+            executou = _execucao_cache.get()
+            if executou is not None:
+                executou.append(True)
+            return funcao(*args, **kwargs)
+
+        cacheada = decorador_cache(corpo)
+
+        @functools.wraps(funcao)
+        def chamar(*args, **kwargs):
+            executou = []
+            token = _execucao_cache.set(executou)
+            try:
+                with medir(f"cache.{nome_cache}"):
+                    return cacheada(*args, **kwargs)
+            finally:
+                _execucao_cache.reset(token)
+                rerun = _rerun_atual.get()
+                if rerun is not None:
+                    rerun.cache[nome_cache]["falta" if executou else "acerto"] += 1
+
+        chamar.clear = getattr(cacheada, "clear", None)
+        return chamar
+    return aplicar
+
+
+@contextlib.contextmanager
+def rerun(nome, estado=None):
+    """Delimita um rerun (script inteiro ou fragmento).
+
+    Dentro de outro rerun (ex.: um fragmento durante o rerun completo), vira só
+    a etapa ``fragmento.<nome>``. Ao terminar um rerun de fora, grava o
+    detalhamento em ``estado['metricas_ultimo_rerun']``, acumula chamadas à API
+    e uso de cache da sessão e emite o log estruturado.
+    """
+    if _rerun_atual.get() is not None:
+        with medir(f"fragmento.{nome}"):
+            yield
+        return
+
+    atual = _Rerun(nome)
+    token = _rerun_atual.set(atual)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = (time.perf_counter() - inicio) * 1000
+        _rerun_atual.reset(token)
+        registrar(f"rerun.{nome}", total)
+        resumo = {
+            "nome": nome, "total_ms": round(total, 2),
+            "etapas": {etapa: round(ms, 2) for etapa, ms in sorted(atual.etapas.items())},
+            "api": dict(atual.api),
+            "cache": {cache: dict(contagem) for cache, contagem in atual.cache.items()},
+        }
+        if estado is not None:
+            _acumular_sessao(estado, atual, resumo)
+        _log("rerun", **resumo)
+
+
+def _acumular_sessao(estado, atual, resumo):
+    estado["metricas_ultimo_rerun"] = resumo
+    api = Counter(estado.get("metricas_api", {}))
+    api.update(atual.api)
+    estado["metricas_api"] = dict(api)
+    cache = {nome: Counter(contagem) for nome, contagem in estado.get("metricas_cache", {}).items()}
+    for nome, contagem in atual.cache.items():
+        cache.setdefault(nome, Counter()).update(contagem)
+    estado["metricas_cache"] = {nome: dict(contagem) for nome, contagem in cache.items()}
+
+
+def percentis():
+    """Percentis (ms) de cada etapa nas janelas móveis do processo, como lista de dicionários."""
+    with _lock:
+        janelas = {etapa: np.fromiter(valores, dtype=float) for etapa, valores in _janelas.items()}
+    linhas = []
+    for etapa, valores in sorted(janelas.items()):
+        if not len(valores):
+            continue
+        linha = {"Etapa": etapa, "Amostras": len(valores)}
+        linha.update({f"p{p}": float(v) for p, v in zip(PERCENTIS, np.percentile(valores, PERCENTIS))})
+        linha["Máx"] = float(valores.max())
+        linhas.append(linha)
+    return linhas
+
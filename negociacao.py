@@ -0,0 +1,95 @@
+"""Modo inverso do simulador: parte da capacidade de pagamento do cliente.
+
+Dado o teto de cada mensal e de cada semestral, a entrada mínima e as
+quantidades de parcelas, ``buscar_distribuicoes`` encontra as divisões de
+percentuais que fecham 100%. A busca cobre a grade inteira de (% Mensal,
+% Semestral) de uma vez; para cada par, a entrada e a entrega ficam
+determinadas em forma fechada (entrada o mais próxima possível do mínimo, o
+restante na entrega), então o custo é de alguns milissegundos.
+"""
+import numpy as np
+import pandas as pd
+
+from calculos import calcular_fluxo
+
+COLUNAS_DISTRIBUICAO = [
+    '% Entrada', '% Mensal', '% Semestral', '% Entrega',
+    'Valor Entrada', 'Valor Mensal', 'Valor Semestral', 'Valor Entrega',
+    'Folga Mensal', 'Folga Semestral', 'Distância', 'Diferença',
+]
+
+
+def _teto_percentual(valor_maximo, quantidade, preco, passo):
+    """Maior percentual (múltiplo de ``passo``) cuja parcela não passa de ``valor_maximo``."""
+    if quantidade <= 0:
+        return 0.0
+    if valor_maximo is None:
+        return 100.0
+    teto = valor_maximo * quantidade / preco * 100
+    # Tolerância para o arredondamento não descartar o próprio teto (ex.: 40,0 virar 39,5).
+    return float(min(100.0, np.floor(teto / passo + 1e-9) * passo))
+
+
+def buscar_distribuicoes(preco_total, num_mensal, num_semestral, max_mensal=None, max_semestral=None,
+                         min_entrada=0.0, max_entrega=100.0, passo=0.5, limite=10, referencia=None):
+    """Divisões viáveis que respeitam os tetos, ordenadas pela proximidade das restrições.
+
+    ``max_mensal``/``max_semestral`` são valores em R$ por parcela (``None`` =
+    sem teto); ``min_entrada`` e ``max_entrega`` são percentuais. A coluna
+    ``Distância`` soma as folgas relativas das parcelas (quanto o cliente ainda
+    poderia pagar por mês/semestre) e o excesso de entrada sobre o mínimo:
+    zero significa usar exatamente a capacidade informada. Empates (ex.: sem
+    nenhum teto, todas as divisões têm distância zero) são desempatados pela
+    ``Diferença``: soma, em pontos percentuais, do quanto a divisão se afasta
+    de ``referencia`` (``(entrada, mensal, semestral, entrega)``, ex.: a
+    divisão atual do formulário; sem ela, a diferença é zero). Devolve até
+    ``limite`` linhas (DataFrame vazio se não houver solução).
+    """
+    if preco_total <= 0:
+        return pd.DataFrame(columns=COLUNAS_DISTRIBUICAO)
+    teto_mensal = _teto_percentual(max_mensal, num_mensal, preco_total, passo)
+    teto_semestral = _teto_percentual(max_semestral, num_semestral, preco_total, passo)
+    mensal, semestral = np.meshgrid(np.arange(0, teto_mensal + passo / 2, passo),
+                                    np.arange(0, teto_semestral + passo / 2, passo), indexing='ij')
+    mensal, semestral = np.round(mensal.ravel(), 6), np.round(semestral.ravel(), 6)
+
+    # Entrada mínima que ainda mantém a entrega dentro do teto; o que sobra vai para a entrega.
+    restante = 100.0 - mensal - semestral
+    entrada = np.maximum(min_entrada, restante - max_entrega)
+    entrega = restante - entrada
+    viavel = entrega >= -1e-9
+    mensal, semestral, entrada = mensal[viavel], semestral[viavel], entrada[viavel]
+    # Arredonda para não carregar resíduos de ponto flutuante (ex.: 30,000000000004).
+    entrega = np.round(np.maximum(entrega[viavel], 0.0), 6)
+    entrada = np.round(entrada, 6)
+
+    valores = calcular_fluxo(preco_total, entrada, mensal, semestral, entrega, num_mensal, num_semestral)
+    folga_mensal = (np.zeros_like(mensal) if not max_mensal or num_mensal <= 0
+                    else 1 - valores['val_por_mensal'] / max_mensal)
+    folga_semestral = (np.zeros_like(semestral) if not max_semestral or num_semestral <= 0
+                       else 1 - valores['val_por_semestral'] / max_semestral)
+    distancia = folga_mensal + folga_semestral + (entrada - min_entrada) / 100
+
+    if referencia is None:
+        diferenca = np.zeros_like(distancia)
+    else:
+        ref_entrada, ref_mensal, ref_semestral, ref_entrega = map(float, referencia)
+        diferenca = (np.abs(entrada - ref_entrada) + np.abs(mensal - ref_mensal)
+                     + np.abs(semestral - ref_semestral) + np.abs(entrega - ref_entrega))
+
+    # Distância arredondada para que resíduos de ponto flutuante não anulem o desempate.
+    ordem = np.lexsort((diferenca, np.round(distancia, 9)))[:limite]
+    return pd.DataFrame({
+        '% Entrada': entrada[ordem],
+        '% Mensal': mensal[ordem],
+        '% Semestral': semestral[ordem],
+        '% Entrega': entrega[ordem],
+        'Valor Entrada': valores['val_entrada'][ordem],
+        'Valor Mensal': valores['val_por_mensal'][ordem],
+        'Valor Semestral': valores['val_por_semestral'][ordem],
+        'Valor Entrega': valores['val_entrega'][ordem],
+        'Folga Mensal': folga_mensal[ordem],
+        'Folga Semestral': folga_semestral[ordem],
+        'Distância': distancia[ordem],
+        'Diferença': diferenca[ordem],
+    })
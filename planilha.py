@@ -0,0 +1,441 @@
+"""Sincronização incremental da planilha de simulações.
+
+O ``SincronizadorPlanilha`` mantém em memória o DataFrame já convertido e, a
+cada atualização, busca em uma única chamada a coluna de IDs e as linhas
+anexadas desde a última leitura. Se a sequência de IDs conhecida mudou
+(linhas excluídas, inseridas ou reordenadas por fora do app) ou a última
+linha conhecida (âncora) não confere, o cache é descartado e a planilha é
+relida por completo. Edições de valores sem mudança de ID só aparecem na
+releitura periódica.
+
+Cada simulação tem um ID único (coluna ``ID``) e o sincronizador mantém um
+índice ID -> número da linha na planilha, usado para editar e excluir sem
+precisar de ``sheet.find``.
+
+Ouvintes inscritos com ``inscrever`` (ex.: os agregados do painel) recebem só
+as linhas incluídas, alteradas ou excluídas; numa releitura completa, a
+diferença é calculada por hash das linhas.
+
+Opcionalmente o cache é persistido em um snapshot em disco (ver
+``snapshot.py``): na partida, os dados do snapshot são servidos de imediato e
+a reconciliação com a planilha roda em segundo plano.
+"""
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+import metricas
+from esquema import COLUNA_ID, concatenar, converter_dados, substituir_linha
+from snapshot import carregar_snapshot, salvar_snapshot
+
+
+class PlanilhaIndisponivel(ConnectionError):
+    """A planilha não pôde ser aberta (``obter_planilha`` devolveu ``None``); vale tentar de novo."""
+
+
+def letra_coluna(numero):
+    """Converte o índice 1-based de uma coluna para a letra A1 (1 -> "A", 27 -> "AA")."""
+    letras = ""
+    while numero > 0:
+        numero, resto = divmod(numero - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def gerar_id():
+    """Gera um ID curto e único para uma simulação."""
+    return uuid.uuid4().hex[:12]
+
+
+class SincronizadorPlanilha:
+    """Cache incremental e thread-safe do conteúdo da planilha.
+
+    ``obter_planilha`` é chamado a cada sincronização e deve devolver o
+    ``gspread.Worksheet`` (ou ``None`` se indisponível). Uma releitura completa
+    é feita a cada ``intervalo_recarga`` segundos como rede de segurança para
+    edições feitas diretamente na planilha, que a âncora não detecta.
+
+    Antes de editar ou excluir, o ID nas linhas indexadas é conferido na
+    planilha (uma única ``batch_get``); se alguém excluiu ou reordenou linhas
+    por fora do app, a planilha é relida e o índice refeito antes de gravar.
+
+    Com ``caminho_snapshot``, o estado é gravado em disco no máximo a cada
+    ``intervalo_snapshot`` segundos (quando houver mudança) e restaurado na
+    criação do objeto.
+    """
+
+    def __init__(self, obter_planilha, intervalo_recarga=300, caminho_snapshot=None, intervalo_snapshot=30):
+        self._obter_planilha = obter_planilha
+        self._intervalo_recarga = intervalo_recarga
+        self._lock = threading.Lock()
+        self._cabecalho = None
+        self._ancora = None
+        self._num_linhas = 0
+        self._df = pd.DataFrame()
+        self._indice = {}
+        self._ids_invalidos = set()
+        self._ultima_recarga = 0.0
+        self._caminho_snapshot = caminho_snapshot
+        self._intervalo_snapshot = intervalo_snapshot
+        self._ultimo_snapshot = 0.0
+        self._alterado = False
+        self._reconciliar = False
+        self._reconciliando = threading.Lock()
+        self._ouvintes = []
+        # Incrementada a cada gravação ou releitura, para a reconciliação detectar corridas.
+        self._versao = 0
+        if caminho_snapshot:
+            self._restaurar_snapshot()
+
+    def dados(self):
+        """Sincroniza com a planilha e devolve uma cópia do DataFrame em cache.
+
+        Logo após restaurar um snapshot, devolve os dados dele sem esperar pela
+        planilha e dispara a reconciliação em segundo plano.
+        """
+        if self._reconciliar:
+            self._iniciar_reconciliacao()
+            return self._df.copy()
+        with self._lock:
+            sheet = self._obter_planilha()
+            if sheet is not None:
+                with metricas.medir("planilha.sincronizar"):
+                    self._sincronizar(sheet)
+            self._gravar_snapshot()
+            return self._df.copy()
+
+    def invalidar(self):
+        """Força uma releitura completa na próxima chamada de ``dados``."""
+        with self._lock:
+            self._cabecalho = None
+
+    def inscrever(self, ouvinte):
+        """Inscreve um ouvinte com ``redefinir(df)``, ``incluir(df)`` e ``remover(df)``.
+
+        O ouvinte recebe de imediato o conteúdo atual via ``redefinir``.
+        """
+        with self._lock:
+            self._ouvintes.append(ouvinte)
+            ouvinte.redefinir(self._df.copy())
+
+    def ids_invalidos(self):
+        """IDs das linhas da planilha sem obra ou com números/datas ilegíveis."""
+        with self._lock:
+            return set(self._ids_invalidos)
+
+    def linha_da_simulacao(self, sim_id):
+        """Número da linha (1-based, contando o cabeçalho) da simulação, ou ``None``."""
+        with self._lock:
+            return self._indice.get(sim_id)
+
+    def anexar_lote(self, linhas, conferir=False):
+        """Anexa simulações em uma única chamada ``append_rows``.
+
+        ``linhas`` é uma lista de pares ``(sim_id, linha)``, com a linha contendo
+        só as colunas de dados. As linhas entram no cache na próxima
+        sincronização incremental. ``append_rows`` não é idempotente: ao
+        repetir um envio que pode ter chegado à planilha (ex.: timeout na
+        resposta), use ``conferir`` para sincronizar antes e pular os IDs que
+        já estão lá.
+        """
+        with self._lock:
+            sheet = self._planilha()
+            if self._cabecalho is None:
+                self._recarregar(sheet)
+            elif conferir:
+                self._sincronizar(sheet)
+            if conferir:
+                linhas = [(sim_id, linha) for sim_id, linha in linhas if sim_id not in self._indice]
+                if not linhas:
+                    return
+            completas = []
+            for sim_id, linha in linhas:
+                completa = self._normalizar(list(linha) + [""] * len(self._cabecalho))
+                completa[self._posicao_id()] = sim_id
+                completas.append(completa)
+            sheet.append_rows(completas, value_input_option='USER_ENTERED')
+            self._versao += 1
+
+    def atualizar_lote(self, atualizacoes):
+        """Sobrescreve as colunas de dados de várias simulações em uma única chamada ``batch_update``.
+
+        ``atualizacoes`` mapeia ``sim_id`` -> linha. IDs que não estão mais no
+        índice (ex.: excluídos nesse meio tempo) são ignorados e devolvidos.
+        """
+        with self._lock:
+            sheet = self._planilha()
+            self._garantir_indice(sheet, atualizacoes)
+            self._conferir_linhas(sheet, atualizacoes)
+            dados, numeros, ausentes = [], {}, []
+            for sim_id, linha in atualizacoes.items():
+                numero = self._indice.get(sim_id)
+                if numero is None:
+                    ausentes.append(sim_id)
+                    continue
+                numeros[sim_id] = numero
+                dados.append({'range': f"A{numero}:{letra_coluna(len(linha))}{numero}", 'values': [linha]})
+            if dados:
+                sheet.batch_update(dados, value_input_option='USER_ENTERED')
+                self._versao += 1
+
+            posicoes = [numero - 2 for numero in numeros.values()]
+            antigas = self._df.iloc[posicoes].copy()
+            for sim_id, numero in numeros.items():
+                completa = self._normalizar(list(atualizacoes[sim_id]) + [""] * len(self._cabecalho))
+                completa[self._posicao_id()] = sim_id
+                nova, invalidas = converter_dados([completa], self._cabecalho)
+                substituir_linha(self._df, numero - 2, nova)
+                self._marcar_invalidas([sim_id], invalidas)
+                self._alterado = True
+            if posicoes:
+                self._notificar('remover', antigas)
+                self._notificar('incluir', self._df.iloc[posicoes].copy())
+            return ausentes
+
+    def excluir(self, sim_id):
+        """Exclui a simulação ``sim_id`` da planilha e reajusta o índice das linhas seguintes.
+
+        Levanta ``KeyError`` se a simulação não está na planilha.
+        """
+        with self._lock:
+            sheet = self._planilha()
+            self._garantir_indice(sheet, [sim_id])
+            self._conferir_linhas(sheet, [sim_id])
+            numero = self._indice.pop(sim_id, None)
+            if numero is None:
+                raise KeyError(f"Simulação não encontrada: {sim_id}")
+            sheet.delete_rows(numero)
+            self._versao += 1
+
+            self._notificar('remover', self._df.iloc[[numero - 2]].copy())
+            self._df = self._df.drop(index=numero - 2).reset_index(drop=True)
+            self._ids_invalidos.discard(sim_id)
+            for outro_id, outro_numero in self._indice.items():
+                if outro_numero > numero:
+                    self._indice[outro_id] = outro_numero - 1
+            self._num_linhas -= 1
+            self._ancora = self._chave_ultima_linha()
+            self._alterado = True
+
+    def _planilha(self):
+        sheet = self._obter_planilha()
+        if sheet is None:
+            raise PlanilhaIndisponivel("Planilha indisponível.")
+        return sheet
+
+    def _garantir_indice(self, sheet, ids):
+        """Carrega a planilha ou busca as linhas novas se algum dos IDs ainda não está no índice."""
+        if self._cabecalho is None:
+            self._recarregar(sheet)
+        elif any(sim_id not in self._indice for sim_id in ids):
+            self._sincronizar(sheet)
+
+    def _conferir_linhas(self, sheet, ids):
+        """Confere se cada ID ainda está na linha indexada; senão, relê a planilha e refaz o índice."""
+        ids = [sim_id for sim_id in ids if sim_id in self._indice]
+        if not ids:
+            return
+        col = letra_coluna(self._posicao_id() + 1)
+        valores = sheet.batch_get([f"{col}{self._indice[sim_id]}" for sim_id in ids])
+        lidos = [valor[0][0] if valor and valor[0] else "" for valor in valores]
+        if lidos != ids:
+            self._recarregar(sheet)
+
+    def _notificar(self, evento, df):
+        for ouvinte in self._ouvintes:
+            getattr(ouvinte, evento)(df)
+
+    def _notificar_recarga(self, antigo):
+        """Após uma releitura completa, avisa os ouvintes só das linhas que mudaram."""
+        if not self._ouvintes:
+            return
+        if (antigo.empty or self._df.empty or COLUNA_ID not in antigo.columns
+                or not antigo[COLUNA_ID].is_unique or not self._df[COLUNA_ID].is_unique):
+            # Sem IDs únicos (ex.: snapshot com linhas copiadas) não dá para casar as linhas.
+            self._notificar('redefinir', self._df.copy())
+            return
+        hash_antigo = pd.Series(pd.util.hash_pandas_object(antigo, index=False).to_numpy(), index=antigo[COLUNA_ID])
+        hash_novo = pd.Series(pd.util.hash_pandas_object(self._df, index=False).to_numpy(), index=self._df[COLUNA_ID])
+        mantidas = hash_antigo.index.intersection(hash_novo.index)
+        iguais = set(mantidas[hash_antigo.loc[mantidas].to_numpy() == hash_novo.loc[mantidas].to_numpy()])
+        removidas = antigo[~antigo[COLUNA_ID].isin(iguais)]
+        incluidas = self._df[~self._df[COLUNA_ID].isin(iguais)]
+        if not removidas.empty:
+            self._notificar('remover', removidas.copy())
+        if not incluidas.empty:
+            self._notificar('incluir', incluidas.copy())
+
+    def _restaurar_snapshot(self):
+        restaurado = carregar_snapshot(self._caminho_snapshot)
+        if restaurado is None:
+            return
+        df, estado = restaurado
+        self._df = df
+        self._cabecalho = estado["cabecalho"]
+        self._num_linhas = estado["num_linhas"]
+        self._ancora = tuple(estado["ancora"]) if self._num_linhas == 0 else estado["ancora"]
+        self._ids_invalidos = set(estado["ids_invalidos"])
+        if self._num_linhas:
+            self._indice = {sim_id: posicao + 2 for posicao, sim_id in enumerate(df[COLUNA_ID])}
+        self._reconciliar = True
+
+    def _iniciar_reconciliacao(self):
+        if self._reconciliando.acquire(blocking=False):
+            threading.Thread(target=self._executar_reconciliacao, name="reconciliacao-planilha", daemon=True).start()
+
+    def _executar_reconciliacao(self):
+        try:
+            # Autenticação e leitura ficam fora do lock: enquanto isso, as sessões seguem
+            # lendo o estado do snapshot (ids_invalidos, inscrever, linha_da_simulacao).
+            sheet = self._obter_planilha()
+            if sheet is None:
+                return
+            versao = self._versao
+            # Releitura completa: pega também edições feitas enquanto o app estava fora do ar.
+            data = sheet.get_all_values()
+            with self._lock:
+                if self._versao != versao:
+                    # Houve gravação durante a leitura: o que foi lido pode estar desatualizado.
+                    data = sheet.get_all_values()
+                self._recarregar(sheet, data)
+                self._gravar_snapshot()
+                self._reconciliar = False
+        finally:
+            self._reconciliando.release()
+
+    def _gravar_snapshot(self):
+        if not self._caminho_snapshot or not self._alterado or self._cabecalho is None:
+            return
+        if time.monotonic() - self._ultimo_snapshot < self._intervalo_snapshot:
+            return
+        estado = {
+            "cabecalho": self._cabecalho,
+            "num_linhas": self._num_linhas,
+            "ancora": list(self._ancora) if isinstance(self._ancora, tuple) else self._ancora,
+            "ids_invalidos": sorted(self._ids_invalidos),
+        }
+        try:
+            salvar_snapshot(self._caminho_snapshot, self._df, estado)
+        except (OSError, ValueError):
+            # O snapshot é só um cache de partida; falhar aqui não pode derrubar a leitura.
+            return
+        self._ultimo_snapshot = time.monotonic()
+        self._alterado = False
+
+    def _normalizar(self, linha):
+        largura = len(self._cabecalho)
+        return (list(linha) + [""] * largura)[:largura]
+
+    def _posicao_id(self):
+        return self._cabecalho.index(COLUNA_ID)
+
+    def _chave_ultima_linha(self):
+        if self._num_linhas == 0:
+            return tuple(self._cabecalho)
+        return self._df[COLUNA_ID].iloc[-1]
+
+    def _chave(self, linha, eh_cabecalho):
+        linha = self._normalizar(linha)
+        return tuple(linha) if eh_cabecalho else linha[self._posicao_id()]
+
+    def _preencher_ids(self, sheet, linhas, primeira_linha):
+        """Gera IDs para as linhas sem ID ou com ID repetido e grava todos em uma única chamada.
+
+        Um ID repetido (ex.: linha copiada na planilha) fica com a primeira
+        ocorrência; as cópias recebem IDs novos.
+        """
+        pos = self._posicao_id()
+        col = letra_coluna(pos + 1)
+        vistos = set(self._indice)
+        pendentes = []
+        for deslocamento, linha in enumerate(linhas):
+            if not linha[pos] or linha[pos] in vistos:
+                linha[pos] = gerar_id()
+                pendentes.append({'range': f"{col}{primeira_linha + deslocamento}", 'values': [[linha[pos]]]})
+            vistos.add(linha[pos])
+        if pendentes:
+            sheet.batch_update(pendentes, value_input_option='RAW')
+
+    def _indexar(self, linhas, primeira_linha):
+        pos = self._posicao_id()
+        for deslocamento, linha in enumerate(linhas):
+            self._indice[linha[pos]] = primeira_linha + deslocamento
+
+    def _marcar_invalidas(self, ids, invalidas):
+        for sim_id, invalida in zip(ids, invalidas):
+            if invalida:
+                self._ids_invalidos.add(sim_id)
+            else:
+                self._ids_invalidos.discard(sim_id)
+
+    def _sincronizar(self, sheet):
+        expirado = time.monotonic() - self._ultima_recarga > self._intervalo_recarga
+        if self._cabecalho is None or expirado:
+            self._recarregar(sheet)
+            return
+
+        # Uma chamada: a coluna de IDs inteira e as linhas a partir da âncora (cabeçalho, se ainda não há dados).
+        inicio = self._num_linhas + 1
+        col_id = letra_coluna(self._posicao_id() + 1)
+        ids, valores = sheet.batch_get([f"{col_id}2:{col_id}", f"A{inicio}:{letra_coluna(len(self._cabecalho))}"])
+        ids = [linha[0] if linha else "" for linha in ids[:self._num_linhas]]
+        conhecidos = self._df[COLUNA_ID].tolist() if self._num_linhas else []
+        if ids != conhecidos or not valores or self._chave(valores[0], self._num_linhas == 0) != self._ancora:
+            self._recarregar(sheet)
+            return
+
+        novas = [self._normalizar(linha) for linha in valores[1:]]
+        if novas:
+            self._preencher_ids(sheet, novas, inicio + 1)
+            self._indexar(novas, inicio + 1)
+            with metricas.medir("planilha.converter"):
+                delta, invalidas = converter_dados(novas, self._cabecalho)
+            self._marcar_invalidas(delta[COLUNA_ID], invalidas)
+            self._df = concatenar(self._df, delta)
+            self._notificar('incluir', delta)
+            self._num_linhas += len(novas)
+            self._ancora = self._chave_ultima_linha()
+            self._alterado = True
+
+    def _recarregar(self, sheet, data=None):
+        antigo = self._df
+        self._carregar_tudo(sheet, data)
+        self._notificar_recarga(antigo)
+
+    def _carregar_tudo(self, sheet, data=None):
+        """Substitui todo o estado pelo conteúdo da planilha (``data``, se já lido com ``get_all_values``)."""
+        if data is None:
+            data = sheet.get_all_values()
+        self._versao += 1
+        self._ultima_recarga = time.monotonic()
+        self._ultimo_snapshot = 0.0
+        self._alterado = True
+        self._indice = {}
+        self._ids_invalidos = set()
+        if not data:
+            self._cabecalho = None
+            self._ancora = None
+            self._num_linhas = 0
+            self._df = pd.DataFrame()
+            return
+
+        self._cabecalho = list(data[0])
+        if COLUNA_ID not in self._cabecalho:
+            # Planilhas antigas: cria a coluna ID logo após a última coluna existente.
+            self._cabecalho.append(COLUNA_ID)
+            sheet.update(range_name=f"{letra_coluna(len(self._cabecalho))}1",
+                         values=[[COLUNA_ID]], value_input_option='RAW')
+
+        linhas = [self._normalizar(linha) for linha in data[1:]]
+        self._num_linhas = len(linhas)
+        self._preencher_ids(sheet, linhas, 2)
+        self._indexar(linhas, 2)
+        if linhas:
+            with metricas.medir("planilha.converter"):
+                self._df, invalidas = converter_dados(linhas, self._cabecalho)
+            self._marcar_invalidas(self._df[COLUNA_ID], invalidas)
+        else:
+            self._df = pd.DataFrame()
+        self._ancora = self._chave_ultima_linha()
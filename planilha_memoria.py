@@ -0,0 +1,124 @@
+"""Aba de planilha em memória com a mesma interface do ``gspread.Worksheet``.
+
+Implementa só os métodos que o app usa (``get_all_values``, ``get_values``,
+``batch_get``, ``append_row``/``append_rows``, ``update``, ``batch_update``, ``find`` e
+``delete_rows``), guardando tudo como texto, como a API do Google devolve.
+Serve para rodar o benchmark e o app sem rede; ``chamadas`` conta quantas
+vezes cada método foi chamado (cada chamada seria uma requisição à API).
+"""
+import re
+import threading
+from collections import Counter, namedtuple
+
+Celula = namedtuple("Celula", ["row", "col", "value"])
+
+_REFERENCIA_A1 = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _numero_coluna(letras):
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + ord(letra) - 64
+    return numero
+
+
+def _referencia(texto):
+    """"B3" -> (3, 2); "B" -> (None, 2); "3" -> (3, None)."""
+    letras, numero = _REFERENCIA_A1.match(texto.upper()).groups()
+    return (int(numero) if numero else None), (_numero_coluna(letras) if letras else None)
+
+
+def _aparar(valores):
+    fim = len(valores)
+    while fim and not valores[fim - 1]:
+        fim -= 1
+    return valores[:fim]
+
+
+class PlanilhaMemoria:
+    """Fake thread-safe de ``gspread.Worksheet``; ``linhas`` inclui o cabeçalho."""
+
+    def __init__(self, linhas=None):
+        self._linhas = [[str(valor) for valor in linha] for linha in (linhas or [])]
+        self._lock = threading.Lock()
+        self.chamadas = Counter()
+
+    def _intervalo(self, intervalo):
+        """Converte "A2:O" / "O1" / "A3:N3" em índices 0-based (linha_ini, col_ini, linha_fim, col_fim)."""
+        inicio, _, fim = intervalo.partition(":")
+        linha_ini, col_ini = _referencia(inicio)
+        linha_fim, col_fim = _referencia(fim) if fim else (linha_ini, col_ini)
+        return ((linha_ini or 1) - 1, (col_ini or 1) - 1,
+                linha_fim or len(self._linhas), col_fim)
+
+    def _escrever(self, intervalo, valores):
+        linha_ini, col_ini, _, _ = self._intervalo(intervalo)
+        for deslocamento, linha in enumerate(valores):
+            numero = linha_ini + deslocamento
+            while len(self._linhas) <= numero:
+                self._linhas.append([])
+            destino = self._linhas[numero]
+            if len(destino) < col_ini + len(linha):
+                destino.extend([""] * (col_ini + len(linha) - len(destino)))
+            destino[col_ini:col_ini + len(linha)] = ["" if v is None else str(v) for v in linha]
+
+    def get_all_values(self):
+        with self._lock:
+            self.chamadas["get_all_values"] += 1
+            return [list(linha) for linha in self._linhas]
+
+    def get_values(self, range_name=None, **kwargs):
+        with self._lock:
+            self.chamadas["get_values"] += 1
+            if range_name is None:
+                return [list(linha) for linha in self._linhas]
+            linha_ini, col_ini, linha_fim, col_fim = self._intervalo(range_name)
+            return [linha[col_ini:col_fim] for linha in self._linhas[linha_ini:linha_fim]]
+
+    def batch_get(self, ranges, **kwargs):
+        with self._lock:
+            self.chamadas["batch_get"] += 1
+            resultado = []
+            for intervalo in ranges:
+                linha_ini, col_ini, linha_fim, col_fim = self._intervalo(intervalo)
+                # Como a API: células vazias no fim de cada linha e linhas vazias no fim são omitidas.
+                valores = [_aparar(linha[col_ini:col_fim]) for linha in self._linhas[linha_ini:linha_fim]]
+                resultado.append(_aparar(valores))
+            return resultado
+
+    def append_row(self, valores, **kwargs):
+        with self._lock:
+            self.chamadas["append_row"] += 1
+            self._linhas.append(["" if v is None else str(v) for v in valores])
+
+    def append_rows(self, valores, **kwargs):
+        with self._lock:
+            self.chamadas["append_rows"] += 1
+            self._linhas.extend([["" if v is None else str(v) for v in linha] for linha in valores])
+
+    def update(self, range_name=None, values=None, **kwargs):
+        with self._lock:
+            self.chamadas["update"] += 1
+            self._escrever(range_name, values)
+
+    def batch_update(self, dados, **kwargs):
+        with self._lock:
+            self.chamadas["batch_update"] += 1
+            for item in dados:
+                self._escrever(item["range"], item["values"])
+
+    def find(self, consulta, in_column=None, **kwargs):
+        """Varre a aba como a API faria; devolve a primeira ``Celula`` igual a ``consulta`` ou ``None``."""
+        with self._lock:
+            self.chamadas["find"] += 1
+            for numero, linha in enumerate(self._linhas, start=1):
+                colunas = [in_column - 1] if in_column else range(len(linha))
+                for coluna in colunas:
+                    if coluna < len(linha) and linha[coluna] == str(consulta):
+                        return Celula(numero, coluna + 1, linha[coluna])
+            return None
+
+    def delete_rows(self, inicio, fim=None):
+        with self._lock:
+            self.chamadas["delete_rows"] += 1
+            del self._linhas[inicio - 1:(fim or inicio)]
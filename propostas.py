@@ -0,0 +1,204 @@
+"""Geração em lote das propostas de negociação (HTML ou PDF) em um arquivo zip.
+
+Cada simulação salva vira um documento com a marca Lavie (``LavieC.png``) e o
+tema de ``tema.APP_STYLE_CSS``. No HTML, o logo vai uma única vez no zip
+(``logo.png``) e os documentos apontam para ele; o PDF precisa embutir a
+imagem em cada arquivo. Os documentos são renderizados em paralelo num
+``ProcessPoolExecutor``: cada processo carrega uma única vez os ativos
+compartilhados (CSS, logo do PDF e, no PDF, as folhas de estilo e fontes já
+processadas) e recebe blocos de simulações. O processo principal
+grava cada bloco no zip assim que ele fica pronto, com no máximo alguns
+blocos em andamento, então a memória não cresce com o tamanho do lançamento.
+
+O formato PDF usa o pacote opcional ``weasyprint``.
+"""
+import argparse
+import base64
+import html
+import importlib.util
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import pandas as pd
+
+from listagem import formatar_moeda
+from tema import APP_STYLE_CSS
+
+CAMINHO_LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "LavieC.png")
+FORMATOS = ("html", "pdf")
+LOGO_ZIP = "logo.png"
+
+COLUNAS_PROPOSTA = [
+    'ID', 'Obra', 'Unidade', 'Preco Total', '% Entrada', 'Valor Entrada', '% Mensal', 'Nº Mensal',
+    'Valor Mensal', '% Semestral', 'Nº Semestral', 'Valor Semestral', '% Entrega', 'Valor Entrega',
+]
+
+CSS_PROPOSTA = """
+@page { size: A4; margin: 0; background: #000000; }
+body {
+    margin: 0; padding: 48px; background: radial-gradient(circle at 10% 20%, #101012 0%, #000000 90%);
+    font-family: 'Inter', sans-serif; color: #ffffff;
+}
+.proposta-logo { display: block; margin: 0 auto 32px auto; max-width: 60%; }
+.proposta-titulo { color: #E37026; font-size: 1.6rem; font-weight: 700; margin: 0 0 4px 0; }
+.proposta-sub { color: #888; font-size: 0.95rem; margin-bottom: 24px; }
+.proposta-preco { font-size: 2rem; font-weight: 700; margin: 8px 0 0 0; }
+.proposta-rodape { color: #555; font-size: 0.8rem; margin-top: 32px; }
+"""
+
+MODELO = """<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Proposta {obra} - {unidade}</title>
+{css}</head><body>
+<img class="proposta-logo" src="{logo}" alt="Lavie">
+<div class="proposta-titulo">Proposta de Negociação</div>
+<div class="proposta-sub">{obra} · Unidade {unidade}</div>
+<div class="lavie-card">
+    <span class="stat-label">Preço Total</span>
+    <div class="proposta-preco">{preco}</div>
+</div>
+<div class="lavie-card">
+    <div class="stats-grid">
+        <div class="stat-item"><span class="stat-label">Entrada ({perc_entrada})</span><span class="stat-value highlight">{entrada}</span><span class="stat-sub">Ato</span></div>
+        <div class="stat-item"><span class="stat-label">Mensais ({num_mensal}x)</span><span class="stat-value">{mensal}</span><span class="stat-sub">Total: {total_mensal}</span></div>
+        <div class="stat-item"><span class="stat-label">Semestrais ({num_semestral}x)</span><span class="stat-value">{semestral}</span><span class="stat-sub">Total: {total_semestral}</span></div>
+        <div class="stat-item"><span class="stat-label">Entrega ({perc_entrega})</span><span class="stat-value">{entrega}</span><span class="stat-sub">Chaves</span></div>
+    </div>
+</div>
+<div class="proposta-rodape">Proposta emitida em {data}. Valores sujeitos a confirmação e disponibilidade da unidade.</div>
+</body></html>
+"""
+
+# Ativos do processo de renderização, carregados uma vez por ``_iniciar_processo``.
+_ativos = {}
+
+
+def _iniciar_processo(formato, caminho_logo):
+    """Inicializador de cada processo do pool: lê e prepara os ativos compartilhados."""
+    if formato == "html":
+        logo = LOGO_ZIP if os.path.exists(caminho_logo) else ""
+    else:
+        try:
+            with open(caminho_logo, "rb") as arquivo:
+                logo = "data:image/png;base64," + base64.b64encode(arquivo.read()).decode("ascii")
+        except OSError:
+            logo = ""
+    css = APP_STYLE_CSS.replace("</style>", CSS_PROPOSTA + "</style>")
+    _ativos.update(formato=formato, logo=logo, css=css, data=datetime.now().strftime("%d/%m/%Y"))
+    if formato == "pdf":
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+
+        # A folha de estilo é processada uma vez e reaproveitada em todos os documentos do processo,
+        # sem os @import do Google Fonts (cada documento buscaria as fontes pela rede).
+        regras = re.sub(r"@import url\([^)]*\);|</?style>", "", css)
+        _ativos["fontes"] = FontConfiguration()
+        _ativos["folha"] = CSS(string=regras, font_config=_ativos["fontes"])
+        _ativos["html"] = HTML
+        _ativos["css"] = ""
+
+
+def nome_arquivo(obra, unidade, sim_id, formato):
+    """Nome seguro e único do documento dentro do zip."""
+    base = re.sub(r"[^\w.-]+", "_", f"{obra}_{unidade}", flags=re.UNICODE).strip("_")
+    return f"{base}_{sim_id}.{formato}"
+
+
+def _renderizar_bloco(registros):
+    """Renderiza um bloco de simulações; devolve ``[(nome_arquivo, bytes)]``."""
+    df = pd.DataFrame.from_records(registros, columns=COLUNAS_PROPOSTA)
+    num_mensal = pd.to_numeric(df['Nº Mensal'], errors='coerce').fillna(0).astype(int)
+    num_semestral = pd.to_numeric(df['Nº Semestral'], errors='coerce').fillna(0).astype(int)
+    campos = pd.DataFrame({
+        'obra': df['Obra'].astype(str).map(html.escape),
+        'unidade': df['Unidade'].astype(str).map(html.escape),
+        'preco': formatar_moeda(df['Preco Total']),
+        'entrada': formatar_moeda(df['Valor Entrada']),
+        'mensal': formatar_moeda(df['Valor Mensal']),
+        'semestral': formatar_moeda(df['Valor Semestral']),
+        'entrega': formatar_moeda(df['Valor Entrega']),
+        'total_mensal': formatar_moeda(df['Valor Mensal'] * num_mensal),
+        'total_semestral': formatar_moeda(df['Valor Semestral'] * num_semestral),
+        'perc_entrada': df['% Entrada'].map("{:.0f}%".format),
+        'perc_entrega': df['% Entrega'].map("{:.0f}%".format),
+        'num_mensal': num_mensal,
+        'num_semestral': num_semestral,
+    })
+    formato = _ativos["formato"]
+    documentos = []
+    for registro, valores in zip(registros, campos.to_dict("records")):
+        documento = MODELO.format(css=_ativos["css"], logo=_ativos["logo"], data=_ativos["data"], **valores)
+        if formato == "pdf":
+            conteudo = _ativos["html"](string=documento).write_pdf(
+                stylesheets=[_ativos["folha"]], font_config=_ativos["fontes"])
+        else:
+            conteudo = documento.encode("utf-8")
+        documentos.append((nome_arquivo(registro['Obra'], registro['Unidade'], registro['ID'], formato), conteudo))
+    return documentos
+
+
+def gerar_propostas(df, destino, formato="html", processos=None, tamanho_bloco=50,
+                    caminho_logo=CAMINHO_LOGO, progresso=None):
+    """Gera uma proposta por simulação de ``df`` (formato da planilha) dentro do zip ``destino``.
+
+    ``destino`` é um caminho ou arquivo binário aberto. ``processos`` padrão:
+    número de CPUs. ``progresso(feitos, total)`` é chamado a cada bloco
+    concluído. Devolve a quantidade de documentos gerados.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    if formato == "pdf" and importlib.util.find_spec("weasyprint") is None:
+        raise RuntimeError("Gerar PDF requer o pacote weasyprint (pip install weasyprint).")
+    registros = df[COLUNAS_PROPOSTA].astype(object).where(df[COLUNAS_PROPOSTA].notna(), None).to_dict("records")
+    blocos = (registros[inicio:inicio + tamanho_bloco] for inicio in range(0, len(registros), tamanho_bloco))
+    processos = processos or os.cpu_count() or 1
+    em_andamento_max = 2 * processos
+    feitos = 0
+    # "spawn": o app roda com várias threads, e fork de processo com threads não é seguro.
+    contexto = multiprocessing.get_context("spawn")
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as arquivo_zip, \
+            ProcessPoolExecutor(max_workers=processos, mp_context=contexto, initializer=_iniciar_processo,
+                                initargs=(formato, caminho_logo)) as pool:
+        if formato == "html" and os.path.exists(caminho_logo):
+            arquivo_zip.write(caminho_logo, LOGO_ZIP)
+        pendentes = set()
+        while True:
+            for bloco in blocos:
+                pendentes.add(pool.submit(_renderizar_bloco, bloco))
+                if len(pendentes) >= em_andamento_max:
+                    break
+            if not pendentes:
+                break
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                for nome, conteudo in futuro.result():
+                    arquivo_zip.writestr(nome, conteudo)
+                    feitos += 1
+            if progresso:
+                progresso(feitos, len(registros))
+    return feitos
+
+
+def main(argv=None):
+    from esquema import OBRAS
+    from servico import SECRETS_PADRAO, Contexto, carregar_secrets
+
+    parser = argparse.ArgumentParser(description="Gera as propostas das simulações salvas em um zip.")
+    parser.add_argument("saida", help="arquivo .zip de destino")
+    parser.add_argument("--obra", action="append", choices=OBRAS, help="filtra por obra (pode repetir)")
+    parser.add_argument("--formato", choices=FORMATOS, default="html")
+    parser.add_argument("--processos", type=int)
+    parser.add_argument("--secrets", default=SECRETS_PADRAO)
+    args = parser.parse_args(argv)
+
+    df = Contexto(carregar_secrets(args.secrets)).armazenamento().consultar(obras=args.obra)
+    total = gerar_propostas(df, args.saida, args.formato, args.processos,
+                            progresso=lambda feitos, total: print(f"\r{feitos}/{total}", end="", flush=True))
+    print(f"\n{total} propostas em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""Serviço HTTP (JSON) e linha de comando para simular negociações sem a interface Streamlit.
+
+Usa o mesmo cálculo (``importacao.gerar_simulacoes`` sobre ``calcular_fluxo``)
+e o mesmo armazenamento (``criar_armazenamento``) do app, configurados pelo
+mesmo ``.streamlit/secrets.toml``. Cada pedido é um objeto JSON com as chaves
+de ``CAMPOS_PEDIDO``; os campos do plano omitidos assumem ``PLANO_PADRAO``.
+
+Rotas:
+
+- ``POST /simular``: um pedido, uma lista de pedidos ou
+  ``{"simulacoes": [...], "salvar": true}`` (``?salvar=1`` também grava);
+- ``GET /simulacoes?obra=...&unidade=...&limite=100``: simulações salvas (lista
+  relida a cada ``INTERVALO_LISTAGEM`` segundos, não a cada pedido);
+- ``GET /gravacoes/<id>``: estado da gravação de uma simulação;
+- ``GET /saude``.
+
+Linha de comando::
+
+    python servico.py servir --porta 8080 --processos 4
+    python servico.py simular pedidos.json --salvar
+
+O servidor atende cada conexão em uma thread; com ``--processos`` (POSIX), o
+socket é aberto uma vez e compartilhado por processos filhos (pre-fork), cada
+um com seu próprio armazenamento. O limite de requisições à API do Google é
+um só para todos os processos, e o snapshot em disco fica desligado (é um
+cache de partida do app, não do serviço).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tomllib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import metricas
+from armazenamento import criar_armazenamento, filtrar_simulacoes
+from conexao import GerenciadorClientes, LimitadorTaxa
+from esquema import FORMATO_DATA_HORA, OBRAS
+from fila_escrita import ENVIANDO, PENDENTE
+from importacao import CAMPOS_PLANO, gerar_simulacoes
+
+SECRETS_PADRAO = ".streamlit/secrets.toml"
+
+PLANO_PADRAO = {
+    'perc_entrada': 20.0, 'perc_mensal': 40.0, 'perc_semestral': 20.0, 'perc_entrega': 20.0,
+    'num_mensal': 36, 'num_semestral': 6,
+}
+
+# Chave do pedido JSON -> coluna da tabela de simulações.
+CAMPOS_PEDIDO = {'obra': 'Obra', 'unidade': 'Unidade', 'preco_total': 'Preco Total',
+                 **{campo: coluna for campo, coluna in CAMPOS_PLANO.items()}}
+
+# Coluna do relatório -> chave da resposta JSON.
+CAMPOS_RESPOSTA = {
+    **{coluna: campo for campo, coluna in CAMPOS_PEDIDO.items()},
+    'Valor Entrada': 'valor_entrada', 'Valor Mensal': 'valor_mensal',
+    'Valor Semestral': 'valor_semestral', 'Valor Entrega': 'valor_entrega', 'Erro': 'erro',
+}
+
+MAX_CORPO = 20 * 2 ** 20
+
+# Idade máxima (segundos) da lista usada em GET /simulacoes, como o ttl de ``carregar_dados_planilha`` no app.
+INTERVALO_LISTAGEM = 5
+
+logger = logging.getLogger("simulador.servico")
+
+
+class ErroPedido(ValueError):
+    """Pedido malformado (resposta HTTP 400)."""
+
+
+def simular(pedidos, armazenamento=None):
+    """Simula uma lista de pedidos (dicts) de uma vez; com ``armazenamento``, grava as válidas.
+
+    Devolve uma lista de dicts na ordem dos pedidos, com os valores calculados,
+    ``erro`` (``None`` se válida) e ``id`` (se gravada).
+    """
+    if not pedidos:
+        return []
+    for posicao, pedido in enumerate(pedidos):
+        if not isinstance(pedido, dict):
+            raise ErroPedido("Cada simulação deve ser um objeto JSON.")
+        for campo in CAMPOS_PEDIDO:
+            if isinstance(pedido.get(campo), (dict, list)):
+                raise ErroPedido(f"Simulação {posicao}: '{campo}' deve ser texto ou número.")
+    # Colunas object: preserva os valores do JSON como vieram (ex.: unidade 101 não vira 101.0).
+    tabela = pd.DataFrame({coluna: pd.Series([pedido.get(campo) for pedido in pedidos], dtype=object)
+                           for campo, coluna in CAMPOS_PEDIDO.items()})
+    data_hora = time.strftime(FORMATO_DATA_HORA)
+    linhas, relatorio = gerar_simulacoes(tabela, tabela['Obra'].fillna("").to_numpy(dtype=object),
+                                         PLANO_PADRAO, data_hora, unicas=False, obras_validas=OBRAS)
+
+    # Montado coluna a coluna com tolist(): bem mais barato que DataFrame.to_dict para lotes pequenos.
+    colunas = {}
+    for coluna in relatorio.columns:
+        valores = relatorio[coluna].to_numpy()
+        colunas[CAMPOS_RESPOSTA[coluna]] = (np.round(valores, 2) if valores.dtype.kind == 'f' else valores).tolist()
+    resultados = [dict(zip(colunas, valores)) for valores in zip(*colunas.values())]
+    for resultado in resultados:
+        resultado['erro'] = resultado['erro'] or None
+        resultado['id'] = None
+    if armazenamento is not None and linhas:
+        validas = np.flatnonzero(relatorio['Erro'].to_numpy() == "")
+        for posicao, sim_id in zip(validas, armazenamento.incluir(linhas)):
+            resultados[posicao]['id'] = sim_id
+    return resultados
+
+
+def ler_pedidos(corpo):
+    """Normaliza o corpo JSON em ``(pedidos, salvar)``."""
+    if isinstance(corpo, dict) and 'simulacoes' in corpo:
+        pedidos, salvar = corpo['simulacoes'], bool(corpo.get('salvar', False))
+    else:
+        pedidos, salvar = corpo, False
+    if isinstance(pedidos, dict):
+        pedidos = [pedidos]
+    if not isinstance(pedidos, list):
+        raise ErroPedido("Envie um objeto, uma lista ou {\"simulacoes\": [...]}.")
+    return pedidos, salvar
+
+
+def carregar_secrets(caminho=SECRETS_PADRAO):
+    """Lê o TOML de secrets do app; arquivo ausente equivale a configuração vazia."""
+    try:
+        with open(caminho, "rb") as arquivo:
+            return tomllib.load(arquivo)
+    except FileNotFoundError:
+        return {}
+
+
+class Contexto:
+    """Configuração e armazenamento do processo, criado só no primeiro pedido que grava.
+
+    ``limitador`` substitui o ``LimitadorTaxa`` criado a partir dos secrets
+    (ex.: um compartilhado entre os processos do servidor).
+    """
+
+    def __init__(self, secrets, limitador=None):
+        self.secrets = secrets
+        self._limitador = limitador
+        self._armazenamento = None
+        self._lock = threading.Lock()
+        self._listagem = None
+        self._listada_em = 0.0
+        self._lock_listagem = threading.Lock()
+
+    def limitador(self):
+        if self._limitador is None:
+            self._limitador = criar_limitador(self.secrets)
+        return self._limitador
+
+    def _obter_planilha(self):
+        info = self.secrets["spreadsheet_info"]
+        return self._gerenciador.planilha(info["spreadsheet_key"], info["worksheet_name"])
+
+    def armazenamento(self):
+        with self._lock:
+            if self._armazenamento is None:
+                # Sem snapshot: vários processos gravariam o mesmo arquivo.
+                config = {**self.secrets.get("armazenamento", {}), "snapshot": ""}
+                if "gcp_service_account" in self.secrets:
+                    self._gerenciador = GerenciadorClientes(self.secrets["gcp_service_account"],
+                                                            limitador=self.limitador())
+                obter = self._obter_planilha if "gcp_service_account" in self.secrets else (lambda: None)
+                self._armazenamento = criar_armazenamento(config, obter)
+            return self._armazenamento
+
+    def simulacoes(self):
+        """Simulações salvas, relidas do armazenamento no máximo a cada ``INTERVALO_LISTAGEM`` segundos."""
+        with self._lock_listagem:
+            if self._listagem is None or time.monotonic() - self._listada_em > INTERVALO_LISTAGEM:
+                self._listagem = self.armazenamento().listar()
+                self._listada_em = time.monotonic()
+            return self._listagem
+
+    def invalidar_listagem(self):
+        """Descarta a lista em memória (após uma gravação deste processo)."""
+        with self._lock_listagem:
+            self._listagem = None
+
+
+def criar_limitador(secrets, compartilhado=False):
+    """``LimitadorTaxa`` com o limite de ``[limite_api] requisicoes_por_minuto`` dos secrets."""
+    limite = secrets.get("limite_api", {}).get("requisicoes_por_minuto", 60)
+    return LimitadorTaxa.por_minuto(limite, compartilhado=compartilhado)
+
+
+def _inteiro(valor, nome):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErroPedido(f"{nome} inválido: {valor!r}.")
+
+
+class Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: clientes reaproveitam a conexão
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem em writes separados; sem isso, ~40 ms de ACK atrasado
+    server_version = "SimuladorNegociacao"
+
+    def log_message(self, formato, *args):
+        logger.debug(formato, *args)
+
+    def _responder(self, status, dados):
+        corpo = json.dumps(dados, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _executar(self, nome, rota):
+        try:
+            with metricas.medir(f"servico.{nome}"):
+                status, dados = rota()
+        except ErroPedido as e:
+            # O corpo pode não ter sido lido por inteiro: não dá para reaproveitar a conexão.
+            self.close_connection = True
+            status, dados = 400, {"erro": str(e)}
+        except Exception as e:
+            logger.exception("Erro ao atender %s", self.path)
+            status, dados = 500, {"erro": str(e)}
+        self._responder(status, dados)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        consulta = parse_qs(url.query)
+        if url.path == "/saude":
+            self._executar("saude", lambda: (200, {"status": "ok", "pid": os.getpid()}))
+        elif url.path == "/simulacoes":
+            self._executar("listar", lambda: self._listar(consulta))
+        elif url.path.startswith("/gravacoes/"):
+            sim_id = url.path.rsplit("/", 1)[1]
+            self._executar("status", lambda: self._status(sim_id))
+        else:
+            self._responder(404, {"erro": "Rota não encontrada."})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/simular":
+            self._responder(404, {"erro": "Rota não encontrada."})
+            return
+        self._executar("simular", lambda: self._simular(parse_qs(url.query)))
+
+    def _simular(self, consulta):
+        tamanho = _inteiro(self.headers.get("Content-Length") or 0, "Content-Length")
+        if tamanho < 0:
+            raise ErroPedido("Content-Length inválido.")
+        if tamanho > MAX_CORPO:
+            raise ErroPedido("Corpo muito grande.")
+        try:
+            corpo = json.loads(self.rfile.read(tamanho) or b"null")
+        except ValueError:
+            raise ErroPedido("JSON inválido.")
+        pedidos, salvar = ler_pedidos(corpo)
+        salvar = salvar or consulta.get("salvar", ["0"])[0] in ("1", "true", "sim")
+        contexto = self.server.contexto
+        resultados = simular(pedidos, contexto.armazenamento() if salvar else None)
+        if salvar:
+            contexto.invalidar_listagem()
+        return 200, {"simulacoes": resultados}
+
+    def _listar(self, consulta):
+        limite = _inteiro(consulta.get("limite", ["100"])[0], "limite")
+        df = filtrar_simulacoes(self.server.contexto.simulacoes(),
+                                obras=consulta.get("obra") or None, unidade=consulta.get("unidade", [None])[0])
+        df = df.sort_values("Data/Hora", ascending=False).head(limite)
+        df = df.astype(object).where(df.notna(), None)
+        df = df.rename(columns={**CAMPOS_RESPOSTA, 'Data/Hora': 'data_hora', 'ID': 'id'})
+        return 200, {"total": len(df), "simulacoes": df.to_dict("records")}
+
+    def _status(self, sim_id):
+        status = self.server.contexto.armazenamento().status(sim_id)
+        if status is None:
+            return 404, {"erro": "Gravação desconhecida ou expirada."}
+        return 200, status
+
+
+class Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, endereco, contexto):
+        super().__init__(endereco, Manipulador)
+        self.contexto = contexto
+
+
+def servir(host, porta, processos, secrets):
+    # Criado antes do fork: todos os processos consomem a mesma cota da API.
+    limitador = criar_limitador(secrets, compartilhado=processos > 1)
+    servidor = Servidor((host, porta), Contexto(secrets, limitador))
+    # Pre-fork: o socket já está aberto; cada filho aceita conexões nele com suas próprias threads.
+    for _ in range(max(1, processos) - 1):
+        if os.fork() == 0:
+            break
+    logger.info("Servindo em http://%s:%d (pid %d)", host, porta, os.getpid())
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+def aguardar_gravacoes(armazenamento, ids, tempo_max=120.0):
+    """Espera a fila de gravação concluir ``ids`` (a CLI não pode sair com gravações pendentes)."""
+    limite = time.monotonic() + tempo_max
+    pendentes = set(ids)
+    while pendentes and time.monotonic() < limite:
+        pendentes = {i for i in pendentes
+                     if (armazenamento.status(i) or {}).get("estado") in (PENDENTE, ENVIANDO)}
+        if pendentes:
+            time.sleep(0.2)
+    return {i: armazenamento.status(i) for i in ids}
+
+
+def _ler_entrada(caminho):
+    texto = sys.stdin.read() if caminho in (None, "-") else open(caminho, encoding="utf-8").read()
+    try:
+        return json.loads(texto)
+    except ValueError:
+        # JSON Lines: um pedido por linha.
+        return [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de negociação sem interface.")
+    parser.add_argument("--secrets", default=SECRETS_PADRAO, help="TOML com a configuração do app")
+    parser.add_argument("--log", default="INFO")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    p_servir = comandos.add_parser("servir", help="sobe o serviço HTTP JSON")
+    p_servir.add_argument("--host", default="127.0.0.1")
+    p_servir.add_argument("--porta", type=int, default=8080)
+    p_servir.add_argument("--processos", type=int, default=1)
+    p_simular = comandos.add_parser("simular", help="simula pedidos de um arquivo JSON/JSON Lines (ou stdin)")
+    p_simular.add_argument("entrada", nargs="?", default="-")
+    p_simular.add_argument("--salvar", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log.upper(), format="%(message)s")
+    secrets = carregar_secrets(args.secrets)
+    if args.comando == "servir":
+        servir(args.host, args.porta, args.processos, secrets)
+        return 0
+
+    pedidos, salvar = ler_pedidos(_ler_entrada(args.entrada))
+    armazenamento = Contexto(secrets).armazenamento() if (salvar or args.salvar) else None
+    resultados = simular(pedidos, armazenamento)
+    if armazenamento is not None:
+        status = aguardar_gravacoes(armazenamento, [r["id"] for r in resultados if r["id"]])
+        for resultado in resultados:
+            if resultado["id"]:
+                resultado["gravacao"] = status[resultado["id"]]
+    json.dump({"simulacoes": resultados}, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 1 if any(r["erro"] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
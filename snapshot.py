@@ -0,0 +1,57 @@
+"""Snapshot em disco do DataFrame de simulações.
+
+Guarda o frame tipado em Parquet e, ao lado, um JSON com o marcador de versão
+e o estado do sincronizador (cabeçalho, número de linhas, âncora). Assim, após
+um deploy ou reinício, o app pode exibir os dados imediatamente e reconciliar
+com a planilha em segundo plano.
+"""
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+# Incrementar sempre que o esquema (esquema.py) ou o formato do marcador mudar.
+VERSAO_SNAPSHOT = 2
+
+
+def _caminho_marcador(caminho):
+    return f"{caminho}.json"
+
+
+def _substituir_atomicamente(caminho, escrever):
+    # Temporário único por processo e thread: gravadores simultâneos não se sobrescrevem.
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+
+def salvar_snapshot(caminho, df, estado):
+    """Grava ``df`` e o dicionário ``estado`` (serializável em JSON) de forma atômica."""
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    marcador = {"versao": VERSAO_SNAPSHOT, "linhas": len(df), "salvo_em": time.time(), **estado}
+    _substituir_atomicamente(caminho, lambda destino: df.to_parquet(destino, index=False))
+
+    def escrever_marcador(destino):
+        with open(destino, "w", encoding="utf-8") as arquivo:
+            json.dump(marcador, arquivo, ensure_ascii=False)
+    _substituir_atomicamente(_caminho_marcador(caminho), escrever_marcador)
+
+
+def carregar_snapshot(caminho):
+    """Lê o snapshot; devolve ``(df, estado)`` ou ``None`` se ausente, de outra versão ou inconsistente."""
+    try:
+        with open(_caminho_marcador(caminho), encoding="utf-8") as arquivo:
+            marcador = json.load(arquivo)
+        if marcador.get("versao") != VERSAO_SNAPSHOT:
+            return None
+        df = pd.read_parquet(caminho)
+    except (OSError, ValueError):
+        return None
+    if len(df) != marcador.get("linhas"):
+        # O Parquet foi regravado depois do marcador (ex.: processo interrompido).
+        return None
+    return df, marcador
@@ -0,0 +1,103 @@
+"""Tema visual Lavie compartilhado pelo app e pelos documentos gerados (ver ``propostas.py``).
+
+Não depende do Streamlit, para poder ser importado pelos processos de
+geração de propostas.
+"""
+
+APP_STYLE_CSS = """
+<style>
+@import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
+@import url('https://fonts.googleapis.com/css2?family=Material+Symbols+Rounded:opsz,wght,FILL,GRAD@24,400,1,0');
+
+/* Fundo Geral */
+[data-testid="stAppViewContainer"] {
+    background: radial-gradient(circle at 10% 20%, #101012 0%, #000000 90%);
+    font-family: 'Inter', sans-serif;
+    color: #ffffff;
+}
+
+/* --- O SEGREDO DO GRADIENTE NOS INPUTS --- */
+
+/* 1. Aplica o gradiente no Wrapper (A caixa de fora) */
+div[data-testid="stVerticalBlockBorderWrapper"] {
+    background-color: transparent !important; /* Remove cor sólida padrão */
+    
+    /* O GRADIENTE LAVIE */
+    background: linear-gradient(160deg, #1e1e24 0%, #0a0a0c 100%) !important;
+    
+    border: 1px solid rgba(255, 255, 255, 0.08) !important;
+    border-radius: 16px !important;
+    box-shadow: 0 10px 30px rgba(0, 0, 0, 0.5) !important;
+    padding: 24px !important;
+    margin-bottom: 20px !important;
+}
+
+/* 2. FORÇA BRUTA: Torna transparente a caixa de dentro (stVerticalBlock) */
+/* Se isso não for feito, o Streamlit pinta um fundo cinza por cima do gradiente */
+div[data-testid="stVerticalBlockBorderWrapper"] > div {
+    background-color: transparent !important;
+}
+
+/* Inputs */
+div[data-baseweb="input"] > div, 
+div[data-baseweb="select"] > div, 
+div[data-baseweb="base-input"] {
+    background-color: rgba(255, 255, 255, 0.05) !important;
+    border: 1px solid rgba(255, 255, 255, 0.1) !important;
+    color: white !important;
+    border-radius: 8px !important;
+    height: 48px;
+}
+
+/* Text Area (Resumo) */
+div[data-baseweb="textarea"] > div {
+    height: auto !important;
+    background-color: rgba(255, 255, 255, 0.05) !important;
+    border: 1px solid rgba(255, 255, 255, 0.1) !important;
+    color: white !important;
+    border-radius: 8px !important;
+}
+
+/* Texto dos Inputs */
+div[data-testid="stNumberInput"] input, 
+div[data-testid="stTextInput"] input {
+    color: white !important;
+    font-family: 'Inter', sans-serif;
+}
+label[data-testid="stLabel"] {
+    color: rgba(255, 255, 255, 0.6) !important;
+    font-size: 0.85rem !important;
+    margin-bottom: 8px;
+}
+
+/* Headers */
+.section-header { display: flex; align-items: center; margin-bottom: 20px; }
+.section-icon {
+    font-family: 'Material Symbols Rounded'; font-size: 22px; margin-right: 10px;
+    color: #E37026; background: rgba(227, 112, 38, 0.15); padding: 6px;
+    border-radius: 8px; display: inline-flex; align-items: center; justify-content: center;
+}
+.section-title { font-size: 1.05rem; font-weight: 600; color: #fff; }
+
+/* CARD DE RESULTADO (HTML - Já estava certo) */
+.lavie-card {
+    background: linear-gradient(160deg, #1e1e24 0%, #0a0a0c 100%) !important;
+    border: 1px solid rgba(255, 255, 255, 0.08);
+    border-radius: 16px;
+    padding: 30px;
+    box-shadow: 0 15px 40px rgba(0, 0, 0, 0.6);
+    margin-top: 10px;
+}
+
+.stats-grid {
+    display: grid; grid-template-columns: repeat(4, 1fr); gap: 20px; width: 100%;
+}
+@media (max-width: 800px) { .stats-grid { grid-template-columns: 1fr 1fr; } }
+
+.stat-item { display: flex; flex-direction: column; }
+.stat-label { font-size: 0.75rem; color: #888; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 6px; font-weight: 600; }
+.stat-value { font-size: 1.4rem; color: #fff; font-weight: 700; letter-spacing: -0.5px; margin-bottom: 2px; }
+.stat-value.highlight { color: #E37026; }
+.stat-sub { font-size: 0.8rem; color: #555; }
+</style>
+"""
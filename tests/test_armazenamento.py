@@ -0,0 +1,95 @@
+import time
+
+import pandas as pd
+import pytest
+
+from armazenamento import ArmazenamentoSQLite, criar_armazenamento, filtrar_simulacoes
+from benchmark import gerar_linhas
+from esquema import COLUNA_ID, COLUNAS_PLANILHA
+from fila_escrita import SALVO, FilaEscrita
+from planilha import SincronizadorPlanilha
+from planilha_memoria import PlanilhaMemoria
+
+LINHAS = [linha[:-1] for linha in gerar_linhas(6)[1:]]
+
+
+@pytest.fixture
+def banco(tmp_path):
+    return ArmazenamentoSQLite(str(tmp_path / "simulacoes.db"))
+
+
+def aguardar_fila(fila, timeout=5):
+    limite = time.monotonic() + timeout
+    while fila.pendentes() and time.monotonic() < limite:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+
+def test_incluir_listar_atualizar_excluir(banco):
+    ids = banco.incluir(LINHAS)
+    df = banco.listar()
+    assert sorted(df[COLUNA_ID]) == sorted(ids)
+    assert df['Preco Total'].dtype == 'float64'
+
+    linha = list(LINHAS[0])
+    linha[1] = "999"
+    banco.atualizar(ids[0], linha)
+    assert banco.listar().set_index(COLUNA_ID).at[ids[0], 'Unidade'] == "999"
+
+    banco.excluir(ids[1])
+    assert ids[1] not in banco.listar()[COLUNA_ID].tolist()
+    with pytest.raises(KeyError):
+        banco.excluir(ids[1])
+    with pytest.raises(KeyError):
+        banco.atualizar("inexistente", linha)
+
+
+def test_linha_invalida_e_recusada(banco):
+    linha = list(LINHAS[0])
+    linha[2] = "abc"
+    with pytest.raises(ValueError):
+        banco.incluir([linha])
+    assert banco.vazio()
+
+
+def test_consultar_igual_ao_filtro_em_memoria(banco):
+    banco.incluir([linha[:-1] + [data] for linha, data in zip(LINHAS, [
+        "2024-01-10 09:00:00", "2024-01-31 23:59:59", "2024-02-01 00:00:00",
+        "2024-02-15 12:00:00", "2024-03-01 08:00:00", "2024-03-02 08:00:00",
+    ])])
+    df = banco.listar()
+    preco = sorted(df['Preco Total'])[2]
+    filtros = [
+        {"obras": [df['Obra'].iloc[0]]},
+        {"data_inicio": "2024-01-31", "data_fim": "2024-02-15"},
+        {"preco_min": preco},
+        {"preco_max": preco, "data_fim": "2024-02-01"},
+        {"unidade": "10"},
+    ]
+    for filtro in filtros:
+        esperado = sorted(filtrar_simulacoes(df, **filtro)[COLUNA_ID])
+        assert sorted(banco.consultar(**filtro)[COLUNA_ID]) == esperado, filtro
+    assert len(banco.consultar(data_inicio="2024-01-31", data_fim="2024-02-01")) == 2
+
+
+def test_espelho_enfileira_gravacoes_na_planilha(tmp_path):
+    planilha = PlanilhaMemoria([COLUNAS_PLANILHA])
+    fila = FilaEscrita(SincronizadorPlanilha(lambda: planilha), janela_lote=0.01)
+    banco = ArmazenamentoSQLite(str(tmp_path / "simulacoes.db"), espelho=fila)
+    ids = banco.incluir(LINHAS[:3])
+    aguardar_fila(fila)
+    assert [linha[-1] for linha in planilha.get_all_values()[1:]] == ids
+    assert banco.status(ids[0])["estado"] == SALVO
+
+    banco.excluir(ids[1])
+    aguardar_fila(fila)
+    assert [linha[-1] for linha in planilha.get_all_values()[1:]] == [ids[0], ids[2]]
+
+
+def test_banco_espelhado_vazio_e_semeado_da_planilha(tmp_path):
+    planilha = PlanilhaMemoria(gerar_linhas(5))
+    banco = criar_armazenamento({"backend": "sqlite", "caminho": str(tmp_path / "simulacoes.db"),
+                                 "espelhar_planilha": True}, lambda: planilha)
+    ids_planilha = [linha[-1] for linha in planilha.get_all_values()[1:]]
+    pd.testing.assert_series_equal(banco.listar()[COLUNA_ID].sort_values(ignore_index=True),
+                                   pd.Series(sorted(ids_planilha), name=COLUNA_ID))
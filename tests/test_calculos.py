@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from calculos import calcular_fluxo, calcular_simulacao, percentual_fechado
+
+
+def fluxo_escalar(preco_total, perc_entrada, perc_mensal, perc_semestral, perc_entrega, num_mensal, num_semestral):
+    """Fórmulas originais do app, uma simulação por vez."""
+    val_total_mensal = (preco_total * perc_mensal) / 100
+    val_total_semestral = (preco_total * perc_semestral) / 100
+    return {
+        "val_entrada": (preco_total * perc_entrada) / 100,
+        "val_total_mensal": val_total_mensal,
+        "val_total_semestral": val_total_semestral,
+        "val_entrega": (preco_total * perc_entrega) / 100,
+        "val_por_mensal": (val_total_mensal / num_mensal) if num_mensal > 0 else 0,
+        "val_por_semestral": (val_total_semestral / num_semestral) if num_semestral > 0 else 0,
+    }
+
+
+PLANOS = [
+    (500000.0, 20.0, 40.0, 20.0, 20.0, 36, 6),
+    (1234567.89, 10.0, 60.0, 0.0, 30.0, 48, 0),
+    (300000.0, 30.0, 0.0, 20.0, 50.0, 0, 4),
+    (750000.0, 100.0, 0.0, 0.0, 0.0, 0, 0),
+]
+
+
+@pytest.mark.parametrize("plano", PLANOS)
+def test_calcular_simulacao_igual_as_formulas_escalares(plano):
+    assert calcular_simulacao(*plano) == pytest.approx(fluxo_escalar(*plano))
+
+
+def test_calcular_fluxo_vetorizado_igual_ao_escalar():
+    colunas = [np.array(coluna) for coluna in zip(*PLANOS)]
+    fluxo = calcular_fluxo(*colunas)
+    for posicao, plano in enumerate(PLANOS):
+        esperado = fluxo_escalar(*plano)
+        for campo, valor in esperado.items():
+            assert fluxo[campo][posicao] == pytest.approx(valor)
+
+
+def test_num_mensal_zero_nao_divide():
+    fluxo = calcular_fluxo(np.array([100000.0, 100000.0]), 20, 40, 20, 20, np.array([0, 10]), 0)
+    assert fluxo["val_por_mensal"].tolist() == [0.0, 4000.0]
+    assert fluxo["val_por_semestral"].tolist() == [0.0, 0.0]
+
+
+def test_percentual_fechado():
+    assert percentual_fechado([20, 20.04], [40, 40], [20, 20], [20, 19]).tolist() == [True, False]
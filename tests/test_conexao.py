@@ -0,0 +1,41 @@
+import os
+import time
+
+import pytest
+
+from conexao import LimitadorTaxa
+
+
+def test_por_minuto_libera_a_rajada_e_depois_espaca():
+    limitador = LimitadorTaxa.por_minuto(600)  # rajada de 60, depois 9 por segundo
+    inicio = time.monotonic()
+    for _ in range(60):
+        limitador.adquirir()
+    assert time.monotonic() - inicio < 0.1
+    limitador.adquirir()
+    assert time.monotonic() - inicio > 0.05
+
+
+@pytest.mark.parametrize("limite", [1, 2, 9])
+def test_limites_baixos_nao_zeram_a_taxa(limite):
+    limitador = LimitadorTaxa.por_minuto(limite)
+    assert limitador._taxa > 0
+    limitador.adquirir()  # a rajada inicial não espera
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requer fork")
+def test_limitador_compartilhado_entre_processos():
+    limitador = LimitadorTaxa.por_minuto(600, compartilhado=True)  # rajada de 60, depois 9 por segundo
+    inicio = time.monotonic()
+    filhos = []
+    for _ in range(3):
+        pid = os.fork()
+        if pid == 0:
+            for _ in range(22):
+                limitador.adquirir()
+            os._exit(0)
+        filhos.append(pid)
+    for pid in filhos:
+        os.waitpid(pid, 0)
+    # 66 fichas entre os três processos: 60 da rajada + 6 a 9 por segundo.
+    assert time.monotonic() - inicio > 0.6
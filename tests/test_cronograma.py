@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from cronograma import calcular_tir, gerar_fluxo, resumir_fluxo
+
+
+def test_tir_de_fluxo_conhecido():
+    # Preço 1000 pago em 12 parcelas de 1000 * i / (1 - (1 + i) ** -12), com i = 1% a.m.
+    parcela = 1000 * 0.01 / (1 - 1.01 ** -12)
+    mes = np.arange(1, 13, dtype=float)
+    tir = calcular_tir(np.zeros(12, dtype=int), mes, np.full(12, parcela), [1000.0])
+    assert tir[0] == pytest.approx(0.01, abs=1e-9)
+
+
+def test_tir_de_varias_simulacoes_e_sem_juros():
+    # Simulação 0: 1100 no mês 1 por 1000 (10% a.m.); simulação 1: 1000 no mês 1 por 1000 (0%).
+    tir = calcular_tir(np.array([0, 1]), np.array([1.0, 1.0]), np.array([1100.0, 1000.0]), [1000.0, 1000.0])
+    assert tir == pytest.approx([0.10, 0.0], abs=1e-9)
+
+
+def test_tir_sem_solucao_fica_nan():
+    # Todo o fluxo no mês 0: o valor presente não depende da taxa.
+    tir = calcular_tir(np.array([0]), np.array([0.0]), np.array([900.0]), [1000.0])
+    assert np.isnan(tir[0])
+
+
+def test_resumo_sem_indice_nem_desconto():
+    fluxo = gerar_fluxo([600000.0], 20, 40, 20, 20, [36], [6], np.datetime64('2025-01-15'))
+    resumo = resumir_fluxo(fluxo, [600000.0])
+    assert resumo['Total Corrigido'].iloc[0] == pytest.approx(600000.0)
+    assert resumo['VPL'].iloc[0] == pytest.approx(600000.0)
+    assert resumo['TIR Mensal'].iloc[0] == pytest.approx(0.0, abs=1e-9)
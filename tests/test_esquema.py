@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from cronograma import cronograma_simulacoes
+from esquema import COLUNAS_PLANILHA, converter_dados, linhas_planilha
+
+LINHA = ["Burj Lavie", "101", "1000000,00", "33,33", "333300,00", "33,33", "36", "9258,33",
+         "0,00", "0", "0,00", "33,34", "333400,00", "2024-03-15 10:00:00", "abc"]
+
+
+def test_converter_dados_tipa_as_colunas():
+    df, invalidas = converter_dados([LINHA], COLUNAS_PLANILHA)
+    assert not invalidas.any()
+    assert isinstance(df['Obra'].dtype, pd.CategoricalDtype)
+    assert df['Nº Mensal'].dtype == 'int16'
+    assert df['% Entrada'].dtype == 'float64' and df['Preco Total'].dtype == 'float64'
+    assert df['Data/Hora'].iloc[0] == pd.Timestamp("2024-03-15 10:00:00")
+    assert df.at[0, 'Valor Mensal'] == 9258.33
+
+
+def test_percentual_nao_perde_centavos():
+    df, _ = converter_dados([LINHA], COLUNAS_PLANILHA)
+    fluxo, _ = cronograma_simulacoes(df)
+    entrada = fluxo.loc[fluxo['Parcela'] == 'Entrada', 'Valor Nominal'].iloc[0]
+    assert round(entrada, 2) == 333300.0
+
+
+def test_converter_dados_marca_linhas_invalidas():
+    ruins = [list(LINHA) for _ in range(4)]
+    ruins[0][2] = "mil reais"
+    ruins[1][0] = ""
+    ruins[2][13] = "ontem"
+    ruins[3][13] = ""
+    df, invalidas = converter_dados(ruins + [LINHA[:5]], COLUNAS_PLANILHA)
+    # Células faltando no fim da linha contam como vazias, não como inválidas.
+    assert invalidas.tolist() == [True, True, True, False, False]
+    assert df.at[0, 'Preco Total'] == 0
+    assert df['Data/Hora'].isna().tolist() == [False, False, True, True, True]
+
+
+def test_data_digitada_no_formato_brasileiro():
+    linha = list(LINHA)
+    linha[13] = "05/03/2024 10:00:00"
+    df, invalidas = converter_dados([linha], COLUNAS_PLANILHA)
+    assert not invalidas.any()
+    assert df['Data/Hora'].iloc[0] == pd.Timestamp("2024-03-05 10:00:00")
+
+
+def test_linhas_planilha_volta_ao_texto_da_planilha():
+    df, _ = converter_dados([LINHA], COLUNAS_PLANILHA)
+    df['Data/Hora'] = LINHA[13]
+    esperado = list(LINHA[:-1])
+    esperado[6], esperado[9] = 36, 0
+    assert linhas_planilha(df) == [esperado]
+    assert linhas_planilha(df.iloc[:0]) == []
+
+
+def test_linhas_planilha_arredonda_para_duas_casas():
+    df = pd.DataFrame({col: [0] for col in COLUNAS_PLANILHA})
+    df['Preco Total'] = 5555.555
+    df['% Entrada'] = np.float64(12.5)
+    df['Nº Mensal'] = 36.0
+    linha = linhas_planilha(df)[0]
+    assert linha[2:4] == ["5555,56", "12,50"] and linha[6] == 36
@@ -0,0 +1,125 @@
+import time
+
+from benchmark import gerar_linhas
+from esquema import COLUNA_ID
+from fila_escrita import ERRO, SALVO, FilaEscrita, erro_retentavel
+from planilha import PlanilhaIndisponivel, SincronizadorPlanilha
+from planilha_memoria import PlanilhaMemoria
+
+
+class Sincronizador:
+    """Falha ``falhas`` vezes com ``erro`` e depois registra as inclusões."""
+
+    def __init__(self, erro=None, falhas=0):
+        self.erro = erro
+        self.falhas = falhas
+        self.incluidas = []
+
+    def anexar_lote(self, linhas, conferir=False):
+        if self.falhas:
+            self.falhas -= 1
+            raise self.erro
+        self.incluidas.extend(linhas)
+
+
+def aguardar(fila, ids, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        estados = [fila.status(i)["estado"] for i in ids]
+        if all(estado in (SALVO, ERRO) for estado in estados):
+            return estados
+        time.sleep(0.01)
+    raise AssertionError("fila não concluiu")
+
+
+def test_inclusoes_vao_em_um_lote():
+    sincronizador = Sincronizador()
+    fila = FilaEscrita(sincronizador, janela_lote=0.01)
+    ids = fila.enfileirar_inclusoes([["a"], ["b"], ["c"]])
+    assert aguardar(fila, ids) == [SALVO] * 3
+    assert [linha for _, linha in sincronizador.incluidas] == [["a"], ["b"], ["c"]]
+
+
+def test_erro_temporario_tenta_de_novo():
+    sincronizador = Sincronizador(ConnectionError("caiu"), falhas=2)
+    fila = FilaEscrita(sincronizador, janela_lote=0.01, espera_inicial=0.01)
+    sim_id = fila.enfileirar_inclusao(["a"])
+    assert aguardar(fila, [sim_id]) == [SALVO]
+    assert fila.status(sim_id)["tentativas"] == 3
+
+
+def test_erro_definitivo_nao_tenta_de_novo():
+    sincronizador = Sincronizador(ValueError("linha inválida"), falhas=1)
+    fila = FilaEscrita(sincronizador, janela_lote=0.01, espera_inicial=0.01)
+    sim_id = fila.enfileirar_inclusao(["a"])
+    assert aguardar(fila, [sim_id]) == [ERRO]
+    assert fila.status(sim_id)["tentativas"] == 1
+
+
+class ErroRequests(OSError):
+    """Como ``requests.exceptions.ConnectionError``/``Timeout``: ``OSError`` com ``response`` opcional."""
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.response = type("Resposta", (), {"status_code": status})() if status else None
+
+
+def test_erros_retentaveis():
+    assert erro_retentavel(ErroRequests("Read timed out"))
+    assert erro_retentavel(ErroRequests("Service Unavailable", 503))
+    assert erro_retentavel(PlanilhaIndisponivel("Planilha indisponível."))
+    assert not erro_retentavel(ErroRequests("Not Found", 404))
+    assert not erro_retentavel(AttributeError("'NoneType' object has no attribute 'append_rows'"))
+
+
+def test_planilha_indisponivel_tenta_de_novo():
+    planilha = PlanilhaMemoria(gerar_linhas(2))
+    aberturas = iter([None, None])
+    sincronizador = SincronizadorPlanilha(lambda: next(aberturas, planilha))
+    fila = FilaEscrita(sincronizador, janela_lote=0.01, espera_inicial=0.01)
+    sim_id = fila.enfileirar_inclusao(planilha.get_all_values()[1][:-1])
+    assert aguardar(fila, [sim_id]) == [SALVO]
+    assert fila.status(sim_id)["tentativas"] == 3
+    assert planilha.get_all_values()[-1][-1] == sim_id
+
+
+class PlanilhaComTimeout(PlanilhaMemoria):
+    """``append_rows`` grava e, na primeira vez, falha como um timeout de leitura da resposta."""
+
+    falhar = True
+
+    def append_rows(self, valores, **kwargs):
+        super().append_rows(valores, **kwargs)
+        if self.falhar:
+            self.falhar = False
+            raise ErroRequests("Read timed out")
+
+
+def test_repeticao_de_inclusao_ja_gravada_nao_duplica():
+    planilha = PlanilhaComTimeout(gerar_linhas(2))
+    sincronizador = SincronizadorPlanilha(lambda: planilha)
+    fila = FilaEscrita(sincronizador, janela_lote=0.01, espera_inicial=0.01)
+    linha = planilha.get_all_values()[1][:-1]
+    ids = fila.enfileirar_inclusoes([linha, linha])
+    assert aguardar(fila, ids) == [SALVO, SALVO]
+    assert fila.status(ids[0])["tentativas"] == 2
+    assert [l[-1] for l in planilha.get_all_values()[3:]] == ids
+
+
+def test_repeticao_de_exclusao_ja_feita_conta_como_salva():
+    planilha = PlanilhaMemoria(gerar_linhas(3))
+    sincronizador = SincronizadorPlanilha(lambda: planilha)
+    sim_id = sincronizador.dados()[COLUNA_ID].iloc[1]
+    excluir = sincronizador.excluir
+
+    def excluir_com_timeout(alvo):
+        excluir(alvo)
+        if len(planilha.get_all_values()) == 3:
+            sincronizador.excluir = excluir
+            raise ErroRequests("Read timed out")
+
+    sincronizador.excluir = excluir_com_timeout
+    fila = FilaEscrita(sincronizador, janela_lote=0.01, espera_inicial=0.01)
+    fila.enfileirar_exclusao(sim_id)
+    assert aguardar(fila, [sim_id]) == [SALVO]
+    assert sim_id not in [l[-1] for l in planilha.get_all_values()]
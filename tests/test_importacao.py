@@ -0,0 +1,45 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from importacao import _numeros, gerar_simulacoes, ler_tabela_vendas
+
+PLANO = {'perc_entrada': 20, 'perc_mensal': 40, 'perc_semestral': 20, 'perc_entrega': 20,
+         'num_mensal': 36, 'num_semestral': 6}
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("500.000", 500000.0),
+    ("1.250.000", 1250000.0),
+    ("R$ 1.250.000,50", 1250000.5),
+    ("500000", 500000.0),
+    ("1234.56", 1234.56),
+    ("0.5", 0.5),
+    ("20,5%", 20.5),
+])
+def test_numeros_ptbr_e_decimal(texto, esperado):
+    numeros, vazios = _numeros(pd.Series([texto]))
+    assert numeros[0] == pytest.approx(esperado)
+    assert not vazios[0]
+
+
+@pytest.mark.parametrize("texto", ["1234.567", "1.25.000", "abc"])
+def test_numeros_ambiguos_sao_recusados(texto):
+    numeros, vazios = _numeros(pd.Series([texto]))
+    assert np.isnan(numeros[0]) and not vazios[0]
+
+
+def test_importacao_de_csv_ptbr():
+    csv = "Unidade;Preço\n101;500.000\n102;1.250.000,00\n103;1234.567\n104;\n"
+    tabela = ler_tabela_vendas(io.BytesIO(csv.encode()), "tabela.csv")
+    linhas, relatorio = gerar_simulacoes(tabela, "Burj Lavie", PLANO, "2025-01-01 10:00:00")
+    assert relatorio['Preco Total'].iloc[:2].tolist() == [500000.0, 1250000.0]
+    assert relatorio['Erro'].tolist() == ["", "", "Preço inválido", "Preço inválido"]
+    assert [linha[2] for linha in linhas] == ["500000,00", "1250000,00"]
+
+
+def test_formato_nao_suportado():
+    with pytest.raises(ValueError):
+        ler_tabela_vendas(io.BytesIO(b""), "tabela.xls")
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from listagem import formatar_moeda, montar_cards_html, paginar
+
+
+def test_formatar_moeda():
+    valores = pd.Series([0, 5.5, 999.994, 1000, 1234567.891, -2500.5, np.nan])
+    assert formatar_moeda(valores).tolist() == [
+        "R$ 0,00", "R$ 5,50", "R$ 999,99", "R$ 1.000,00",
+        "R$ 1.234.567,89", "R$ -2.500,50", "R$ 0,00",
+    ]
+
+
+def test_formatar_moeda_mantem_o_indice():
+    valores = pd.Series([10.0, 20.0], index=[7, 3])
+    assert formatar_moeda(valores).to_dict() == {7: "R$ 10,00", 3: "R$ 20,00"}
+
+
+def test_paginar():
+    df = pd.DataFrame({"x": range(25)})
+    pagina, total = paginar(df, 2, 10)
+    assert total == 3
+    assert pagina["x"].tolist() == list(range(10, 20))
+    assert paginar(df, 3, 10)[0]["x"].tolist() == list(range(20, 25))
+
+
+def test_paginar_limita_a_pagina_pedida():
+    df = pd.DataFrame({"x": range(25)})
+    assert paginar(df, 9, 10)[0]["x"].tolist() == list(range(20, 25))
+    assert paginar(df, 0, 10)[0]["x"].tolist() == list(range(10))
+    vazia, total = paginar(df.iloc[:0], 1, 10)
+    assert vazia.empty and total == 1
+
+
+def test_cards_usam_os_valores_formatados():
+    df = pd.DataFrame({
+        'Obra': ["Lavie"], 'Unidade': ["101"], 'Preco Total': [500000.0], 'Valor Entrada': [50000.0],
+        'Valor Mensal': [1500.0], 'Nº Mensal': [36], 'Valor Semestral': [np.nan], 'Nº Semestral': [np.nan],
+    }, index=[4])
+    cards = montar_cards_html(df)
+    assert cards.index.tolist() == [4]
+    assert "R$ 500.000,00" in cards[4] and "Mensais (36x)" in cards[4]
+    assert "Total: R$ 54.000,00" in cards[4] and "Semestrais (0x)" in cards[4]
@@ -0,0 +1,37 @@
+import pytest
+
+from calculos import calcular_fluxo
+from negociacao import buscar_distribuicoes
+
+
+def test_respeita_os_tetos_e_fecha_100():
+    distribuicoes = buscar_distribuicoes(500000.0, 36, 6, max_mensal=6000.0, max_semestral=20000.0, min_entrada=10.0)
+    assert not distribuicoes.empty
+    totais = distribuicoes[['% Entrada', '% Mensal', '% Semestral', '% Entrega']].sum(axis=1)
+    assert totais.tolist() == pytest.approx([100.0] * len(distribuicoes))
+    assert (distribuicoes['Valor Mensal'] <= 6000.0 + 1e-6).all()
+    assert (distribuicoes['Valor Semestral'] <= 20000.0 + 1e-6).all()
+    assert (distribuicoes['% Entrada'] >= 10.0).all()
+    # A primeira opção usa a capacidade inteira: 6000 x 36 / 500000 = 43,2% -> 43% no passo de 0,5.
+    assert distribuicoes['% Mensal'].iloc[0] == 43.0
+    assert distribuicoes['% Semestral'].iloc[0] == 24.0
+
+
+def test_sem_teto_ordena_pela_divisao_de_referencia():
+    distribuicoes = buscar_distribuicoes(500000.0, 36, 6, min_entrada=10.0, referencia=(20, 40, 20, 20))
+    # A entrada fica no mínimo (10%); o mais perto de 20/40/20/20 é mover 10 p.p. para mensal/semestral/entrega.
+    assert distribuicoes['Distância'].eq(0).all()
+    assert distribuicoes['Diferença'].iloc[0] == 20
+    assert distribuicoes[['% Mensal', '% Semestral']].iloc[0].tolist() != [0, 0]
+    assert distribuicoes['Diferença'].is_monotonic_increasing
+
+
+def test_valores_conferem_com_calcular_fluxo():
+    linha = buscar_distribuicoes(800000.0, 48, 8, max_mensal=5000.0).iloc[0]
+    valores = calcular_fluxo(800000.0, linha['% Entrada'], linha['% Mensal'], linha['% Semestral'],
+                             linha['% Entrega'], 48, 8)
+    assert linha['Valor Mensal'] == pytest.approx(float(valores['val_por_mensal']))
+
+
+def test_preco_zerado_devolve_vazio():
+    assert buscar_distribuicoes(0.0, 36, 6, max_mensal=1000.0).empty
@@ -0,0 +1,203 @@
+import time
+
+import pandas as pd
+import pytest
+
+from agregados import AgregadosCarteira
+from benchmark import gerar_linhas
+from esquema import COLUNA_ID
+from planilha import SincronizadorPlanilha
+from planilha_memoria import PlanilhaMemoria
+from snapshot import carregar_snapshot, salvar_snapshot
+
+
+@pytest.fixture
+def planilha():
+    return PlanilhaMemoria(gerar_linhas(10))
+
+
+@pytest.fixture
+def sincronizador(planilha):
+    sincronizador = SincronizadorPlanilha(lambda: planilha)
+    sincronizador.dados()
+    return sincronizador
+
+
+def ids_na_planilha(planilha):
+    linhas = planilha.get_all_values()
+    pos = linhas[0].index(COLUNA_ID)
+    return [linha[pos] for linha in linhas[1:]]
+
+
+def test_carga_inicial(planilha, sincronizador):
+    df = sincronizador.dados()
+    assert len(df) == 10
+    assert df[COLUNA_ID].tolist() == ids_na_planilha(planilha)
+    assert sincronizador.linha_da_simulacao(df[COLUNA_ID].iloc[3]) == 5
+
+
+def test_sincronizacao_incremental_le_so_as_linhas_novas(planilha, sincronizador):
+    nova = planilha.get_all_values()[1][:-1]
+    planilha.append_rows([nova + ["novo000000001"]])
+    planilha.chamadas.clear()
+    df = sincronizador.dados()
+    assert df[COLUNA_ID].iloc[-1] == "novo000000001"
+    assert planilha.chamadas == {"batch_get": 1}
+    assert sincronizador.linha_da_simulacao("novo000000001") == 12
+
+
+def test_linha_sem_id_recebe_id(planilha, sincronizador):
+    planilha.append_rows([planilha.get_all_values()[1][:-1] + [""]])
+    df = sincronizador.dados()
+    assert df[COLUNA_ID].iloc[-1]
+    assert ids_na_planilha(planilha)[-1] == df[COLUNA_ID].iloc[-1]
+
+
+def test_id_repetido_recebe_id_novo(planilha):
+    copia = planilha.get_all_values()[3]
+    planilha.append_rows([copia])  # linha copiada na planilha, com o ID junto
+    sincronizador = SincronizadorPlanilha(lambda: planilha)
+    ids = sincronizador.dados()[COLUNA_ID]
+    assert ids.is_unique and ids.iloc[2] == copia[-1]
+    assert ids_na_planilha(planilha) == ids.tolist()
+
+    planilha.append_rows([copia])
+    ids = sincronizador.dados()[COLUNA_ID]
+    assert ids.is_unique and len(ids) == 12
+    assert ids_na_planilha(planilha) == ids.tolist()
+
+
+def test_anexar_lote(planilha, sincronizador):
+    linha = planilha.get_all_values()[1][:-1]
+    sincronizador.anexar_lote([("a00000000001", linha), ("a00000000002", linha)])
+    assert planilha.chamadas["append_rows"] == 1
+    assert sincronizador.dados()[COLUNA_ID].tolist()[-2:] == ["a00000000001", "a00000000002"]
+
+
+def test_atualizar_lote(planilha, sincronizador):
+    ids = ids_na_planilha(planilha)
+    linha = planilha.get_all_values()[1][:-1]
+    linha[1] = "999"
+    ausentes = sincronizador.atualizar_lote({ids[4]: linha, "inexistente": linha})
+    assert ausentes == ["inexistente"]
+    assert planilha.get_all_values()[5][1] == "999"
+    df = sincronizador.dados()
+    assert df.loc[df[COLUNA_ID] == ids[4], 'Unidade'].tolist() == ["999"]
+
+
+def test_excluir_reajusta_indice(planilha, sincronizador):
+    ids = ids_na_planilha(planilha)
+    sincronizador.excluir(ids[2])
+    assert ids_na_planilha(planilha) == ids[:2] + ids[3:]
+    assert sincronizador.linha_da_simulacao(ids[5]) == 6
+    sincronizador.excluir(ids[5])
+    assert ids_na_planilha(planilha) == ids[:2] + ids[3:5] + ids[6:]
+    assert sincronizador.dados()[COLUNA_ID].tolist() == ids_na_planilha(planilha)
+    with pytest.raises(KeyError):
+        sincronizador.excluir(ids[2])
+
+
+def test_exclusao_externa_detectada_pela_ancora(planilha, sincronizador):
+    ids = ids_na_planilha(planilha)
+    planilha.delete_rows(11)
+    assert sincronizador.dados()[COLUNA_ID].tolist() == ids[:-1]
+
+
+def test_exclusao_externa_no_meio_detectada_pela_coluna_de_ids(planilha, sincronizador):
+    ids = ids_na_planilha(planilha)
+    planilha.delete_rows(4)
+    planilha.chamadas.clear()
+    assert sincronizador.dados()[COLUNA_ID].tolist() == ids[:2] + ids[3:]
+    assert planilha.chamadas == {"batch_get": 1, "get_all_values": 1}
+    assert sincronizador.linha_da_simulacao(ids[5]) == 6
+
+
+def test_reordenacao_externa_detectada(planilha, sincronizador):
+    linhas = planilha.get_all_values()
+    planilha.update(range_name="A2", values=linhas[1:][::-1])
+    assert sincronizador.dados()[COLUNA_ID].tolist() == [linha[-1] for linha in linhas[1:][::-1]]
+
+
+def test_ouvintes_recebem_deltas(planilha, sincronizador):
+    agregados = AgregadosCarteira()
+    sincronizador.inscrever(agregados)
+    ids = ids_na_planilha(planilha)
+    linha = planilha.get_all_values()[1][:-1]
+    sincronizador.excluir(ids[0])
+    sincronizador.atualizar_lote({ids[1]: linha})
+    planilha.append_rows([linha + ["novo000000001"]])
+    df = sincronizador.dados()
+
+    esperado = AgregadosCarteira()
+    esperado.redefinir(df)
+    pd.testing.assert_frame_equal(agregados.totais(), esperado.totais())
+    pd.testing.assert_frame_equal(agregados.recebiveis().reset_index(drop=True),
+                                  esperado.recebiveis().reset_index(drop=True), check_exact=False)
+
+
+def test_exclusao_externa_no_meio_nao_exclui_a_simulacao_errada(planilha, sincronizador):
+    ids = ids_na_planilha(planilha)
+    planilha.delete_rows(4)  # ids[2], excluída direto na planilha
+    sincronizador.excluir(ids[5])
+    assert ids_na_planilha(planilha) == ids[:2] + ids[3:5] + ids[6:]
+    assert sincronizador.dados()[COLUNA_ID].tolist() == ids_na_planilha(planilha)
+
+
+def test_linhas_reordenadas_nao_sobrescrevem_a_simulacao_errada(planilha, sincronizador):
+    ids = ids_na_planilha(planilha)
+    linhas = planilha.get_all_values()
+    planilha.update(range_name="A2", values=linhas[1:][::-1])  # ordenação feita na planilha
+    linha = linhas[1][:-1]
+    linha[1] = "999"
+    assert sincronizador.atualizar_lote({ids[3]: linha}) == []
+    unidades = {l[-1]: l[1] for l in planilha.get_all_values()[1:]}
+    assert unidades == {l[-1]: ("999" if l[-1] == ids[3] else l[1]) for l in linhas[1:]}
+
+
+def test_edicao_confere_ids_com_uma_chamada(planilha, sincronizador):
+    ids = ids_na_planilha(planilha)
+    linhas = planilha.get_all_values()
+    planilha.chamadas.clear()
+    sincronizador.atualizar_lote({ids[1]: linhas[2][:-1], ids[7]: linhas[8][:-1]})
+    assert planilha.chamadas == {"batch_get": 1, "batch_update": 1}
+
+
+def test_reconciliacao_nao_bloqueia_leituras_durante_a_rede(planilha, tmp_path):
+    caminho = str(tmp_path / "simulacoes.parquet")
+    SincronizadorPlanilha(lambda: planilha, caminho_snapshot=caminho).dados()
+
+    def abrir_devagar():
+        time.sleep(0.5)
+        return planilha
+
+    sincronizador = SincronizadorPlanilha(abrir_devagar, caminho_snapshot=caminho)
+    inicio = time.perf_counter()
+    assert len(sincronizador.dados()) == 10
+    assert sincronizador.ids_invalidos() == set()
+    sincronizador.inscrever(AgregadosCarteira())
+    assert time.perf_counter() - inicio < 0.2
+    planilha.append_rows([planilha.get_all_values()[1][:-1] + ["novo000000001"]])
+    limite = time.monotonic() + 5
+    while sincronizador._reconciliar and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert sincronizador.linha_da_simulacao("novo000000001") == 12
+
+
+def test_reconciliacao_com_ids_repetidos_no_snapshot_redefine_ouvintes(planilha, tmp_path):
+    caminho = str(tmp_path / "simulacoes.parquet")
+    SincronizadorPlanilha(lambda: planilha, caminho_snapshot=caminho).dados()
+    df, estado = carregar_snapshot(caminho)
+    df.loc[1, COLUNA_ID] = df.loc[0, COLUNA_ID]  # snapshot gravado antes da correção dos IDs copiados
+    salvar_snapshot(caminho, df, estado)
+
+    sincronizador = SincronizadorPlanilha(lambda: planilha, caminho_snapshot=caminho)
+    agregados = AgregadosCarteira()
+    sincronizador.inscrever(agregados)
+    sincronizador.dados()
+    limite = time.monotonic() + 5
+    while sincronizador._reconciliar and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert not sincronizador._reconciliar
+    esperado = AgregadosCarteira()
+    esperado.redefinir(sincronizador.dados())
+    pd.testing.assert_frame_equal(agregados.totais(), esperado.totais())
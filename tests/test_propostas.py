@@ -0,0 +1,28 @@
+import re
+import zipfile
+
+from benchmark import gerar_linhas
+from planilha import SincronizadorPlanilha
+from planilha_memoria import PlanilhaMemoria
+from propostas import LOGO_ZIP, gerar_propostas
+
+
+def test_gera_html_com_logo_unico_no_zip(tmp_path):
+    planilha = PlanilhaMemoria(gerar_linhas(30))
+    df = SincronizadorPlanilha(lambda: planilha).dados()
+    destino = tmp_path / "propostas.zip"
+    progresso = []
+    total = gerar_propostas(df, destino, processos=2, tamanho_bloco=8,
+                            progresso=lambda feitos, total: progresso.append((feitos, total)))
+    assert total == 30
+    assert progresso[-1] == (30, 30)
+    with zipfile.ZipFile(destino) as arquivo_zip:
+        nomes = arquivo_zip.namelist()
+        assert nomes.count(LOGO_ZIP) == 1
+        documentos = [nome for nome in nomes if nome.endswith(".html")]
+        assert len(documentos) == 30
+        html = arquivo_zip.read(documentos[0]).decode("utf-8")
+    assert f'src="{LOGO_ZIP}"' in html
+    assert "base64" not in html
+    assert not re.findall(r"\{[a-z_]+\}", html.split("</head>")[1])
+    assert "R$" in html
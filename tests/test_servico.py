@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+from http.client import HTTPConnection
+
+import pytest
+
+from esquema import COLUNAS_PLANILHA, OBRAS, converter_dados
+from servico import Contexto, ErroPedido, Servidor, simular
+
+
+def test_simular_calcula_e_valida_a_obra():
+    resultados = simular([
+        {"obra": OBRAS[0], "unidade": "101", "preco_total": 500000},
+        {"obra": "Obra Inventada", "unidade": "102", "preco_total": 500000},
+    ])
+    assert resultados[0]["erro"] is None
+    assert resultados[0]["valor_entrada"] == 100000.0
+    assert resultados[1]["erro"] == "Obra desconhecida"
+
+
+def test_simular_recusa_campos_que_nao_sao_escalares():
+    with pytest.raises(ErroPedido):
+        simular([{"obra": [OBRAS[0]], "unidade": "101", "preco_total": 500000}])
+
+
+@pytest.fixture
+def servidor():
+    servidor = Servidor(("127.0.0.1", 0), Contexto({}))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def requisitar(servidor, metodo, caminho, corpo=b"", cabecalhos=None):
+    conexao = HTTPConnection(*servidor.server_address, timeout=5)
+    conexao.putrequest(metodo, caminho)
+    for nome, valor in (cabecalhos or {"Content-Length": str(len(corpo))}).items():
+        conexao.putheader(nome, valor)
+    conexao.endheaders(corpo)
+    resposta = conexao.getresponse()
+    return resposta.status, json.loads(resposta.read())
+
+
+def test_pedidos_malformados_respondem_400(servidor):
+    assert requisitar(servidor, "POST", "/simular", b"{")[0] == 400
+    assert requisitar(servidor, "POST", "/simular", b"", {"Content-Length": "abc"})[0] == 400
+    corpo = json.dumps({"obra": [1], "unidade": "101", "preco_total": 1}).encode()
+    assert requisitar(servidor, "POST", "/simular", corpo)[0] == 400
+    status, dados = requisitar(servidor, "POST", "/simular",
+                               json.dumps({"obra": OBRAS[0], "unidade": "1", "preco_total": 1000}).encode())
+    assert status == 200 and dados["simulacoes"][0]["erro"] is None
+
+
+
+class ArmazenamentoContado:
+    def __init__(self):
+        self.listagens = 0
+        self.linhas = []
+
+    def listar(self):
+        self.listagens += 1
+        df, _ = converter_dados([linha + [f"id{i}"] for i, linha in enumerate(self.linhas)], COLUNAS_PLANILHA)
+        return df
+
+    def incluir(self, linhas):
+        self.linhas += linhas
+        return [f"id{i}" for i in range(len(linhas))]
+
+
+def test_listagem_reaproveita_a_leitura_recente(servidor, monkeypatch):
+    armazenamento = ArmazenamentoContado()
+    monkeypatch.setattr(servidor.contexto, "armazenamento", lambda: armazenamento)
+    for _ in range(3):
+        assert requisitar(servidor, "GET", "/simulacoes") == (200, {"total": 0, "simulacoes": []})
+    assert armazenamento.listagens == 1
+
+    corpo = json.dumps({"simulacoes": [{"obra": OBRAS[0], "unidade": "101", "preco_total": 500000}],
+                        "salvar": True}).encode()
+    assert requisitar(servidor, "POST", "/simular", corpo)[0] == 200
+    status, dados = requisitar(servidor, "GET", "/simulacoes?unidade=101")
+    assert status == 200 and dados["total"] == 1 and dados["simulacoes"][0]["unidade"] == "101"
+    assert armazenamento.listagens == 2
+
+    monkeypatch.setattr("servico.INTERVALO_LISTAGEM", 0)
+    time.sleep(0.01)
+    requisitar(servidor, "GET", "/simulacoes")
+    assert armazenamento.listagens == 3